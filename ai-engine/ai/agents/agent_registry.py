@@ -0,0 +1,96 @@
+import threading
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from langchain.agents import AgentExecutor, create_openai_tools_agent
+from langchain_core.language_models import BaseChatModel
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import Runnable
+from langchain_core.runnables.history import RunnableWithMessageHistory
+from langchain_core.tools import BaseTool
+
+from ai.core.chat_memory import BoundedChatMessageHistory
+from ai.core.llm import get_chat_model
+from ai.tools.chat_tools import chat_request_context
+
+
+def get_session_history(session_id: str) -> BoundedChatMessageHistory:
+    return BoundedChatMessageHistory(session_id=f"chat:{session_id}")
+
+
+class AgentRegistry:
+    """
+    Builds a tool-calling agent (prompt, tools, agent runnable, executor, message history) once per
+    (model, temperature, api key) and runs every request on that shared graph. Per-request values are
+    injected at run time: the session id through the run config (it selects the Redis history),
+    user_id/filenames/LLM through `chat_request_context`, which the tools read.
+    """
+
+    def __init__(self, name: str, prompt: ChatPromptTemplate, tools: List[BaseTool], **context_defaults: Any):
+        self.name = name
+        self.prompt = prompt
+        self.tools = tools
+        self.context_defaults = context_defaults
+        self._agents: Dict[Tuple, Runnable] = {}
+        self._lock = threading.Lock()
+
+    def _build(self, llm: BaseChatModel) -> Runnable:
+        agent = create_openai_tools_agent(llm=llm, tools=self.tools, prompt=self.prompt)
+        agent_executor = AgentExecutor(
+            agent=agent,
+            tools=self.tools,
+            verbose=True,
+            handle_parsing_errors=True
+        )
+        return RunnableWithMessageHistory(
+            agent_executor,
+            get_session_history,
+            input_messages_key="input",
+            history_messages_key="chat_history",
+            output_messages_key="output"
+        )
+
+    def get(self, model: str, temperature: float, api_key: Optional[str] = None) -> Tuple[Runnable, BaseChatModel]:
+        """The shared agent for these settings and the model it runs on."""
+        llm = get_chat_model(model=model, temperature=temperature, api_key=api_key)
+        key = (model, float(temperature), api_key)
+        agent = self._agents.get(key)
+        if agent is None:
+            with self._lock:
+                agent = self._agents.get(key)
+                if agent is None:
+                    print(f"[INFO] Building {self.name} agent for {model} (temperature={temperature})")
+                    agent = self._build(llm)
+                    self._agents[key] = agent
+        return agent, llm
+
+    def invoke(self, query: str, session_id: str, user_id: int, filenames: List, model: str, temperature: float,
+               api_key: Optional[str] = None) -> Dict[str, Any]:
+        agent, llm = self.get(model, temperature, api_key)
+        token = chat_request_context.set({**self.context_defaults, "user_id": user_id, "filenames": filenames, "llm": llm})
+        try:
+            return agent.invoke({"input": query}, config={"configurable": {"session_id": session_id}})
+        finally:
+            chat_request_context.reset(token)
+
+    async def ainvoke(self, query: str, session_id: str, user_id: int, filenames: List, model: str,
+                      temperature: float, api_key: Optional[str] = None) -> Dict[str, Any]:
+        agent, llm = self.get(model, temperature, api_key)
+        token = chat_request_context.set({**self.context_defaults, "user_id": user_id, "filenames": filenames, "llm": llm})
+        try:
+            return await agent.ainvoke({"input": query}, config={"configurable": {"session_id": session_id}})
+        finally:
+            chat_request_context.reset(token)
+
+    async def astream_events(self, query: str, session_id: str, user_id: int, filenames: List, model: str,
+                             temperature: float, api_key: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        agent, llm = self.get(model, temperature, api_key)
+        token = chat_request_context.set({**self.context_defaults, "user_id": user_id, "filenames": filenames, "llm": llm})
+        try:
+            async for event in agent.astream_events(
+                    {"input": query},
+                    config={"configurable": {"session_id": session_id}},
+                    version="v2"
+            ):
+                yield event
+        finally:
+            chat_request_context.reset(token)
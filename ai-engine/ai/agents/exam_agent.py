@@ -1,5 +1,8 @@
+import asyncio
 import cohere
 import functools
+from typing import AsyncIterator, List
+
 from dotenv import load_dotenv
 from langchain.agents import (
     create_react_agent,
@@ -9,13 +12,14 @@ from langchain.agents import (
 from langchain.output_parsers import PydanticOutputParser
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.tools import Tool
-from langchain_openai import ChatOpenAI
 from langsmith import traceable
 
-from ai.agents.notes_agent import get_context_chunks, get_all_chunks_by_batch_streamed
-from ai.schemas.exam import ExamGenerateParams, TextQuestion
+from ai.core.llm import get_chat_model
+from ai.agents.notes_agent import get_context_chunks, get_all_chunks_by_batch_streamed, aiter_in_thread
+from ai.schemas.exam import ExamGenerateParams, TextAnswer, TextQuestion
 from ai.schemas.exam import QuestionList
-from ai.tools.tools import answer_from_documents, search_web
+from ai.tools.tools import answer_from_documents, aanswer_from_documents, aanswer_from_documents_batch, search_web, \
+    asearch_web
 
 load_dotenv()
 
@@ -26,24 +30,30 @@ except cohere.errors.CohereError:
     co_client = None
 
 
-@traceable(name="Generate Exam Questions")
-def generate_questions_from_rag(exam_params: ExamGenerateParams, model, temperature):
+async def _exam_context_batches(exam_params: ExamGenerateParams) -> AsyncIterator[str]:
     if exam_params.topic:
-        batches = get_context_chunks(
-            user_id=exam_params.user_id,
-            filenames=exam_params.filenames,
-            topic=exam_params.topic,
-            focus="",
-            batch_size=5
-        )
+        for batch in await get_context_chunks(
+                user_id=exam_params.user_id,
+                filenames=exam_params.filenames,
+                topic=exam_params.topic,
+                focus="",
+                batch_size=5
+        ):
+            yield batch
     else:
-        batches = get_all_chunks_by_batch_streamed(
-            user_id=exam_params.user_id,
-            filenames=exam_params.filenames,
-            chunk_page_size=100,
-            max_tokens_per_batch=6000
-        )
-    llm = ChatOpenAI(model=model, temperature=temperature)
+        # Full scan is paged lazily, so generation can stop reading once enough questions exist.
+        async for batch in aiter_in_thread(get_all_chunks_by_batch_streamed(
+                user_id=exam_params.user_id,
+                filenames=exam_params.filenames,
+                chunk_page_size=100,
+                max_tokens_per_batch=6000
+        )):
+            yield batch
+
+
+@traceable(name="Generate Exam Questions")
+async def generate_questions_from_rag(exam_params: ExamGenerateParams, model, temperature):
+    llm = get_chat_model(model=model, temperature=temperature, cache=True)
 
     # TODO nie da sie jakos parsera podlaczyc bezposrednio do chatu?
     parser = PydanticOutputParser(pydantic_object=QuestionList)
@@ -51,7 +61,7 @@ def generate_questions_from_rag(exam_params: ExamGenerateParams, model, temperat
 
     questions = []
     id_counter = 1
-    for batch in batches:
+    async for batch in _exam_context_batches(exam_params):
         prompt = f"""
     Odpowiadaj wyłącznie w języku polskim. To jest BARDZO WAŻNE.
     Generujesz {exam_params.num_of_questions} pytań egzaminacyjnych typu {exam_params.question_type.value} na temat "{exam_params.topic or 'temat ogólny'}", bazując na poniższym kontekście edukacyjnym:
@@ -73,7 +83,7 @@ def generate_questions_from_rag(exam_params: ExamGenerateParams, model, temperat
     Wszystkie teksty, opisy i odpowiedzi muszą być po polsku.
     """
 
-        llm_response = llm.invoke(prompt)
+        llm_response = await llm.ainvoke(prompt)
         response = llm_response.content
         try:
             parsed = parser.parse(response)
@@ -90,9 +100,9 @@ def generate_questions_from_rag(exam_params: ExamGenerateParams, model, temperat
     return questions[:exam_params.num_of_questions]
 
 
-def check_text_answers(question: TextQuestion, model, temperature):
-    llm = ChatOpenAI(
-        model_name=model,
+async def check_text_answers(question: TextQuestion, model, temperature):
+    llm = get_chat_model(
+        model=model,
         temperature=temperature
     )
     answer_from_docs_with_context = functools.partial(
@@ -105,6 +115,13 @@ def check_text_answers(question: TextQuestion, model, temperature):
     rag_tool = Tool(
         name="answer_from_documents",
         func=answer_from_docs_with_context,
+        coroutine=functools.partial(
+            aanswer_from_documents,
+            user_id=question.user_id,
+            llm=llm,
+            filenames=question.sources,
+            cohere_client=co_client
+        ),
         description=answer_from_documents.description
     )
     search_web_with_context = functools.partial(
@@ -113,6 +130,7 @@ def check_text_answers(question: TextQuestion, model, temperature):
     search_web_tool = Tool(
         name="search_web",
         func=search_web_with_context,
+        coroutine=functools.partial(asearch_web, user_id=question.user_id, llm=llm),
         description=search_web.description
     )
 
@@ -159,10 +177,60 @@ Respond in one clear paragraph only.
         handle_parsing_errors=True
     )
 
-    response = agent_executor.invoke({
+    response = await agent_executor.ainvoke({
         "question": question.question,
         "user_answer": question.user_answer,
         "correct_answer": question.correct_answer,
         "sources": question.sources
     })
     return response.get("output", "An error occurred while processing the response.")
+
+
+CHECK_BATCH_PROMPT = """You are an intelligent exam assistant. Your task is to evaluate whether the user's answer to a given question is correct or reasonably close to the correct answer.
+
+Base your judgment on factual accuracy and conceptual understanding rather than exact wording, using the context below.
+
+If the user's answer is factually correct, well-reasoned, and meaningfully addresses the question—even if phrased differently from the suggested answer—respond with:
+OK
+
+If the user's answer is incorrect, incomplete, or misses key points, respond with a short explanation of why it is not correct and what is missing or wrong.
+
+Do not explain your process or mention the context or sources unless it is relevant to the explanation.
+Respond in one clear paragraph only.
+
+- Question: {question}
+
+- User's Answer: {user_answer}
+
+- Suggested Correct Answer (previously generated): {correct_answer}
+
+- Context:
+{context}"""
+
+_NO_CONTEXT_PREFIXES = ("No relevant information", "An error occurred")
+
+
+@traceable(name="Check Exam Answers (batch)")
+async def check_text_answers_batch(user_id: int, questions: List[TextAnswer], sources: List[str], model,
+                                   temperature) -> List[str]:
+    """
+    Grades all text answers of an attempt. Context for every question comes from one batched retrieval
+    (one embedding call, concurrent queries and reranks); questions the documents cannot answer fall back
+    to web search. Feedback is returned in the order of `questions`.
+    """
+    llm = get_chat_model(model=model, temperature=temperature)
+    contexts = await aanswer_from_documents_batch([q.question for q in questions], user_id, sources, co_client)
+
+    async def grade(question: TextAnswer) -> str:
+        context = contexts.get(question.question)
+        if not context or context.startswith(_NO_CONTEXT_PREFIXES):
+            context = await asearch_web(question.question, user_id=user_id, llm=llm)
+        prompt = CHECK_BATCH_PROMPT.format(
+            question=question.question,
+            user_answer=question.user_answer,
+            correct_answer=question.correct_answer,
+            context=context
+        )
+        return (await llm.ainvoke(prompt)).content
+
+    return list(await asyncio.gather(*(grade(question) for question in questions)))
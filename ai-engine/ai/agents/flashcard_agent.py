@@ -1,42 +1,45 @@
+import asyncio
 import math
 from typing import List
 
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
 
-from ai.agents.notes_agent import get_all_chunks_by_batch_streamed
+from ai.core.llm import get_chat_model
+from ai.agents.notes_agent import iter_chunk_batches, aiter_in_thread
 from ai.schemas.flashcard import FlashcardGenerateParams, FlashcardResponse, Flashcard
+from ai.services.chunk_service import list_chunk_ids
 from langchain.output_parsers import PydanticOutputParser
 from langchain.prompts import PromptTemplate
 
 load_dotenv()
 
 
-def generate_flashcard(flashcard_params: FlashcardGenerateParams, model: str, temperature: float) -> FlashcardResponse:
+async def generate_flashcard(flashcard_params: FlashcardGenerateParams, model: str, temperature: float) -> FlashcardResponse:
     """
     Generates flashcards based on the content of user-provided files without needing a topic.
     """
     try:
-        llm = ChatOpenAI(
-            model_name=model,
+        llm = get_chat_model(
+            model=model,
             temperature=temperature
         )
 
-        batches = get_all_chunks_by_batch_streamed(
-            user_id=flashcard_params.user_id,
-            filenames=flashcard_params.filenames,
-            max_tokens_per_batch=8000
-        )
+        chunk_ids = await asyncio.to_thread(list_chunk_ids, flashcard_params.user_id, flashcard_params.filenames)
 
-        if not batches:
+        if not chunk_ids:
             print("Warning: No content chunks were generated from the provided files.")
             return FlashcardResponse(flashcards=[])
 
+        batches = iter_chunk_batches(
+            user_id=flashcard_params.user_id,
+            chunk_ids=chunk_ids,
+            max_tokens_per_batch=8000
+        )
+
         parser = PydanticOutputParser(pydantic_object=FlashcardResponse)
         format_instructions = parser.get_format_instructions()
 
-        num_batches = len(batches)
-        flashcards_per_batch = math.ceil(flashcard_params.flashcards_needed / num_batches)
+        total_chunks = len(chunk_ids)
 
         topic_instruction = f"The flashcards should be specifically about these topics: '{flashcard_params.topics}'." if flashcard_params.topics else "The flashcards should cover the main ideas from the entire text."
 
@@ -74,13 +77,17 @@ def generate_flashcard(flashcard_params: FlashcardGenerateParams, model: str, te
 
         all_flashcards: List[Flashcard] = []
 
-        for batch_context in batches:
+        async for batch in aiter_in_thread(batches):
             if len(all_flashcards) >= flashcard_params.flashcards_needed:
                 break
 
+            # Fiszki rozdzielamy proporcjonalnie do udziału batcha w całym materiale.
+            flashcards_per_batch = math.ceil(flashcard_params.flashcards_needed * len(batch) / total_chunks)
+            batch_context = "\n\n".join(chunk["text"] for chunk in batch)
+
             print(f"Processing a batch to generate up to {flashcards_per_batch} flashcards...")
             try:
-                response_part = chain.invoke({
+                response_part = await chain.ainvoke({
                     "context": batch_context,
                     "num_flashcards": flashcards_per_batch,
                     "topic_focus": topic_instruction
@@ -3,11 +3,11 @@ from dotenv import load_dotenv
 from langchain.agents import create_openai_tools_agent, AgentExecutor
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.tools import Tool
-from langchain_openai import ChatOpenAI
 from langsmith import traceable
 
+from ai.core.llm import get_chat_model
 from ai.schemas.focus_study_answer_checker import GradePracticeParams
-from ai.tools.tools import answer_from_documents, search_web
+from ai.tools.tools import answer_from_documents, aanswer_from_documents, search_web, asearch_web
 
 load_dotenv()
 
@@ -41,8 +41,8 @@ User Answer:
 
 
 @traceable(name="Grade Practice Problem (note)")
-def grade_practice_note(params: GradePracticeParams, model: str, temperature: float) -> str:
-    llm = ChatOpenAI(model_name=model, temperature=temperature)
+async def grade_practice_note(params: GradePracticeParams, model: str, temperature: float) -> str:
+    llm = get_chat_model(model=model, temperature=temperature)
 
     tools = []
     if params.problem.sources:
@@ -56,6 +56,13 @@ def grade_practice_note(params: GradePracticeParams, model: str, temperature: fl
         tools.append(Tool(
             name="answer_from_documents",
             func=rag,
+            coroutine=functools.partial(
+                aanswer_from_documents,
+                user_id=params.user_id,
+                llm=llm,
+                filenames=params.problem.sources,
+                cohere_client=None,
+            ),
             description=answer_from_documents.description,
         ))
 
@@ -63,6 +70,7 @@ def grade_practice_note(params: GradePracticeParams, model: str, temperature: fl
     tools.append(Tool(
         name="search_web",
         func=web,
+        coroutine=functools.partial(asearch_web, user_id=params.user_id, llm=llm),
         description=search_web.description,
     ))
 
@@ -75,7 +83,7 @@ def grade_practice_note(params: GradePracticeParams, model: str, temperature: fl
     agent = create_openai_tools_agent(llm=llm, tools=tools, prompt=prompt)
     executor = AgentExecutor(agent=agent, tools=tools, verbose=False, handle_parsing_errors=True)
 
-    res = executor.invoke({
+    res = await executor.ainvoke({
         "title": params.problem.problem_title,
         "description": params.problem.problem_description,
         "hint": params.problem.hint or "N/A",
@@ -1,14 +1,13 @@
 import functools
-import os
 from langchain.agents import AgentExecutor, create_openai_tools_agent
 from langchain.memory import ConversationBufferMemory
-from langchain_community.chat_message_histories import RedisChatMessageHistory
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.tools import Tool
-from langchain_openai import ChatOpenAI
 import cohere
 
-from ai.tools.tools import search_web, answer_from_documents
+from ai.core.chat_memory import BoundedChatMessageHistory
+from ai.core.llm import get_chat_model
+from ai.tools.tools import search_web, answer_from_documents, aanswer_from_documents
 from ai.schemas.focus_study_chat_helper import FocusStudyHelperParams
 
 
@@ -18,14 +17,14 @@ except cohere.errors.CohereError:
     print("Warning: COHERE_API_KEY not found. Reranking in RAG tool will be disabled.")
     co_client = None
 
-def focus_study_assistant_agent(params: FocusStudyHelperParams, api_key: str, model: str, temperature: float,
+async def focus_study_assistant_agent(params: FocusStudyHelperParams, api_key: str, model: str, temperature: float,
                                 history_ttl_seconds: int = 3600) -> str:
     """
     Agent konwersacyjny, który pomaga użytkownikowi zrozumieć materiały
     w sesji "Focus Study".
     """
     try:
-        llm = ChatOpenAI(api_key=api_key, model_name=model, temperature=temperature)
+        llm = get_chat_model(model=model, temperature=temperature, api_key=api_key)
 
         answer_from_docs_with_context = functools.partial(
             answer_from_documents.func,
@@ -37,6 +36,13 @@ def focus_study_assistant_agent(params: FocusStudyHelperParams, api_key: str, mo
         rag_tool = Tool(
             name="answer_from_documents",
             func=answer_from_docs_with_context,
+            coroutine=functools.partial(
+                aanswer_from_documents,
+                user_id=params.user_id,
+                llm=llm,
+                filenames=params.sources,
+                cohere_client=co_client
+            ),
             description="Use this to answer questions based on the user's uploaded study materials. This should be your primary tool."
         )
         tools = [rag_tool]
@@ -52,10 +58,8 @@ def focus_study_assistant_agent(params: FocusStudyHelperParams, api_key: str, mo
             MessagesPlaceholder(variable_name="agent_scratchpad"),
         ])
 
-        redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
-        message_history = RedisChatMessageHistory(
+        message_history = BoundedChatMessageHistory(
             session_id=f"focus_study_chat:{params.session_id}",
-            url=redis_url,
             ttl=history_ttl_seconds
         )
         memory = ConversationBufferMemory(
@@ -73,7 +77,7 @@ def focus_study_assistant_agent(params: FocusStudyHelperParams, api_key: str, mo
             handle_parsing_errors=True,
         )
 
-        response = agent_executor.invoke({"input": params.user_message})
+        response = await agent_executor.ainvoke({"input": params.user_message})
         return response.get("output", "I'm sorry, I encountered an error.")
 
     except Exception as e:
@@ -1,13 +1,13 @@
 from langchain.output_parsers import PydanticOutputParser
-from langchain_openai import ChatOpenAI
 from langsmith import traceable
 
+from ai.core.llm import get_chat_model
 from ai.schemas.key_concept import SingleConceptParams, KeyConceptOutput
 
 @traceable(name="Generate Single Key Concept")
-def generate_single_key_concept(params: SingleConceptParams, model: str, temperature: float) -> KeyConceptOutput | None:
+async def generate_single_key_concept(params: SingleConceptParams, model: str, temperature: float) -> KeyConceptOutput | None:
     """Agent generujący jeden kluczowy koncept na podstawie podanego kontekstu."""
-    llm = ChatOpenAI(model=model, temperature=temperature)
+    llm = get_chat_model(model=model, temperature=temperature, cache=True)
     parser = PydanticOutputParser(pydantic_object=KeyConceptOutput)
     format_instructions = parser.get_format_instructions()
 
@@ -25,7 +25,7 @@ def generate_single_key_concept(params: SingleConceptParams, model: str, tempera
     {format_instructions}
     """
     try:
-        response = llm.invoke(prompt)
+        response = await llm.ainvoke(prompt)
         return parser.parse(response.content)
     except Exception as e:
         print(f"Error in key_concept_agent for subtopic '{params.subtopic_name}': {e}")
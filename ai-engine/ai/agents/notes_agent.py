@@ -1,38 +1,49 @@
+import asyncio
 import os
 import time
-from time import sleep
-from typing import List, Dict, Any
+from itertools import islice
+from typing import List, Dict, Any, AsyncIterator, Awaitable, Callable, Iterator, TypeVar
 
-import tiktoken
 from dotenv import load_dotenv
 from langchain.agents import initialize_agent, AgentType
 from langchain.agents.agent import AgentExecutor
 from langchain.tools.retriever import create_retriever_tool
 from langchain.vectorstores.base import VectorStoreRetriever
-from langchain_core.exceptions import OutputParserException
 from langchain_core.runnables import Runnable
-from langchain_openai import ChatOpenAI
-from langchain_openai import OpenAIEmbeddings
-from langchain_pinecone import PineconeVectorStore
 from langgraph.graph import StateGraph, END
 from langsmith import traceable
 from openai import RateLimitError
 
+from ai.core.llm import get_chat_model
+from ai.core.rate_limiter import retry_after_seconds
+from ai.core.tokens import count_tokens_batch, count_chunk_tokens
 from ai.schemas.notes import GraphState
+from ai.services.chunk_service import iter_chunks
+from ai.services.pinecone_service import user_retriever
 
 load_dotenv()
 
-embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
-INDEX_NAME = os.environ.get("INDEX_NAME")
+# Number of context batches turned into partial notes at the same time.
+NOTES_MAP_CONCURRENCY = int(os.getenv("NOTES_MAP_CONCURRENCY", "4"))
 
-vectorstore = PineconeVectorStore(
-    index_name=INDEX_NAME,
-    embedding=embeddings
-)
+# Reduce stage: merges within one level of the tree run concurrently.
+NOTES_MERGE_MODEL = os.getenv("NOTES_MERGE_MODEL", "gpt-4o")
+NOTES_MERGE_CONCURRENCY = int(os.getenv("NOTES_MERGE_CONCURRENCY", "4"))
+NOTES_MERGE_CONTEXT_FRACTION = float(os.getenv("NOTES_MERGE_CONTEXT_FRACTION", "0.08"))
+NOTES_MERGE_MAX_TOKENS = int(os.getenv("NOTES_MERGE_MAX_TOKENS", "0"))
+
+MODEL_CONTEXT_WINDOWS = {
+    "gpt-4o": 128_000,
+    "gpt-4o-mini": 128_000,
+    "gpt-4-turbo": 128_000,
+    "gpt-4.1": 1_047_576,
+    "gpt-4.1-mini": 1_047_576,
+}
+DEFAULT_CONTEXT_WINDOW = 128_000
 
 
 @traceable(name="Validate Notes")
-def validate_notes(notes: str) -> str:
+async def validate_notes(notes: str) -> str:
     prompt = (
         "Odpowiadaj wyłącznie w języku polskim. To jest BARDZO WAŻNE. "
         "Oceniasz wygenerowane przez AI notatki do nauki. Oceń, czy notatki są:\n"
@@ -43,22 +54,19 @@ def validate_notes(notes: str) -> str:
         "W przeciwnym razie zwróć 'ok'.\n\n"
         f"NOTATKI:\n{notes}"
     )
-    return ChatOpenAI(model="gpt-4o", temperature=0, tags=["notes", "validate"]).invoke(prompt).content
+    llm = get_chat_model(model="gpt-4o", temperature=0, cache=True).with_config(tags=["notes", "validate"])
+    return (await llm.ainvoke(prompt)).content
 
 
 @traceable(name="Improve Notes")
-def improve_notes(notes: str, feedback: str, user_id: int, filenames: List[str], topic: str) -> str:
-    filters = {"user_id": user_id}
-    if filenames:
-        filters["filename"] = {"$in": filenames}
-
+async def improve_notes(notes: str, feedback: str, user_id: int, filenames: List[str], topic: str) -> str:
     query = topic if topic else "general summary"
-    retriever = vectorstore.as_retriever(search_kwargs={"k": 30, "filter": filters})
-    context_docs = retriever.invoke(query)
+    retriever = user_retriever(user_id, filenames, k=30)
+    context_docs = await retriever.ainvoke(query)
     context = ""
     total_tokens = 0
-    for doc in context_docs:
-        tokens = count_tokens(doc.page_content)
+    doc_tokens = count_tokens_batch([doc.page_content for doc in context_docs])
+    for doc, tokens in zip(context_docs, doc_tokens):
         if total_tokens + tokens > 6000:
             break
         context += doc.page_content + "\n\n"
@@ -83,23 +91,15 @@ def improve_notes(notes: str, feedback: str, user_id: int, filenames: List[str],
         
         Zwróć WYŁĄCZNIE notatki.
         """
-    return ChatOpenAI(model="gpt-4o", temperature=0.3, tags=["notes", "improve"]).invoke(prompt).content
-
-
-def count_tokens(text: str, model_name: str = "gpt-4o") -> int:
-    enc = tiktoken.encoding_for_model(model_name)
-    return len(enc.encode(text))
+    llm = get_chat_model(model="gpt-4o", temperature=0.3).with_config(tags=["notes", "improve"])
+    return (await llm.ainvoke(prompt)).content
 
 
 @traceable(name="Retrieve from Pinecone - context")
-def get_context_chunks(user_id: int, filenames: List[str], topic: str, focus: str, batch_size: int = 20) -> List[str]:
-    filters = {"user_id": user_id}
-    if filenames:
-        filters["filename"] = {"$in": filenames}
-
+async def get_context_chunks(user_id: int, filenames: List[str], topic: str, focus: str, batch_size: int = 20) -> List[str]:
     query = topic + (f". Focus: {focus}" if focus else "") if topic else (focus or "general summary")
-    retriever = vectorstore.as_retriever(search_kwargs={"k": 100, "filter": filters})
-    docs = retriever.invoke(query)
+    retriever = user_retriever(user_id, filenames, k=100)
+    docs = await retriever.ainvoke(query)
 
     batches = []
     for i in range(0, len(docs), batch_size):
@@ -109,76 +109,112 @@ def get_context_chunks(user_id: int, filenames: List[str], topic: str, focus: st
     return batches
 
 
-@traceable(name="Retrieve from Pinecone - all")
-def get_all_chunks_by_batch_streamed(
+def iter_chunk_batches(
         user_id: int,
-        filenames: List[str],
+        filenames: List[str] = None,
+        chunk_ids: List[str] = None,
         chunk_page_size: int = 100,
         max_tokens_per_batch: int = 10_000
-) -> List[str]:
-    filters = {"user_id": user_id}
-    if filenames:
-        filters["filename"] = {"$in": filenames}
-
-    embedded_vector = embeddings.embed_query("")
-    response = vectorstore._index.query(
-        vector=embedded_vector,
-        # top_k=chunk_page_size * 100,
-        top_k=9999,
-        filter=filters,
-        include_metadata=True
-    )
-
-    chunks = [match['metadata']['text'] if 'text' in match['metadata'] else "" for match in response['matches']]
-    all_batches = []
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Groups the user's chunks (in document order) into batches of at most `max_tokens_per_batch`
+    tokens. Chunks are paged in from the index lazily, so only the current batch is held in memory.
+    """
+    chunks = iter_chunks(user_id, filenames=filenames, chunk_ids=chunk_ids, page_size=chunk_page_size)
     current_batch = []
     current_tokens = 0
 
-    for chunk in chunks:
-        chunk_tokens = count_tokens(chunk)
-        if current_tokens + chunk_tokens > max_tokens_per_batch:
-            all_batches.append("\n\n".join(current_batch))
-            current_batch = [chunk]
-            current_tokens = chunk_tokens
-        else:
+    # Token counts are taken one page at a time so that every page is tokenised in a single pass.
+    while page := list(islice(chunks, chunk_page_size)):
+        for chunk, chunk_tokens in zip(page, count_chunk_tokens(page)):
+            if current_batch and current_tokens + chunk_tokens > max_tokens_per_batch:
+                yield current_batch
+                current_batch = []
+                current_tokens = 0
             current_batch.append(chunk)
             current_tokens += chunk_tokens
 
     if current_batch:
-        all_batches.append("\n\n".join(current_batch))
+        yield current_batch
 
-    total_chunks = sum(len(batch.split("\n\n")) for batch in all_batches)
-    print(f"[INFO] Retrieved {len(chunks)} raw chunks from Pinecone.")
-    print(f"[INFO] Grouped into {len(all_batches)} batches. Total text chunks: approx. {total_chunks}")
 
-    return all_batches
+T = TypeVar("T")
+R = TypeVar("R")
 
 
-@traceable(name="Generate Notes")
-def generate(state: GraphState) -> GraphState:
-    if state["topic"]:
-        print("focused")
-        context_batches = get_context_chunks(
-            user_id=state["user_id"],
-            filenames=state["filenames"],
-            topic=state["topic"],
-            focus=state["focus"],
-            batch_size=20
-        )
-    else:
-        print("full scan")
-        context_batches = get_all_chunks_by_batch_streamed(
-            user_id=state["user_id"],
-            filenames=state["filenames"],
-            chunk_page_size=100,
-            max_tokens_per_batch=10_000
-        )
+async def aiter_in_thread(iterator: Iterator[T]) -> AsyncIterator[T]:
+    """
+    Steps through a blocking iterator (chunk store / index paging) in worker threads, one item at a time,
+    so async callers can stop early without reading the whole corpus.
+    """
+    sentinel = object()
+    while (item := await asyncio.to_thread(next, iterator, sentinel)) is not sentinel:
+        yield item
+
+
+async def gather_limited(calls: List[Awaitable[T]], limit: int) -> List[T]:
+    """asyncio.gather with at most `limit` calls in flight; results keep the order of `calls`."""
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def run(call: Awaitable[T]) -> T:
+        async with semaphore:
+            return await call
+
+    return await asyncio.gather(*(run(call) for call in calls))
+
+
+async def amap_limited(items: AsyncIterator[T], call: Callable[[T], Awaitable[R]], limit: int) -> List[R]:
+    """
+    gather_limited over an async iterator: the next item is only pulled once one of the `limit` calls
+    has finished, so at most `limit` items are held at a time. Results keep the order of `items`.
+    """
+    sentinel = object()
+    tasks = []
+    running = set()
+    try:
+        while True:
+            if len(running) >= max(1, limit):
+                done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    task.result()
+            item = await anext(items, sentinel)
+            if item is sentinel:
+                break
+            task = asyncio.create_task(call(item))
+            tasks.append(task)
+            running.add(task)
+        return list(await asyncio.gather(*tasks))
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
 
-    llm = ChatOpenAI(model="gpt-4o", temperature=0.3, tags=["notes", "generate"])
-    partial_notes = []
 
-    for batch in context_batches:
-        prompt = f"""
+@traceable(name="Retrieve from Pinecone - all")
+def get_all_chunks_by_batch_streamed(
+        user_id: int,
+        filenames: List[str],
+        chunk_page_size: int = 100,
+        max_tokens_per_batch: int = 10_000
+) -> Iterator[str]:
+    total_chunks = 0
+    total_batches = 0
+
+    for batch in iter_chunk_batches(
+            user_id=user_id,
+            filenames=filenames,
+            chunk_page_size=chunk_page_size,
+            max_tokens_per_batch=max_tokens_per_batch
+    ):
+        total_chunks += len(batch)
+        total_batches += 1
+        yield "\n\n".join(chunk["text"] for chunk in batch)
+
+    print(f"[INFO] Streamed {total_chunks} chunks from Pinecone in {total_batches} batches.")
+
+
+def _build_generate_prompt(state: GraphState, batch: str) -> str:
+    return f"""
         You are an advanced academic assistant generating **comprehensive** and **in-depth** study notes from the context below.
 
         Your goal is to extract and expand on **all important details**, creating an extensive resource for learning and revision. These notes should resemble a full lecture summary or textbook chapter.
@@ -219,29 +255,44 @@ def generate(state: GraphState) -> GraphState:
         {batch}
         """.strip()
 
-        for i in range(3):
-            try:
-                response = llm.invoke(prompt)
-                break
-            except RateLimitError as e:
-                if 'TPM' in str(e):
-                    print("[WARN] Rate limit hit (TPM). Waiting 90s before retry...")
-                    time.sleep(90)
-                else:
-                    raise
-            except OutputParserException:
-                print("[WARN] Output parsing failed, retrying...")
-                time.sleep(2)
-        else:
-            raise Exception("Rate limit exceeded after 3 retries")
-
-        partial_notes.append(response.content)
+
+async def _generate_partial_note(llm: Runnable, prompt: str) -> str:
+    return (await call_with_retry(lambda: llm.ainvoke(prompt))).content
+
+
+@traceable(name="Generate Notes")
+async def generate(state: GraphState) -> GraphState:
+    llm = get_chat_model(model="gpt-4o", temperature=0.3).with_config(tags=["notes", "generate"])
+
+    def partial_note(batch: str) -> Awaitable[str]:
+        return _generate_partial_note(llm, _build_generate_prompt(state, batch))
+
+    # Batches are independent, so the map stage fans out; partial_notes keep batch order.
+    if state["topic"]:
+        print("focused")
+        context_batches = await get_context_chunks(
+            user_id=state["user_id"],
+            filenames=state["filenames"],
+            topic=state["topic"],
+            focus=state["focus"],
+            batch_size=20
+        )
+        partial_notes = await gather_limited([partial_note(batch) for batch in context_batches], NOTES_MAP_CONCURRENCY)
+    else:
+        print("full scan")
+        # Batches are read only as map slots free up, so the corpus is never held in memory at once.
+        partial_notes = await amap_limited(aiter_in_thread(get_all_chunks_by_batch_streamed(
+            user_id=state["user_id"],
+            filenames=state["filenames"],
+            chunk_page_size=100,
+            max_tokens_per_batch=10_000
+        )), partial_note, NOTES_MAP_CONCURRENCY)
 
     return {**state, "partial_notes": partial_notes}
 
 
-def check(state: GraphState) -> str:
-    feedback = validate_notes(state["notes"])
+async def check(state: GraphState) -> str:
+    feedback = await validate_notes(state["notes"])
     if feedback.strip().lower() == "ok":
         return "end"
     if state["attempt"] >= 3:
@@ -249,8 +300,8 @@ def check(state: GraphState) -> str:
     return "improve"
 
 
-def improve(state: GraphState) -> GraphState:
-    new_notes = improve_notes(
+async def improve(state: GraphState) -> GraphState:
+    new_notes = await improve_notes(
         notes=state["notes"],
         feedback=state["feedback"],
         user_id=state["user_id"],
@@ -260,12 +311,12 @@ def improve(state: GraphState) -> GraphState:
     return {**state, "notes": new_notes, "attempt": state["attempt"] + 1}
 
 
-def feedback_state(state: GraphState) -> GraphState:
-    fb = validate_notes(state["notes"])
+async def feedback_state(state: GraphState) -> GraphState:
+    fb = await validate_notes(state["notes"])
     return {**state, "feedback": fb}
 
 
-def merge_notes(notes_parts: List[str], topic: str, focus: str) -> str:
+async def merge_notes(notes_parts: List[str], topic: str, focus: str) -> str:
     separator = "\n\n---\n\n"
     prompt = f"""
         You are merging multiple AI-generated note segments into one coherent and complete set of notes.
@@ -288,55 +339,87 @@ def merge_notes(notes_parts: List[str], topic: str, focus: str) -> str:
         Return only notes.
         """.strip()
 
-    for i in range(3):
-        try:
-            return ChatOpenAI(model="gpt-4o", temperature=0.3).invoke(prompt).content
-        except RateLimitError as e:
-            if 'TPM' in str(e):
-                print("[WARN] Rate limit hit (TPM). Waiting 60s before retry...")
-                sleep(60)
-            else:
-                raise
-    raise Exception("Rate limit exceeded in merge_notes after 3 retries")
+    llm = get_chat_model(model=NOTES_MERGE_MODEL, temperature=0.3)
+    return (await call_with_retry(lambda: llm.ainvoke(prompt))).content
 
 
-def recursive_merge(notes_parts: List[str], topic: str, focus: str, max_tokens: int = 10_000) -> str:
-    batches = []
-    current_batch = []
+def merge_token_budget(model_name: str = NOTES_MERGE_MODEL) -> int:
+    """
+    Maximum number of input tokens fed into a single merge call. Defaults to a fraction of the
+    merge model's context window; NOTES_MERGE_MAX_TOKENS pins it to a fixed value.
+    """
+    if NOTES_MERGE_MAX_TOKENS:
+        return NOTES_MERGE_MAX_TOKENS
+    context_window = MODEL_CONTEXT_WINDOWS.get(model_name, DEFAULT_CONTEXT_WINDOW)
+    return int(context_window * NOTES_MERGE_CONTEXT_FRACTION)
+
+
+def _group_parts_for_merge(notes_parts: List[str], max_tokens: int) -> List[List[str]]:
+    groups = []
+    current_group = []
     current_tokens = 0
 
-    for part in notes_parts:
-        tokens = count_tokens(part)
-        if current_tokens + tokens > max_tokens and current_batch:
-            batches.append(current_batch)
-            current_batch = []
+    for part, tokens in zip(notes_parts, count_tokens_batch(notes_parts)):
+        if current_tokens + tokens > max_tokens and current_group:
+            groups.append(current_group)
+            current_group = []
             current_tokens = 0
-        current_batch.append(part)
+        current_group.append(part)
         current_tokens += tokens
-    if current_batch:
-        batches.append(current_batch)
+    if current_group:
+        groups.append(current_group)
+
+    # Every part is over budget on its own - pair them up, otherwise the reduction never shrinks.
+    if len(groups) == len(notes_parts) > 1:
+        groups = [notes_parts[i:i + 2] for i in range(0, len(notes_parts), 2)]
+    return groups
+
+
+async def recursive_merge(notes_parts: List[str], topic: str, focus: str, max_tokens: int = None) -> str:
+    """
+    Tree reduction of partial notes: each level groups the parts up to the merge token budget and
+    merges all groups of the level concurrently, until a single set of notes remains.
+    """
+    if not notes_parts:
+        return ""
 
-    merged_batches = [merge_notes(batch, topic, focus) for batch in batches]
+    max_tokens = max_tokens or merge_token_budget()
+    parts = notes_parts
+    level = 0
 
-    if len(merged_batches) == 1:
-        return merged_batches[0]
+    while True:
+        groups = _group_parts_for_merge(parts, max_tokens)
 
-    return recursive_merge(merged_batches, topic, focus, max_tokens=max_tokens)
+        started = time.perf_counter()
+        merged = await gather_limited([merge_notes(group, topic, focus) for group in groups], NOTES_MERGE_CONCURRENCY)
+        elapsed = time.perf_counter() - started
 
+        print(f"[INFO] Merge level {level}: {len(parts)} parts -> {len(merged)} in {elapsed:.1f}s "
+              f"(budget {max_tokens} tokens, concurrency {NOTES_MERGE_CONCURRENCY})")
 
-def combine(state: GraphState) -> GraphState:
-    merged = recursive_merge(state["partial_notes"], state["topic"], state["focus"])
+        if len(merged) == 1:
+            return merged[0]
+        parts = merged
+        level += 1
+
+
+async def combine(state: GraphState) -> GraphState:
+    merged = await recursive_merge(state["partial_notes"], state["topic"], state["focus"])
     return {**state, "notes": merged}
 
 
-def call_with_retry(api_call, max_retries=3):
+async def call_with_retry(api_call, max_retries=3):
+    """
+    Calls are already paced by the shared rate limiter; a 429 here means the configured budget is
+    off, so wait as long as OpenAI asks for instead of a fixed period.
+    """
     for i in range(max_retries):
         try:
-            return api_call()
-        except RateLimitError:
-            wait_time = 90
-            print(f"[Retry {i + 1}] Rate limit hit. Waiting {wait_time} seconds...")
-            time.sleep(wait_time)
+            return await api_call()
+        except RateLimitError as e:
+            wait_time = retry_after_seconds(e)
+            print(f"[Retry {i + 1}] Rate limit hit. Waiting {wait_time:.1f} seconds...")
+            await asyncio.sleep(wait_time)
     raise Exception("Rate limit exceeded after retries.")
 
 
@@ -360,10 +443,8 @@ def build_notes_generation_graph() -> Runnable:
 
 
 @traceable("enhance")
-def enhance_notes_with_agent(content: str, feedback: str, user_id: int, filenames: list[str]) -> str:
-    retriever = vectorstore.as_retriever(
-        search_kwargs={"k": 20, "filter": {"user_id": user_id, "filename": {"$in": filenames}}}
-    )
+async def enhance_notes_with_agent(content: str, feedback: str, user_id: int, filenames: list[str]) -> str:
+    retriever = user_retriever(user_id, filenames, k=20)
 
     context_tool = create_retriever_tool(
         retriever=retriever,
@@ -373,7 +454,7 @@ def enhance_notes_with_agent(content: str, feedback: str, user_id: int, filename
 
     tools = [context_tool]
 
-    llm = ChatOpenAI(model="gpt-4o", temperature=0.3)
+    llm = get_chat_model(model="gpt-4o", temperature=0.3)
     agent = initialize_agent(
         tools=tools,
         llm=llm,
@@ -396,73 +477,30 @@ def enhance_notes_with_agent(content: str, feedback: str, user_id: int, filename
         Do not remove image placeholders from note.
         """
 
-    response = agent.invoke({"input": prompt})
+    response = await agent.ainvoke({"input": prompt})
     return response["output"]
 
 
 @traceable(name="Retrieve all chunks for material")
-def get_all_chunks_for_material(user_id: int, filenames: List[str]) -> List[Dict[str, Any]]:
+def get_all_chunks_for_material(user_id: int, filenames: List[str]) -> Iterator[Dict[str, Any]]:
     """
-    Pobiera WSZYSTKIE chunki jako listę słowników z ich metadanymi z Pinecone
-    dla danego użytkownika i plików. Każdy słownik zawiera 'id' i 'text'.
+    Zwraca leniwie (strona po stronie) WSZYSTKIE chunki użytkownika dla danych plików.
+    Każdy słownik zawiera 'id', 'text' i 'metadata'.
     """
-    filters = {"user_id": user_id}
-    if filenames:
-        filters["filename"] = {"$in": filenames}
-
-    embedded_vector = embeddings.embed_query("")
-
-    response = vectorstore._index.query(
-        vector=embedded_vector,
-        top_k=9999,
-        filter=filters,
-        include_metadata=True
-    )
-
-    all_chunks = []
-    for match in response['matches']:
-        all_chunks.append({
-            "id": match['id'],
-            "text": match['metadata'].get('text', ''),
-            "metadata": match['metadata']
-        })
-
-    print(f"[INFO] Retrieved {len(all_chunks)} chunks from Pinecone for knowledge tree generation.")
-
-    return all_chunks
+    return iter_chunks(user_id, filenames=filenames)
 
 
 @traceable(name="Fetch Chunks by IDs")
 def get_chunks_by_ids(user_id: int, chunk_ids: List[str]) -> List[str]:
     """
     Pobiera treść tekstową chunków z Pinecone na podstawie listy ich ID.
-    Poprawiona wersja, zgodna z nowym API klienta Pinecone.
+    Chunki należące do innego użytkownika są pomijane.
     """
     if not chunk_ids:
         return []
 
     try:
-        fetch_response = vectorstore._index.fetch(ids=chunk_ids)
-
-        vectors = fetch_response.vectors
-        texts = []
-
-        for vector_data in vectors.values():
-            metadata = vector_data.metadata
-
-            if metadata and metadata.get('user_id') == user_id:
-                text = metadata.get('text', '')
-                if text:
-                    texts.append(text)
-            else:
-                chunk_id = vector_data.id
-                print(
-                    f"SECURITY WARNING/DATA MISMATCH: Attempt to fetch chunk {chunk_id} for user {user_id}, "
-                    f"but it belongs to another user or metadata is missing."
-                )
-
-        return texts
-
+        return [chunk["text"] for chunk in iter_chunks(user_id, chunk_ids=chunk_ids) if chunk["text"]]
     except Exception as e:
         print(f"An error occurred while fetching chunks by IDs from Pinecone: {e}")
-        return []
\ No newline at end of file
+        return []
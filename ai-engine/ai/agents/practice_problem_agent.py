@@ -1,18 +1,18 @@
 from langchain.output_parsers import PydanticOutputParser
-from langchain_openai import ChatOpenAI
 from langsmith import traceable
 
+from ai.core.llm import get_chat_model
 from ai.schemas.problem_practice import ProblemGenerationParams, PracticeProblemOutput
 
 
 @traceable(name="Generate Practice Problem Agent")
-def generate_practice_problem(params: ProblemGenerationParams, model: str,
+async def generate_practice_problem(params: ProblemGenerationParams, model: str,
                               temperature: float) -> PracticeProblemOutput | None:
     """
     Agent specializing in creating a practice problem or task based on a given context.
     The goal is to generate a problem that requires the user to apply their knowledge.
     """
-    llm = ChatOpenAI(model=model, temperature=temperature, model_kwargs={"response_format": {"type": "json_object"}})
+    llm = get_chat_model(model=model, temperature=temperature, model_kwargs={"response_format": {"type": "json_object"}})
     parser = PydanticOutputParser(pydantic_object=PracticeProblemOutput)
     format_instructions = parser.get_format_instructions()
 
@@ -39,7 +39,7 @@ def generate_practice_problem(params: ProblemGenerationParams, model: str,
     """
 
     try:
-        response = llm.invoke(prompt)
+        response = await llm.ainvoke(prompt)
         return parser.parse(response.content)
     except Exception as e:
         print(f"Error in practice_problem_agent for subtopic '{params.subtopic_name}': {e}")
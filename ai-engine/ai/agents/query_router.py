@@ -0,0 +1,175 @@
+import os
+import re
+from typing import List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from langsmith import traceable
+
+from ai.core import metrics
+from ai.core.chat_memory import BoundedChatMessageHistory
+from ai.tools.tools import aanswer_from_documents, asearch_web, ause_calculator
+
+CHAT_ROUTER_ENABLED = os.getenv("CHAT_ROUTER_ENABLED", "true").lower() == "true"
+
+CONVERSATIONAL = "conversational"
+ARITHMETIC = "arithmetic"
+DOCUMENT = "document"
+WEB = "web"
+AGENT = "agent"
+
+# "!" is not accepted after the expression: "5+3!" is a factorial, not an exclamation.
+_ARITHMETIC_RE = re.compile(
+    r"^\s*(?:(?P<lead>ile\s+(?:to\s+)?(?:jest\s+)?|oblicz|policz|what\s+is|calculate|compute)\s*:?)?\s*"
+    r"(?P<expr>[\d\s.,+\-*/^%()]*\d[\d\s.,+\-*/^%()]*[+\-*/^%][\d\s.,+\-*/^%()]*?)\s*(?P<tail>[?=.\s]*)$",
+    re.IGNORECASE
+)
+# "1939-1945" or "10-12" is a range, not a subtraction, unless the message asks for a result.
+_RANGE_RE = re.compile(r"^\d+\s*[-–]\s*\d+$")
+# The whole message is a greeting or thanks, optionally with a name ("Cześć Ania!") and punctuation.
+_CONVERSATIONAL_RE = re.compile(
+    r"^\s*(cześć|czesc|hej|hejka|siema|witaj|witam|dzień dobry|dzien dobry|dobry wieczór|hello|hi|hey|"
+    r"dzięki|dzieki|dziękuję|dziekuje|thanks|thank you|ok|okej|super|świetnie|jasne|"
+    r"pa|do widzenia|na razie)"
+    r"(\s+(bardzo|wielkie|serdeczne|so much|a lot))?"
+    r"([\s,]+(?-i:[A-ZĄĆĘŁŃÓŚŹŻ][a-ząćęłńóśźż]+))?"
+    r"[\s!.,:)]*$",
+    re.IGNORECASE
+)
+_QUESTION_RE = re.compile(
+    r"\?|\b(co|czym|czego|kto|kim|kogo|jak|jaki\w*|jaka|jakie|dlaczego|czemu|gdzie|kiedy|ile|który\w*|czy|"
+    r"wyjaśnij|wyjasnij|wytłumacz|wytlumacz|opisz|podaj|what|who|why|how|where|when|which|explain)\b",
+    re.IGNORECASE
+)
+# Questions about current events. They still go to the user's documents first and to the web only if those
+# have no answer.
+_WEB_RE = re.compile(
+    r"\b(dzisiaj|dziś|wczoraj|jutro|teraz|obecnie|aktualn\w*|najnowsz\w*|ostatni\w* (wiadomości|wydarzenia)|"
+    r"wiadomości|pogod\w*|kurs\w*|notowani\w*|wynik\w* meczu|today|latest|current|news|weather)\b",
+    re.IGNORECASE
+)
+# Follow-ups that lean on the conversation, and requests that need several steps, go to the agent.
+_AGENT_RE = re.compile(
+    r"\b(porównaj|porownaj|a potem|następnie|nastepnie|krok po kroku|najpierw|oraz oblicz|i oblicz|"
+    r"wcześniej|wczesniej|poprzedni\w*|powyższ\w*|to samo|jeszcze raz|rozwiń|rozwin|"
+    r"compare|and then|previous|above)\b",
+    re.IGNORECASE
+)
+_FOLLOW_UP_RE = re.compile(r"^\s*(a|i|to|ten|ta|tamto|tego|tej|dlaczego\?|czemu\?|and|what about)\b", re.IGNORECASE)
+
+MAX_SINGLE_HOP_WORDS = 40
+# Fast path answers see this many of the latest messages, so that a short follow-up still has its context.
+FAST_PATH_HISTORY_MESSAGES = int(os.getenv("FAST_PATH_HISTORY_MESSAGES", "6"))
+
+_NOT_FOUND_PREFIXES = ("No relevant information", "Error:", "An error occurred")
+
+
+def classify_query(message: str, web_search: bool) -> str:
+    """Cheap, LLM-free routing decision for a chat message."""
+    if not CHAT_ROUTER_ENABLED:
+        return AGENT
+    arithmetic = _ARITHMETIC_RE.match(message)
+    if arithmetic and (
+            arithmetic.group("lead") or "=" in arithmetic.group("tail")
+            or not _RANGE_RE.match(arithmetic.group("expr").strip())
+    ):
+        return ARITHMETIC
+    if _CONVERSATIONAL_RE.match(message) and not _QUESTION_RE.search(message):
+        return CONVERSATIONAL
+    if (
+            _AGENT_RE.search(message)
+            or _FOLLOW_UP_RE.match(message)
+            or message.count("?") > 1
+            or len(message.split()) > MAX_SINGLE_HOP_WORDS
+    ):
+        return AGENT
+    if web_search and _WEB_RE.search(message):
+        return WEB
+    return DOCUMENT
+
+
+async def _conversational_answer(message: str, history: BoundedChatMessageHistory, llm) -> str:
+    system = SystemMessage(content=(
+        "Odpowiadaj wyłącznie w języku polskim. To jest BARDZO WAŻNE. Jesteś pomocnym asystentem nauki. "
+        "Odpowiedz krótko i naturalnie na podstawie historii rozmowy."
+    ))
+    history_messages = await history.aget_messages()
+    return (await llm.ainvoke([system, *history_messages, HumanMessage(content=message)])).content
+
+
+def _grounded_answer_messages(message: str, source: str, material: str,
+                              history_messages: List[BaseMessage]) -> List[BaseMessage]:
+    """Polish answer grounded in `material`, with the latest turns of the conversation for follow-ups."""
+    system = SystemMessage(content=(
+        "Odpowiadaj wyłącznie w języku polskim. To jest BARDZO WAŻNE. Jesteś pomocnym asystentem nauki.\n"
+        f"Odpowiedz zwięźle na ostatnie pytanie użytkownika, korzystając WYŁĄCZNIE z poniższych {source}. "
+        "Historia rozmowy służy tylko do zrozumienia, o co pyta użytkownik. "
+        "Powołuj się na fragmenty ich numerami, np. [1], jeśli są ponumerowane. "
+        "Jeśli nie zawierają odpowiedzi, odpowiedz dokładnie: BRAK\n\n"
+        f"{material}"
+    ))
+    recent = history_messages[-FAST_PATH_HISTORY_MESSAGES:] if FAST_PATH_HISTORY_MESSAGES > 0 else []
+    return [system, *recent, HumanMessage(content=message)]
+
+
+async def _grounded_answer(message: str, source: str, material: str, history: BoundedChatMessageHistory,
+                           llm) -> Optional[str]:
+    history_messages = await history.aget_messages()
+    answer = (await llm.ainvoke(_grounded_answer_messages(message, source, material, history_messages))).content
+    answer = answer.strip()
+    return None if answer == "BRAK" else answer
+
+
+async def _document_answer(message: str, user_id: int, filenames: List, history: BoundedChatMessageHistory,
+                           llm, cohere_client=None) -> Optional[str]:
+    # Only retrieval and rerank come from the RAG tool; its own synthesis prompt knows neither the
+    # language rule nor the conversation.
+    context = await aanswer_from_documents(
+        message, user_id=user_id, llm=llm, filenames=filenames, cohere_client=cohere_client, mode="context"
+    )
+    if context.startswith(_NOT_FOUND_PREFIXES):
+        return None
+    return await _grounded_answer(message, "fragmentów dokumentów użytkownika", context, history, llm)
+
+
+async def _web_answer(message: str, user_id: int, history: BoundedChatMessageHistory, llm) -> Optional[str]:
+    results = await asearch_web(message, user_id=user_id, llm=llm)
+    if not results:
+        return None
+    return await _grounded_answer(message, "wyników wyszukiwania", f"Wyniki wyszukiwania:\n{results}", history, llm)
+
+
+@traceable(name="Chat Fast Path")
+async def answer_directly(route: str, message: str, user_id: int, session_id: str, filenames: List, llm,
+                    cohere_client=None) -> Optional[str]:
+    """
+    Answers a single-hop message without the agent loop and records the turn in the session history.
+    Returns None when the fast path has no answer, so that the caller falls back to the agent.
+    The WEB route asks the user's documents first and searches the web only if they have no answer.
+    """
+    history = BoundedChatMessageHistory(session_id=f"chat:{session_id}")
+
+    if route == CONVERSATIONAL:
+        answer = await _conversational_answer(message, history, llm)
+    elif route == ARITHMETIC:
+        result = await ause_calculator(_ARITHMETIC_RE.match(message).group("expr").strip(), llm=llm)
+        answer = None if result.startswith(("Error", "Calculation failed")) else result
+    elif route in (DOCUMENT, WEB):
+        answer = await _document_answer(message, user_id, filenames, history, llm, cohere_client)
+        if answer is None and route == WEB:
+            answer = await _web_answer(message, user_id, history, llm)
+    else:
+        answer = None
+
+    if answer is None:
+        return None
+
+    await history.aadd_messages([HumanMessage(content=message), AIMessage(content=answer)])
+    return answer
+
+
+async def record_route(route: str, elapsed_seconds: float, fallback_from: Optional[str] = None) -> None:
+    """Counts the path that produced the answer, its total time, and fast paths that handed over to the agent."""
+    await metrics.aincrement("chat_router", route)
+    await metrics.aincrement("chat_router", f"{route}_ms_total", elapsed_seconds * 1000)
+    if fallback_from:
+        await metrics.aincrement("chat_router", f"{fallback_from}_fallbacks")
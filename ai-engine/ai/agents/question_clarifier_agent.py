@@ -1,5 +1,4 @@
 import functools
-import os
 from typing import List
 
 import cohere
@@ -8,12 +7,12 @@ from langchain.agents import (
     create_openai_tools_agent
 )
 from langchain.memory import ConversationBufferMemory
-from langchain_community.chat_message_histories import RedisChatMessageHistory
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.tools import Tool
-from langchain_openai import ChatOpenAI
 
-from ai.tools.tools import search_web, answer_from_documents
+from ai.core.chat_memory import BoundedChatMessageHistory
+from ai.core.llm import get_chat_model
+from ai.tools.tools import search_web, asearch_web, answer_from_documents, aanswer_from_documents
 
 try:
     co_client = cohere.Client()
@@ -22,7 +21,7 @@ except cohere.errors.CohereError:
     co_client = None
 
 
-def clarify_question_agent(
+async def clarify_question_agent(
         user_id: int,
         original_question: str,
         user_message: str,
@@ -41,10 +40,10 @@ def clarify_question_agent(
     The conversation history for this agent is temporary and will expire after a period of inactivity.
     """
     try:
-        llm = ChatOpenAI(
-            api_key=api_key,
-            model_name=model,
-            temperature=temperature
+        llm = get_chat_model(
+            model=model,
+            temperature=temperature,
+            api_key=api_key
         )
         search_web_with_context = functools.partial(
             search_web.func, user_id=user_id, llm=llm
@@ -52,6 +51,7 @@ def clarify_question_agent(
         search_web_tool = Tool(
             name="search_web",
             func=search_web_with_context,
+            coroutine=functools.partial(asearch_web, user_id=user_id, llm=llm),
             description=search_web.description
         )
 
@@ -65,6 +65,13 @@ def clarify_question_agent(
         rag_tool = Tool(
             name="answer_from_documents",
             func=answer_from_docs_with_context,
+            coroutine=functools.partial(
+                aanswer_from_documents,
+                user_id=user_id,
+                llm=llm,
+                filenames=sources,
+                cohere_client=co_client
+            ),
             description=answer_from_documents.description
         )
 
@@ -94,14 +101,8 @@ def clarify_question_agent(
             MessagesPlaceholder(variable_name="agent_scratchpad"),
         ])
 
-        redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
-        if "localhost" in redis_url:
-            print(
-                "Warning: REDIS_URL is not set and is defaulting to localhost. This will not work in Docker. Please set REDIS_URL=redis://redis:6379/0 in your .env file.")
-
-        message_history = RedisChatMessageHistory(
+        message_history = BoundedChatMessageHistory(
             session_id=f"clarification_chat:{session_id}",
-            url=redis_url,
             ttl=history_ttl_seconds
         )
 
@@ -122,7 +123,7 @@ def clarify_question_agent(
             max_iterations=4
         )
 
-        response = agent_executor.invoke({"input": user_message})
+        response = await agent_executor.ainvoke({"input": user_message})
         return response.get("output", "An error occurred while processing the response.")
 
     except Exception as e:
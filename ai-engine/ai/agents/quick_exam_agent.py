@@ -1,9 +1,9 @@
 import asyncio
 from typing import List, Dict, Any
-from langchain_openai import ChatOpenAI
 from langchain.output_parsers import PydanticOutputParser
 from langchain.prompts import PromptTemplate
 from fastapi import Depends
+from ai.core.llm import get_chat_model
 from ai.agents.notes_agent import get_chunks_by_ids
 from ai.schemas.quick_exam_sm import (
     QuickExamParams, QuickExam, TrueFalseQuestion,
@@ -124,11 +124,11 @@ async def generate_quick_exam(params: QuickExamParams, model: str, temperature:
     if not all_chunk_ids:
         raise ValueError("No content found for the selected topics.")
 
-    chunk_texts = get_chunks_by_ids(user_id=params.user_id, chunk_ids=list(set(all_chunk_ids)))
+    chunk_texts = await asyncio.to_thread(get_chunks_by_ids, params.user_id, list(set(all_chunk_ids)))
     full_context = "\n\n".join(chunk_texts)
     topics_str = ", ".join(params.topics)
 
-    llm = ChatOpenAI(model_name=model, temperature=temperature)
+    llm = get_chat_model(model=model, temperature=temperature)
 
     tasks = [
         _generate_tf_questions(llm, full_context, topics_str),
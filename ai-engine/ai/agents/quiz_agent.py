@@ -1,22 +1,23 @@
+import asyncio
 import math
 import random
 from typing import List, Dict, Any, Optional
-from langchain_openai import ChatOpenAI
 from langchain.output_parsers import PydanticOutputParser
 from langchain.prompts import PromptTemplate
 from dotenv import load_dotenv
+from ai.core.llm import get_chat_model
 from ai.agents.notes_agent import get_chunks_by_ids
 from ai.schemas.quiz import Question, QuestionList, QuizFromTreeParams
 load_dotenv()
 
 
-def generate_quiz(params: QuizFromTreeParams, model: str, temperature: float) -> QuestionList:
+async def generate_quiz(params: QuizFromTreeParams, model: str, temperature: float) -> QuestionList:
     """
     Generuje quiz, inteligentnie wybierając PODTEMATY z drzewa wiedzy
     i przypisując pytaniom jednoznaczny temat w formacie "Główny Temat / Podtemat".
     """
     try:
-        llm = ChatOpenAI(model_name=model, temperature=temperature)
+        llm = get_chat_model(model=model, temperature=temperature, cache=True)
         parser = PydanticOutputParser(pydantic_object=QuestionList)
         format_instructions = parser.get_format_instructions()
         subtopics_to_cover = []
@@ -84,7 +85,7 @@ def generate_quiz(params: QuizFromTreeParams, model: str, temperature: float) ->
             if len(all_questions) >= params.total_questions_needed:
                 break
 
-            chunk_texts = get_chunks_by_ids(user_id=params.user_id, chunk_ids=subtopic_data["chunk_ids"])
+            chunk_texts = await asyncio.to_thread(get_chunks_by_ids, params.user_id, subtopic_data["chunk_ids"])
             if not chunk_texts:
                 continue
 
@@ -97,7 +98,7 @@ def generate_quiz(params: QuizFromTreeParams, model: str, temperature: float) ->
             print(f"Generating {num_questions} questions for subtopic: '{topic_path_str}'")
 
             try:
-                quiz_part = chain.invoke({
+                quiz_part = await chain.ainvoke({
                     "context": context,
                     "main_topic": main_topic,
                     "subtopic_name": subtopic_name,
@@ -1,9 +1,10 @@
+import asyncio
 import uuid
 from typing import List, Dict, Any, Optional
 from langchain.output_parsers import PydanticOutputParser
-from langchain_openai import ChatOpenAI
 from langsmith import traceable
 
+from ai.core.llm import get_chat_model
 from ai.schemas.knowledge_tree import KnowledgeTreeParams, KnowledgeTreeNode, KnowledgeTree
 from ai.agents.notes_agent import get_all_chunks_for_material
 
@@ -115,24 +116,24 @@ def _add_user_metadata_to_tree(nodes: Optional[List[KnowledgeTreeNode]]) -> List
 #     return knowledge_tree
 
 @traceable(name="Generate Knowledge Tree")
-def generate_knowledge_tree(params: KnowledgeTreeParams, model: str, temperature: float) -> Dict[str, Any]:
+async def generate_knowledge_tree(params: KnowledgeTreeParams, model: str, temperature: float) -> Dict[str, Any]:
     """
     Główna funkcja agenta, która generuje kompletne, zagnieżdżone drzewo wiedzy.
     """
-    all_chunks = get_all_chunks_for_material(user_id=int(params.user_id), filenames=params.filenames)
+    all_chunks = await asyncio.to_thread(list, get_all_chunks_for_material(user_id=int(params.user_id), filenames=params.filenames))
 
-    if not all_chunks:
+    context_with_ids = "\n\n".join(
+        f'---CHUNK START---\nchunk_id: {chunk["id"]}\ntext: {chunk["text"]}\n---CHUNK END---' for chunk in all_chunks)
+
+    if not context_with_ids:
         return {"tree": []}
 
     # Dodajemy model_kwargs, aby wymusić odpowiedź JSON (działa z nowszymi modelami OpenAI)
-    llm = ChatOpenAI(model=model, temperature=temperature, model_kwargs={"response_format": {"type": "json_object"}})
+    llm = get_chat_model(model=model, temperature=temperature, cache=True, model_kwargs={"response_format": {"type": "json_object"}})
     # Używamy nowego schematu KnowledgeTree
     parser = PydanticOutputParser(pydantic_object=KnowledgeTree)
     format_instructions = parser.get_format_instructions()
 
-    context_with_ids = "\n\n".join(
-        [f'---CHUNK START---\nchunk_id: {chunk["id"]}\ntext: {chunk["text"]}\n---CHUNK END---' for chunk in all_chunks])
-
     prompt = f"""
         You are an expert curriculum designer. Your task is to analyze a collection of text chunks and organize them into a deeply nested, hierarchical knowledge tree (3-4 levels deep).
 
@@ -154,7 +155,7 @@ def generate_knowledge_tree(params: KnowledgeTreeParams, model: str, temperature
     """
 
     try:
-        llm_response = llm.invoke(prompt)
+        llm_response = await llm.ainvoke(prompt)
         parsed_tree = parser.parse(llm_response.content)
         final_tree_dict = _add_user_metadata_to_tree(parsed_tree.tree)
         return {"tree": final_tree_dict}
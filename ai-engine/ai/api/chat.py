@@ -2,6 +2,7 @@ import os
 
 from dotenv import load_dotenv
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 
 from ai.schemas.chat import ChatResponse, ChatRequest
 from ai.services.chat_service import ChatService
@@ -42,7 +43,7 @@ async def chat(chat_request: ChatRequest):
     model = chat_request.model if chat_request.model else default_model
     temperature = chat_request.temperature if chat_request.temperature is not None else default_temperature
 
-    response_content = openai_service.get_response(
+    response_content = await openai_service.get_response(
         human_message=human_message,
         model=model,
         temperature=temperature,
@@ -60,3 +61,31 @@ async def chat(chat_request: ChatRequest):
         return ChatResponse(response=response_content)
     else:
         raise HTTPException(status_code=500, detail="Failed to get response from OpenAI")
+
+
+@router.post("/send/message/stream")
+async def chat_stream(chat_request: ChatRequest):
+    """Streams the agent's answer as server-sent events (token, tool_start, tool_end, done/error)."""
+    if not chat_request.human_message:
+        raise HTTPException(status_code=400, detail="Human message is required")
+
+    if not chat_request.session_id:
+        raise HTTPException(status_code=400, detail="Session ID is required")
+
+    model = chat_request.model if chat_request.model else default_model
+    temperature = chat_request.temperature if chat_request.temperature is not None else default_temperature
+
+    events = openai_service.stream_response(
+        human_message=chat_request.human_message,
+        model=model,
+        temperature=temperature,
+        user_id=chat_request.user_id,
+        session_id=chat_request.session_id,
+        filenames=chat_request.filenames,
+        web_search=chat_request.internet_connection
+    )
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
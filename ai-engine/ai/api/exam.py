@@ -3,7 +3,7 @@ import os
 from dotenv import load_dotenv
 from fastapi import APIRouter
 
-from ai.schemas.exam import ExamGenerateParams, QuestionClarificationPayload, TextQuestion
+from ai.schemas.exam import ExamGenerateParams, QuestionClarificationPayload, TextAnswerBatch, TextQuestion
 from ai.services.exam_service import ExamService
 
 router = APIRouter()
@@ -25,22 +25,28 @@ exam_service = ExamService(
 
 
 @router.post("/")
-def generate_questions(exam_params: ExamGenerateParams):
-    questions = exam_service.generate_questions(exam_params)
+async def generate_questions(exam_params: ExamGenerateParams):
+    questions = await exam_service.generate_questions(exam_params)
     return {"questions": questions}
 
 
 @router.post("/question/clarify")
-def handle_clarification(payload: QuestionClarificationPayload):
+async def handle_clarification(payload: QuestionClarificationPayload):
     """
     Receives a clarification request from the main backend,
     processes it with the clarification agent, and returns the AI's response.
     """
-    response_text = exam_service.clarify_question(payload)
+    response_text = await exam_service.clarify_question(payload)
     return {"response": response_text}
 
 
 @router.post("/check")
-def check_answer(question: TextQuestion):
-    answer = exam_service.check_answer(question)
+async def check_answer(question: TextQuestion):
+    answer = await exam_service.check_answer(question)
     return {"answer": answer}
+
+
+@router.post("/check/batch")
+async def check_answers(batch: TextAnswerBatch):
+    answers = await exam_service.check_answers(batch)
+    return {"answers": answers}
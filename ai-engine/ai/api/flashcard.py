@@ -21,6 +21,6 @@ flashcard_service = FlashcardService(openai_key, default_model, default_temperat
 
 
 @router.post("/")
-def generate_quiz(flashcard_params: FlashcardGenerateParams):
-    flashcard_response = flashcard_service.generate_flashcard(flashcard_params)
+async def generate_quiz(flashcard_params: FlashcardGenerateParams):
+    flashcard_response = await flashcard_service.generate_flashcard(flashcard_params)
     return flashcard_response
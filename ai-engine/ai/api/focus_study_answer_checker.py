@@ -20,9 +20,9 @@ practice_service = PracticeService(
 )
 
 @router.post("/grade", response_model=GradePracticeNoteResponse)
-def grade_practice_endpoint(params: GradePracticeParams):
+async def grade_practice_endpoint(params: GradePracticeParams):
     try:
-        note = practice_service.grade_note(params)
+        note = await practice_service.grade_note(params)
         return GradePracticeNoteResponse(problem_id=params.problem.id, note=note)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
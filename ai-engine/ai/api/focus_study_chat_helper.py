@@ -29,11 +29,11 @@ focus_study_helper = FocusStudyChatHelperService(
     "/chat",
     response_model=ChatResponse
 )
-def focus_study_chat(
+async def focus_study_chat(
         params: FocusStudyHelperParams
 ):
     try:
-        response_text = focus_study_helper.clarify_question(params)
+        response_text = await focus_study_helper.clarify_question(params)
 
         return ChatResponse(response=response_text)
 
@@ -17,8 +17,8 @@ key_concept_service = KeyConceptService(openai_key, default_model, default_tempe
     response_model=KeyConceptOutput,
     summary="Generate a single Key Concept"
 )
-def generate_single_concept_endpoint(params: SingleConceptParams):
+async def generate_single_concept_endpoint(params: SingleConceptParams):
     try:
-        return key_concept_service.create_single_concept(params)
+        return await key_concept_service.create_single_concept(params)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -27,9 +27,9 @@ knowledge_tree_service = KnowledgeTreeService(openai_key, default_model, default
     "/knowledge-tree/generate",
     summary="Generate a Knowledge Tree from user materials"
 )
-def generate_tree_endpoint(params: KnowledgeTreeCreateRequest) -> Dict[str, Any]:
+async def generate_tree_endpoint(params: KnowledgeTreeCreateRequest) -> Dict[str, Any]:
     try:
-        knowledge_tree = knowledge_tree_service.create_user_knowledge_tree(params)
+        knowledge_tree = await knowledge_tree_service.create_user_knowledge_tree(params)
         return knowledge_tree
     except Exception as e:
         print(f"Error in AI engine while generating tree: {e}")
@@ -0,0 +1,18 @@
+from fastapi import APIRouter
+
+from ai.core import metrics
+from ai.core.embedding_cache import query_embedding_cache
+from ai.core.llm_cache import llm_cache
+from ai.tools.web_search import web_search_cache
+
+router = APIRouter()
+
+
+@router.get("", summary="Runtime counters of the AI engine")
+def get_metrics():
+    return {
+        "llm_cache": llm_cache.stats(),
+        "web_search_cache": web_search_cache.stats(),
+        "query_embedding_cache": query_embedding_cache.stats(),
+        "chat_router": metrics.read("chat_router"),
+    }
@@ -40,14 +40,14 @@ def clean_output(content: str):
 
 
 @router.post("/generate")
-def generate(notes_data: NotesGenerate):
-    content = notes_service.generate_notes(notes_data)
+async def generate(notes_data: NotesGenerate):
+    content = await notes_service.generate_notes(notes_data)
     cleaned = clean_output(content)
     return {"content": cleaned}
 
 
 @router.post("/enhance")
-def enhance(notes_data: NoteEnhance):
-    content = notes_service.enhance_notes(notes_data)
+async def enhance(notes_data: NoteEnhance):
+    content = await notes_service.enhance_notes(notes_data)
     cleaned = clean_output(content)
     return {"content": cleaned}
@@ -1,25 +1,50 @@
+import asyncio
+from typing import Optional
+
 from fastapi import APIRouter, UploadFile, File, HTTPException, Body, Query
 
-from ai.services.pinecone_service import ingest_uploaded_file_to_knowledge_base, delete_file_embeddings, \
+from ai.services.ingestion_jobs import JobQueueError, SpoolError, spool_upload, submit_ingestion, get_job
+from ai.services.pinecone_service import UnsupportedFileTypeError, delete_file_embeddings, \
     ingest_url_to_knowledge_base
 
 router = APIRouter()
 
 
-@router.post("/upload")
-def insert(user_id: int, upload_file: UploadFile = File(...)):
+@router.post("/upload", status_code=202)
+async def insert(user_id: int, upload_file: UploadFile = File(...), reingest: bool = False,
+                 file_id: Optional[int] = None):
     try:
-        ingest_uploaded_file_to_knowledge_base(upload_file, user_id)
+        path = await asyncio.to_thread(spool_upload, upload_file)
+        job_id = submit_ingestion(path, upload_file.filename, user_id, reingest=reingest, file_id=file_id)
+    except UnsupportedFileTypeError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except SpoolError:
+        raise HTTPException(status_code=507, detail="Could not store uploaded file")
+    except JobQueueError:
+        raise HTTPException(status_code=503, detail="Ingestion queue unavailable")
     except Exception:
-        raise HTTPException(status_code=400, detail="Unknown error")
+        raise HTTPException(status_code=500, detail="Could not accept file")
+
+    return {"message": "File accepted", "job_id": job_id}
+
+
+@router.get("/jobs/{job_id}")
+def job_status(job_id: str, user_id: int):
+    try:
+        job = get_job(job_id)
+    except Exception:
+        raise HTTPException(status_code=503, detail="Job status unavailable")
+
+    if job is None or job["user_id"] != user_id:
+        raise HTTPException(status_code=404, detail="Job not found")
 
-    return {"message": "File uploaded"}
+    return job
 
 
 @router.post("/upload/url")
-def insert(url: str = Body(...), user_id: int = Query(...)):
+def insert(url: str = Body(...), user_id: int = Query(...), reingest: bool = Query(False)):
     try:
-        ingest_url_to_knowledge_base(url, user_id)
+        ingest_url_to_knowledge_base(url, user_id, reingest=reingest)
     except Exception:
         raise HTTPException(status_code=400, detail="Unknown error")
 
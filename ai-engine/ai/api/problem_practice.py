@@ -16,12 +16,12 @@ problem_service = PracticeProblemService(openai_key, default_model, default_temp
     response_model=PracticeProblemOutput,
     summary="Generate a single Practice Problem for a topic"
 )
-def generate_single_problem_endpoint(params: ProblemGenerationParams):
+async def generate_single_problem_endpoint(params: ProblemGenerationParams):
     """
     This endpoint is called by the main backend to generate one practice problem
     based on the provided context.
     """
     try:
-        return problem_service.create_single_problem(params)
+        return await problem_service.create_single_problem(params)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
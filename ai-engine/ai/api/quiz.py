@@ -21,6 +21,6 @@ quiz_service = QuizService(openai_key, default_model, default_temperature)
 
 
 @router.post("/")
-def generate_quiz(quiz_params: QuizFromTreeParams):
-    quiz = quiz_service.generate_quiz(quiz_params)
+async def generate_quiz(quiz_params: QuizFromTreeParams):
+    quiz = await quiz_service.generate_quiz(quiz_params)
     return {"quiz": quiz}
@@ -0,0 +1,238 @@
+import asyncio
+import json
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Set, Tuple
+
+import redis
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, SystemMessage, messages_from_dict, message_to_dict
+
+from ai.core.llm import get_chat_model
+from ai.core.redis_client import get_redis, get_async_redis
+from ai.core.tokens import count_tokens_batch
+
+# Token budget of the verbatim part of the history that goes into a prompt. Older turns are folded into
+# a rolling summary once the unsummarised tail exceeds it; the tail is then cut to half the budget.
+CHAT_MEMORY_MAX_TOKENS = int(os.getenv("CHAT_MEMORY_MAX_TOKENS", "2000"))
+CHAT_SUMMARY_MODEL = os.getenv("CHAT_SUMMARY_MODEL", "gpt-4o-mini")
+# Summarising runs off the request path; one compaction per session at a time, guarded by a Redis lock.
+CHAT_SUMMARY_WORKERS = int(os.getenv("CHAT_SUMMARY_WORKERS", "2"))
+CHAT_SUMMARY_LOCK_SECONDS = int(os.getenv("CHAT_SUMMARY_LOCK_SECONDS", "120"))
+
+_compaction_pool = ThreadPoolExecutor(max_workers=CHAT_SUMMARY_WORKERS, thread_name_prefix="chat-summary")
+_background_tasks: Set[asyncio.Task] = set()
+
+# Stores the new summary only if `covered` is still the value it was computed from.
+_SAVE_SUMMARY_SCRIPT = """
+local covered = tonumber(redis.call('HGET', KEYS[1], 'covered') or '0')
+if covered ~= tonumber(ARGV[3]) then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'summary', ARGV[1], 'covered', ARGV[2])
+if tonumber(ARGV[4]) > 0 then
+    redis.call('EXPIRE', KEYS[1], ARGV[4])
+end
+return 1
+"""
+
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+SUMMARY_PROMPT = """Odpowiadaj wyłącznie w języku polskim. Streszczasz przebieg rozmowy użytkownika z asystentem.
+Zachowaj fakty, ustalenia, imiona, liczby i otwarte wątki, które mogą być potrzebne w dalszej rozmowie.
+Pomiń uprzejmości. Streszczenie ma mieć najwyżej 200 słów.
+
+Dotychczasowe streszczenie:
+{summary}
+
+Nowe wiadomości do uwzględnienia:
+{messages}
+
+Zaktualizowane streszczenie:"""
+
+
+def _message_text(message: BaseMessage) -> str:
+    return message.content if isinstance(message.content, str) else json.dumps(message.content)
+
+
+class BoundedChatMessageHistory(BaseChatMessageHistory):
+    """
+    Redis chat history that exposes a bounded view: a rolling summary of older turns plus the most recent
+    messages within `max_tokens`. The full history stays in the same `message_store:<session_id>` list
+    that RedisChatMessageHistory uses, so existing sessions keep working. Connections come from the
+    shared pool in ai.core.redis_client; `ttl` (if set) is renewed on every write.
+    Writes return right away: summarising is scheduled in the background, and until it finishes reads
+    still get the newest messages within the budget.
+    """
+
+    def __init__(self, session_id: str, ttl: Optional[int] = None, max_tokens: int = CHAT_MEMORY_MAX_TOKENS,
+                 key_prefix: str = "message_store:"):
+        self.session_id = session_id
+        self.ttl = ttl
+        self.max_tokens = max_tokens
+        self.key = key_prefix + session_id
+        self.summary_key = f"message_summary:{session_id}"
+        self.lock_key = f"message_summary_lock:{session_id}"
+        self.redis = get_redis()
+
+    @staticmethod
+    def _tail_bounds(meta: dict, total: int) -> Tuple[str, int]:
+        summary = meta.get(b"summary", b"").decode("utf-8")
+        covered = min(int(meta.get(b"covered", 0)), total)
+        return summary, covered
+
+    @staticmethod
+    def _decode(raw: List[bytes]) -> List[BaseMessage]:
+        # Messages are LPUSHed, so the newest ones sit at the head of the list.
+        return messages_from_dict([json.loads(item.decode("utf-8")) for item in reversed(raw)])
+
+    def _load_tail(self) -> Tuple[str, int, List[BaseMessage]]:
+        """Current summary, number of messages it covers, and the messages after it (oldest first)."""
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hgetall(self.summary_key)
+        pipe.llen(self.key)
+        meta, total = pipe.execute()
+
+        summary, covered = self._tail_bounds(meta, total)
+        raw = self.redis.lrange(self.key, 0, total - covered - 1) if total > covered else []
+        return summary, covered, self._decode(raw)
+
+    async def _aload_tail(self) -> Tuple[str, int, List[BaseMessage]]:
+        client = get_async_redis()
+        pipe = client.pipeline(transaction=False)
+        pipe.hgetall(self.summary_key)
+        pipe.llen(self.key)
+        meta, total = await pipe.execute()
+
+        summary, covered = self._tail_bounds(meta, total)
+        raw = await client.lrange(self.key, 0, total - covered - 1) if total > covered else []
+        return summary, covered, self._decode(raw)
+
+    @staticmethod
+    def _newest_within(counts: List[int], budget: int) -> int:
+        """How many of the newest messages fit into `budget` tokens."""
+        used = kept = 0
+        for count in reversed(counts):
+            if used + count > budget:
+                break
+            used += count
+            kept += 1
+        return kept
+
+    def _bounded_view(self, summary: str, tail: List[BaseMessage]) -> List[BaseMessage]:
+        counts = count_tokens_batch([_message_text(message) for message in tail])
+        # The tail normally fits already; this only matters if summarising has been failing.
+        kept = self._newest_within(counts, self.max_tokens)
+        recent = tail[len(tail) - kept:]
+
+        if not summary:
+            return recent
+        return [SystemMessage(content=f"Streszczenie wcześniejszej części rozmowy:\n{summary}")] + recent
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        summary, _, tail = self._load_tail()
+        return self._bounded_view(summary, tail)
+
+    async def aget_messages(self) -> List[BaseMessage]:
+        summary, _, tail = await self._aload_tail()
+        return self._bounded_view(summary, tail)
+
+    def _queue_push(self, pipe, messages: Sequence[BaseMessage]) -> None:
+        for message in messages:
+            pipe.lpush(self.key, json.dumps(message_to_dict(message)))
+        if self.ttl:
+            pipe.expire(self.key, self.ttl)
+            pipe.expire(self.summary_key, self.ttl)
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        pipe = self.redis.pipeline(transaction=False)
+        self._queue_push(pipe, messages)
+        pipe.execute()
+        _compaction_pool.submit(self._compact_in_background)
+
+    async def aadd_messages(self, messages: Sequence[BaseMessage]) -> None:
+        pipe = get_async_redis().pipeline(transaction=False)
+        self._queue_push(pipe, messages)
+        await pipe.execute()
+        task = asyncio.create_task(self._acompact_in_background())
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+    def _summary_prompt(self, summary: str, tail: List[BaseMessage]) -> Tuple[Optional[str], int]:
+        """Prompt that folds the older part of the tail into the summary and how many messages it covers."""
+        counts = count_tokens_batch([_message_text(message) for message in tail])
+        if sum(counts) <= self.max_tokens:
+            return None, 0
+
+        kept = self._newest_within(counts, self.max_tokens // 2)
+        older = tail[:len(tail) - kept]
+        if not older:
+            return None, 0
+
+        transcript = "\n".join(f"{message.type}: {_message_text(message)}" for message in older)
+        return SUMMARY_PROMPT.format(summary=summary or "(brak)", messages=transcript), len(older)
+
+    @staticmethod
+    def _summary_model():
+        return get_chat_model(model=CHAT_SUMMARY_MODEL, temperature=0).with_config(tags=["chat", "summary"])
+
+    def _compact_in_background(self) -> None:
+        try:
+            self._compact()
+        except Exception as e:
+            print(f"[WARN] Could not summarise chat history {self.session_id}: {e}")
+
+    async def _acompact_in_background(self) -> None:
+        try:
+            await self._acompact()
+        except Exception as e:
+            print(f"[WARN] Could not summarise chat history {self.session_id}: {e}")
+
+    def _compact(self) -> None:
+        token = uuid.uuid4().hex
+        # Another compaction of this session is running; the next write schedules one again.
+        if not self.redis.set(self.lock_key, token, nx=True, ex=CHAT_SUMMARY_LOCK_SECONDS):
+            return
+        try:
+            summary, covered, tail = self._load_tail()
+            prompt, folded = self._summary_prompt(summary, tail)
+            if prompt is None:
+                return
+
+            new_summary = self._summary_model().invoke(prompt).content
+            self.redis.register_script(_SAVE_SUMMARY_SCRIPT)(
+                keys=[self.summary_key], args=[new_summary, covered + folded, covered, self.ttl or 0]
+            )
+        finally:
+            self.redis.register_script(_RELEASE_LOCK_SCRIPT)(keys=[self.lock_key], args=[token])
+
+    async def _acompact(self) -> None:
+        client = get_async_redis()
+        token = uuid.uuid4().hex
+        if not await client.set(self.lock_key, token, nx=True, ex=CHAT_SUMMARY_LOCK_SECONDS):
+            return
+        try:
+            summary, covered, tail = await self._aload_tail()
+            prompt, folded = self._summary_prompt(summary, tail)
+            if prompt is None:
+                return
+
+            new_summary = (await self._summary_model().ainvoke(prompt)).content
+            await client.register_script(_SAVE_SUMMARY_SCRIPT)(
+                keys=[self.summary_key], args=[new_summary, covered + folded, covered, self.ttl or 0]
+            )
+        finally:
+            await client.register_script(_RELEASE_LOCK_SCRIPT)(keys=[self.lock_key], args=[token])
+
+    def clear(self) -> None:
+        try:
+            self.redis.delete(self.key, self.summary_key)
+        except redis.RedisError as e:
+            print(f"[WARN] Could not clear chat history {self.session_id}: {e}")
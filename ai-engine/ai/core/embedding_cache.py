@@ -0,0 +1,191 @@
+# ai/core/embedding_cache.py
+#
+# Query embeddings are deterministic per (model, text), and the same topics, exam regenerations and
+# the empty-string full-scan probe are embedded over and over, so query vectors are cached.
+
+import hashlib
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import redis
+from langchain_core.embeddings import Embeddings
+
+from ai.core.redis_client import get_redis, get_async_redis
+
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "10000"))
+EMBEDDING_CACHE_REDIS_ENABLED = os.getenv("EMBEDDING_CACHE_REDIS_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_TTL_SECONDS = int(os.getenv("EMBEDDING_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+
+
+def _pack(vector: List[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def _unpack(raw: bytes) -> List[float]:
+    vector = array("f")
+    vector.frombytes(raw)
+    return vector.tolist()
+
+
+class QueryEmbeddingCache:
+    """
+    Query vectors keyed by (model, text): an in-process LRU of `max_entries`, backed by an optional Redis
+    tier (float32 bytes, `ttl` seconds) shared by all workers. Redis errors only cost a cache miss.
+    """
+
+    def __init__(self, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES, use_redis: bool = EMBEDDING_CACHE_REDIS_ENABLED,
+                 ttl: int = EMBEDDING_CACHE_TTL_SECONDS, key_prefix: str = "embcache"):
+        self.max_entries = max_entries
+        self.use_redis = use_redis
+        self.ttl = ttl
+        self.key_prefix = key_prefix
+        self._entries: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"memory_hits": 0, "redis_hits": 0, "misses": 0}
+
+    def _redis_key(self, model: str, text: str) -> str:
+        digest = hashlib.sha256(model.encode("utf-8") + b"\x00" + text.encode("utf-8")).hexdigest()
+        return f"{self.key_prefix}:{digest}"
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += amount
+
+    def _get_local(self, model: str, text: str) -> Optional[List[float]]:
+        with self._lock:
+            vector = self._entries.get((model, text))
+            if vector is not None:
+                self._entries.move_to_end((model, text))
+            return vector
+
+    def _put_local(self, model: str, text: str, vector: List[float]) -> None:
+        with self._lock:
+            self._entries[(model, text)] = vector
+            self._entries.move_to_end((model, text))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_many(self, model: str, texts: List[str]) -> Dict[str, List[float]]:
+        found = {text: vector for text in texts if (vector := self._get_local(model, text)) is not None}
+        self._count("memory_hits", len(found))
+        missing = [text for text in dict.fromkeys(texts) if text not in found]
+        if missing and self.use_redis:
+            try:
+                raw = get_redis().mget([self._redis_key(model, text) for text in missing])
+            except redis.RedisError as e:
+                print(f"[WARN] Embedding cache lookup failed: {e}")
+                raw = [None] * len(missing)
+            found.update(self._from_redis(model, missing, raw))
+        self._count("misses", len([text for text in dict.fromkeys(texts) if text not in found]))
+        return found
+
+    async def aget_many(self, model: str, texts: List[str]) -> Dict[str, List[float]]:
+        found = {text: vector for text in texts if (vector := self._get_local(model, text)) is not None}
+        self._count("memory_hits", len(found))
+        missing = [text for text in dict.fromkeys(texts) if text not in found]
+        if missing and self.use_redis:
+            try:
+                raw = await get_async_redis().mget([self._redis_key(model, text) for text in missing])
+            except redis.RedisError as e:
+                print(f"[WARN] Embedding cache lookup failed: {e}")
+                raw = [None] * len(missing)
+            found.update(self._from_redis(model, missing, raw))
+        self._count("misses", len([text for text in dict.fromkeys(texts) if text not in found]))
+        return found
+
+    def _from_redis(self, model: str, texts: List[str], raw: List[Optional[bytes]]) -> Dict[str, List[float]]:
+        found = {}
+        for text, value in zip(texts, raw):
+            if value is not None:
+                found[text] = _unpack(value)
+                self._put_local(model, text, found[text])
+        self._count("redis_hits", len(found))
+        return found
+
+    def put_many(self, model: str, vectors: Dict[str, List[float]]) -> None:
+        for text, vector in vectors.items():
+            self._put_local(model, text, vector)
+        if vectors and self.use_redis:
+            try:
+                pipe = get_redis().pipeline(transaction=False)
+                for text, vector in vectors.items():
+                    pipe.set(self._redis_key(model, text), _pack(vector), ex=self.ttl)
+                pipe.execute()
+            except redis.RedisError as e:
+                print(f"[WARN] Embedding cache update failed: {e}")
+
+    async def aput_many(self, model: str, vectors: Dict[str, List[float]]) -> None:
+        for text, vector in vectors.items():
+            self._put_local(model, text, vector)
+        if vectors and self.use_redis:
+            try:
+                pipe = get_async_redis().pipeline(transaction=False)
+                for text, vector in vectors.items():
+                    pipe.set(self._redis_key(model, text), _pack(vector), ex=self.ttl)
+                await pipe.execute()
+            except redis.RedisError as e:
+                print(f"[WARN] Embedding cache update failed: {e}")
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            counters = dict(self._counters)
+            entries = len(self._entries)
+        hits = counters["memory_hits"] + counters["redis_hits"]
+        lookups = hits + counters["misses"]
+        return {
+            **counters,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "redis_enabled": self.use_redis,
+        }
+
+
+query_embedding_cache = QueryEmbeddingCache()
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that answers embed_query from query_embedding_cache, so a repeated topic,
+    exam regeneration or the empty-string probe reaches the embeddings API once. embed_documents
+    (ingestion) is passed through unchanged; use embed_queries for several queries at once.
+    """
+
+    def __init__(self, embeddings: Embeddings, cache: QueryEmbeddingCache = query_embedding_cache):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model = getattr(embeddings, "model", type(embeddings).__name__)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Query vectors for `texts`; only the uncached ones are embedded, in a single call."""
+        found = self.cache.get_many(self.model, texts)
+        missing = [text for text in dict.fromkeys(texts) if text not in found]
+        if missing:
+            fresh = dict(zip(missing, self.embeddings.embed_documents(missing)))
+            self.cache.put_many(self.model, fresh)
+            found.update(fresh)
+        return [found[text] for text in texts]
+
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        found = await self.cache.aget_many(self.model, texts)
+        missing = [text for text in dict.fromkeys(texts) if text not in found]
+        if missing:
+            fresh = dict(zip(missing, await self.embeddings.aembed_documents(missing)))
+            await self.cache.aput_many(self.model, fresh)
+            found.update(fresh)
+        return [found[text] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_queries([text])[0]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_queries([text]))[0]
@@ -0,0 +1,123 @@
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from langchain_core.messages import BaseMessage
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+
+from ai.core.llm_cache import llm_cache, LLM_CACHE_ENABLED
+from ai.core.rate_limiter import rate_limiter, estimate_tokens, DEFAULT_COMPLETION_TOKENS
+
+
+def _message_text(message: BaseMessage) -> str:
+    return message.content if isinstance(message.content, str) else json.dumps(message.content)
+
+
+class RateLimitedChatOpenAI(ChatOpenAI):
+    """ChatOpenAI that takes each call's estimated token cost from the shared rate limiter first."""
+
+    def _estimated_cost(self, messages: List[BaseMessage], kwargs: dict) -> int:
+        texts = [_message_text(message) for message in messages]
+        if kwargs.get("tools"):
+            texts.append(json.dumps(kwargs["tools"]))
+        return estimate_tokens(texts) + (self.max_tokens or DEFAULT_COMPLETION_TOKENS)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                  **kwargs: Any):
+        # With streaming=True the parent delegates to _stream, which acquires on its own.
+        if not self.streaming:
+            rate_limiter.acquire(self.model_name, self._estimated_cost(messages, kwargs))
+        return super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                         **kwargs: Any):
+        if not self.streaming:
+            await rate_limiter.aacquire(self.model_name, self._estimated_cost(messages, kwargs))
+        return await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    def _stream(self, messages: List[BaseMessage], *args: Any, **kwargs: Any):
+        rate_limiter.acquire(self.model_name, self._estimated_cost(messages, kwargs))
+        yield from super()._stream(messages, *args, **kwargs)
+
+    async def _astream(self, messages: List[BaseMessage], *args: Any, **kwargs: Any):
+        await rate_limiter.aacquire(self.model_name, self._estimated_cost(messages, kwargs))
+        async for chunk in super()._astream(messages, *args, **kwargs):
+            yield chunk
+
+
+class RateLimitedOpenAIEmbeddings(OpenAIEmbeddings):
+    """OpenAIEmbeddings that goes through the shared rate limiter (embed_query delegates here too)."""
+
+    def embed_documents(self, texts: List[str], chunk_size: Optional[int] = None, **kwargs: Any):
+        rate_limiter.acquire(self.model, estimate_tokens(texts))
+        return super().embed_documents(texts, chunk_size=chunk_size, **kwargs)
+
+    async def aembed_documents(self, texts: List[str], chunk_size: Optional[int] = None, **kwargs: Any):
+        await rate_limiter.aacquire(self.model, estimate_tokens(texts))
+        return await super().aembed_documents(texts, chunk_size=chunk_size, **kwargs)
+
+
+# One pair of keep-alive HTTP clients for every OpenAI model in the process, so requests reuse
+# pooled TLS connections instead of opening new ones per request.
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+LLM_TIMEOUT = httpx.Timeout(float(os.getenv("LLM_TIMEOUT_SECONDS", "600")), connect=10.0)
+
+_limits = httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS)
+_http_client = httpx.Client(limits=_limits, timeout=LLM_TIMEOUT)
+_http_async_client = httpx.AsyncClient(limits=_limits, timeout=LLM_TIMEOUT)
+
+_chat_models: Dict[Tuple, RateLimitedChatOpenAI] = {}
+_embedding_models: Dict[str, RateLimitedOpenAIEmbeddings] = {}
+_lock = threading.Lock()
+
+
+def _options_key(options: Dict[str, Any]) -> str:
+    return json.dumps(options, sort_keys=True, default=str)
+
+
+def get_chat_model(model: str, temperature: float = 0.7, cache: bool = False, **options: Any) -> RateLimitedChatOpenAI:
+    """
+    Shared, rate-limited chat client for (model, temperature, options). Clients are built once per
+    process and reused by all agents; per-call settings such as tags belong in .with_config().
+    With cache=True identical calls are answered from the Redis response cache (see ai.core.llm_cache),
+    so only opt in where repeating the previous answer is acceptable. The cache only applies at
+    temperature 0: a sampled call is expected to give a different answer when it is repeated, e.g. when
+    notes or a quiz are regenerated from the same material.
+    """
+    temperature = float(temperature) if temperature is not None else None
+    cache = cache and LLM_CACHE_ENABLED and temperature == 0
+    key = (model, temperature, cache, _options_key(options))
+
+    llm = _chat_models.get(key)
+    if llm is None:
+        with _lock:
+            llm = _chat_models.get(key)
+            if llm is None:
+                llm = RateLimitedChatOpenAI(
+                    model=model,
+                    temperature=temperature,
+                    http_client=_http_client,
+                    http_async_client=_http_async_client,
+                    cache=llm_cache if cache else None,
+                    **options
+                )
+                _chat_models[key] = llm
+    return llm
+
+
+def get_embeddings(model: str = "text-embedding-3-small") -> RateLimitedOpenAIEmbeddings:
+    llm = _embedding_models.get(model)
+    if llm is None:
+        with _lock:
+            llm = _embedding_models.get(model)
+            if llm is None:
+                llm = RateLimitedOpenAIEmbeddings(
+                    model=model,
+                    http_client=_http_client,
+                    http_async_client=_http_async_client
+                )
+                _embedding_models[model] = llm
+    return llm
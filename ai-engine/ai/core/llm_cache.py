@@ -0,0 +1,154 @@
+import hashlib
+import os
+import time
+from typing import Dict, Optional
+
+import redis
+from langchain_core.caches import BaseCache, RETURN_VAL_TYPE
+from langchain_core.load import dumps, loads
+
+from ai.core.redis_client import get_redis, get_async_redis
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "50000"))
+
+
+class RedisLLMCache(BaseCache):
+    """
+    Exact-match cache of LLM responses in Redis. The key is a hash of the serialized prompt and the
+    llm_string, which LangChain builds from the model, temperature, model_kwargs and bound tool schemas.
+    Entries expire after `ttl` seconds; beyond `max_entries` the least recently used ones are evicted.
+    Redis errors are treated as misses so that the cache can never fail a call.
+    """
+
+    def __init__(self, key_prefix: str = "llmcache", ttl: int = LLM_CACHE_TTL_SECONDS,
+                 max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.key_prefix = key_prefix
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._index_key = f"{key_prefix}:lru"
+        self._stats_key = f"{key_prefix}:stats"
+
+    def _key(self, prompt: str, llm_string: str) -> str:
+        digest = hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+        return f"{self.key_prefix}:entry:{digest}"
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = self._key(prompt, llm_string)
+        try:
+            client = get_redis()
+            raw = client.get(key)
+            pipe = client.pipeline(transaction=False)
+            if raw is None:
+                pipe.hincrby(self._stats_key, "misses", 1)
+            else:
+                pipe.hincrby(self._stats_key, "hits", 1)
+                pipe.zadd(self._index_key, {key: time.time()})
+            pipe.execute()
+        except redis.RedisError as e:
+            print(f"[WARN] LLM cache lookup failed: {e}")
+            return None
+
+        return self._decode(key, raw)
+
+    async def alookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = self._key(prompt, llm_string)
+        try:
+            client = get_async_redis()
+            raw = await client.get(key)
+            pipe = client.pipeline(transaction=False)
+            if raw is None:
+                pipe.hincrby(self._stats_key, "misses", 1)
+            else:
+                pipe.hincrby(self._stats_key, "hits", 1)
+                pipe.zadd(self._index_key, {key: time.time()})
+            await pipe.execute()
+        except redis.RedisError as e:
+            print(f"[WARN] LLM cache lookup failed: {e}")
+            return None
+        return self._decode(key, raw)
+
+    @staticmethod
+    def _decode(key: str, raw: Optional[bytes]) -> Optional[RETURN_VAL_TYPE]:
+        if raw is None:
+            return None
+        try:
+            return loads(raw.decode("utf-8"))
+        except Exception as e:
+            print(f"[WARN] Dropping unreadable LLM cache entry {key}: {e}")
+            return None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = self._key(prompt, llm_string)
+        now = time.time()
+        try:
+            client = get_redis()
+            pipe = client.pipeline(transaction=False)
+            pipe.set(key, dumps(return_val), ex=self.ttl)
+            pipe.zadd(self._index_key, {key: now})
+            # Entries that already expired on their own only need to leave the LRU index.
+            pipe.zremrangebyscore(self._index_key, "-inf", now - self.ttl)
+            pipe.zcard(self._index_key)
+            size = pipe.execute()[-1]
+
+            if size > self.max_entries:
+                evicted = [member for member, _ in client.zpopmin(self._index_key, size - self.max_entries)]
+                if evicted:
+                    client.delete(*evicted)
+                    client.hincrby(self._stats_key, "evictions", len(evicted))
+        except redis.RedisError as e:
+            print(f"[WARN] LLM cache update failed: {e}")
+
+    async def aupdate(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = self._key(prompt, llm_string)
+        now = time.time()
+        try:
+            client = get_async_redis()
+            pipe = client.pipeline(transaction=False)
+            pipe.set(key, dumps(return_val), ex=self.ttl)
+            pipe.zadd(self._index_key, {key: now})
+            pipe.zremrangebyscore(self._index_key, "-inf", now - self.ttl)
+            pipe.zcard(self._index_key)
+            size = (await pipe.execute())[-1]
+
+            if size > self.max_entries:
+                evicted = [member for member, _ in await client.zpopmin(self._index_key, size - self.max_entries)]
+                if evicted:
+                    await client.delete(*evicted)
+                    await client.hincrby(self._stats_key, "evictions", len(evicted))
+        except redis.RedisError as e:
+            print(f"[WARN] LLM cache update failed: {e}")
+
+    def clear(self, **kwargs) -> None:
+        client = get_redis()
+        keys = client.zrange(self._index_key, 0, -1)
+        if keys:
+            client.delete(*keys)
+        client.delete(self._index_key, self._stats_key)
+
+    def stats(self) -> Dict[str, float]:
+        try:
+            client = get_redis()
+            raw = client.hgetall(self._stats_key)
+            size = client.zcard(self._index_key)
+        except redis.RedisError as e:
+            print(f"[WARN] LLM cache stats unavailable: {e}")
+            return {"enabled": LLM_CACHE_ENABLED, "available": False}
+
+        counters = {name.decode(): int(value) for name, value in raw.items()}
+        hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+        return {
+            "enabled": LLM_CACHE_ENABLED,
+            "available": True,
+            "hits": hits,
+            "misses": misses,
+            "evictions": counters.get("evictions", 0),
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            "entries": size,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+        }
+
+
+llm_cache = RedisLLMCache()
@@ -0,0 +1,32 @@
+from typing import Dict
+
+import redis
+
+from ai.core.redis_client import get_redis, get_async_redis
+
+# Counters live in one Redis hash per group so that all uvicorn workers report the same totals.
+METRICS_KEY_PREFIX = "metrics"
+
+
+def increment(group: str, field: str, amount: float = 1) -> None:
+    try:
+        get_redis().hincrbyfloat(f"{METRICS_KEY_PREFIX}:{group}", field, amount)
+    except redis.RedisError as e:
+        print(f"[WARN] Could not update metric {group}.{field}: {e}")
+
+
+async def aincrement(group: str, field: str, amount: float = 1) -> None:
+    try:
+        await get_async_redis().hincrbyfloat(f"{METRICS_KEY_PREFIX}:{group}", field, amount)
+    except redis.RedisError as e:
+        print(f"[WARN] Could not update metric {group}.{field}: {e}")
+
+
+def read(group: str) -> Dict[str, float]:
+    try:
+        raw = get_redis().hgetall(f"{METRICS_KEY_PREFIX}:{group}")
+    except redis.RedisError as e:
+        print(f"[WARN] Metrics {group} unavailable: {e}")
+        return {}
+    values = {name.decode(): float(value) for name, value in raw.items()}
+    return {name: int(value) if value.is_integer() else round(value, 3) for name, value in sorted(values.items())}
@@ -0,0 +1,170 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, Tuple
+
+import redis
+
+from ai.core.redis_client import get_redis, get_async_redis
+from ai.core.tokens import count_tokens_batch
+
+# Per-model OpenAI limits (tokens and requests per minute). Override with
+# OPENAI_RATE_LIMITS='{"gpt-4o": {"tpm": 800000, "rpm": 10000}}'.
+DEFAULT_RATE_LIMITS = {
+    "gpt-4o": {"tpm": 30_000, "rpm": 500},
+    "gpt-4o-mini": {"tpm": 200_000, "rpm": 500},
+    "text-embedding-3-small": {"tpm": 1_000_000, "rpm": 3_000},
+}
+FALLBACK_RATE_LIMIT = {"tpm": 30_000, "rpm": 500}
+RATE_LIMITS = {**DEFAULT_RATE_LIMITS, **json.loads(os.getenv("OPENAI_RATE_LIMITS", "{}"))}
+
+# Completion tokens counted against TPM when a call does not set max_tokens.
+DEFAULT_COMPLETION_TOKENS = int(os.getenv("RATE_LIMIT_COMPLETION_TOKENS", "1000"))
+
+# After a Redis error the limiter uses per-process buckets for this long, then tries Redis again.
+REDIS_RETRY_SECONDS = float(os.getenv("RATE_LIMIT_REDIS_RETRY_SECONDS", "30"))
+
+# Refills both buckets of a model and, if both can cover the call, takes from them.
+# Returns 0 when admitted, otherwise the number of seconds until the call would fit.
+_ACQUIRE_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local cost = {tonumber(ARGV[1]), 1}
+local capacity = {tonumber(ARGV[2]), tonumber(ARGV[3])}
+local levels = {}
+local wait = 0
+
+for i = 1, 2 do
+    local state = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity[i]
+    local ts = tonumber(state[2]) or now
+    local rate = capacity[i] / 60
+    tokens = math.min(capacity[i], tokens + math.max(0, now - ts) * rate)
+    levels[i] = tokens
+    if tokens < cost[i] then
+        wait = math.max(wait, (cost[i] - tokens) / rate)
+    end
+end
+
+for i = 1, 2 do
+    local tokens = levels[i]
+    if wait == 0 then
+        tokens = tokens - cost[i]
+    end
+    redis.call('HSET', KEYS[i], 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', KEYS[i], 120)
+end
+return tostring(wait)
+"""
+
+
+def estimate_tokens(texts: Iterable[str]) -> int:
+    return sum(count_tokens_batch(list(texts)))
+
+
+class TokenBucketRateLimiter:
+    """
+    TPM/RPM token bucket per model. The buckets live in Redis so that all uvicorn workers share one
+    budget; while Redis is unreachable the limiter degrades to per-process buckets and retries Redis
+    every REDIS_RETRY_SECONDS.
+    """
+
+    def __init__(self, key_prefix: str = "ratelimit"):
+        self.key_prefix = key_prefix
+        self._script = None
+        self._async_script = None
+        self._local_buckets: Dict[str, Tuple[float, float, float]] = {}
+        self._local_lock = threading.Lock()
+        self._redis_retry_at = 0.0
+
+    @staticmethod
+    def limits_for(model: str) -> Dict[str, int]:
+        return RATE_LIMITS.get(model, FALLBACK_RATE_LIMIT)
+
+    def _try_acquire(self, model: str, tokens: int) -> float:
+        limits = self.limits_for(model)
+        # A single call larger than the whole bucket could never be admitted, so cap its cost.
+        tokens = min(tokens, limits["tpm"])
+
+        if time.monotonic() >= self._redis_retry_at:
+            try:
+                if self._script is None:
+                    self._script = get_redis().register_script(_ACQUIRE_SCRIPT)
+                keys = [f"{self.key_prefix}:{model}:tpm", f"{self.key_prefix}:{model}:rpm"]
+                return float(self._script(keys=keys, args=[tokens, limits["tpm"], limits["rpm"]]))
+            except redis.RedisError as e:
+                self._redis_unavailable(e)
+
+        return self._try_acquire_locally(model, tokens, limits)
+
+    async def _atry_acquire(self, model: str, tokens: int) -> float:
+        limits = self.limits_for(model)
+        tokens = min(tokens, limits["tpm"])
+
+        if time.monotonic() >= self._redis_retry_at:
+            try:
+                client = get_async_redis()
+                if self._async_script is None:
+                    self._async_script = client.register_script(_ACQUIRE_SCRIPT)
+                keys = [f"{self.key_prefix}:{model}:tpm", f"{self.key_prefix}:{model}:rpm"]
+                return float(await self._async_script(keys=keys, args=[tokens, limits["tpm"], limits["rpm"]], client=client))
+            except redis.RedisError as e:
+                self._redis_unavailable(e)
+
+        return self._try_acquire_locally(model, tokens, limits)
+
+    def _redis_unavailable(self, error: Exception) -> None:
+        print(f"[WARN] Rate limiter cannot reach Redis ({error}). "
+              f"Using per-process buckets for {REDIS_RETRY_SECONDS:g}s.")
+        self._redis_retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+
+    def _try_acquire_locally(self, model: str, tokens: int, limits: Dict[str, int]) -> float:
+        with self._local_lock:
+            now = time.monotonic()
+            tpm_level, rpm_level, ts = self._local_buckets.get(model, (limits["tpm"], limits["rpm"], now))
+            tpm_level = min(limits["tpm"], tpm_level + (now - ts) * limits["tpm"] / 60)
+            rpm_level = min(limits["rpm"], rpm_level + (now - ts) * limits["rpm"] / 60)
+
+            wait = max(
+                (tokens - tpm_level) * 60 / limits["tpm"] if tpm_level < tokens else 0,
+                (1 - rpm_level) * 60 / limits["rpm"] if rpm_level < 1 else 0,
+            )
+            if wait == 0:
+                tpm_level -= tokens
+                rpm_level -= 1
+            self._local_buckets[model] = (tpm_level, rpm_level, now)
+            return wait
+
+    def acquire(self, model: str, tokens: int) -> None:
+        """Blocks exactly until the model's buckets can cover `tokens` and one request."""
+        while True:
+            wait = self._try_acquire(model, tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    async def aacquire(self, model: str, tokens: int) -> None:
+        while True:
+            wait = await self._atry_acquire(model, tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+
+def retry_after_seconds(error: Exception, default: float = 5.0) -> float:
+    """Wait time suggested by an OpenAI 429 response, falling back to `default`."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return default
+
+
+rate_limiter = TokenBucketRateLimiter()
@@ -0,0 +1,43 @@
+import asyncio
+import os
+
+import redis
+import redis.asyncio
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+_pool = None
+_async_pool = None
+_async_pool_loop = None
+
+
+def _warn_localhost():
+    if "localhost" in REDIS_URL:
+        print(
+            "Warning: REDIS_URL is not set and is defaulting to localhost. This will not work in Docker. Please set REDIS_URL=redis://redis:6379/0 in your .env file.")
+
+
+def get_redis() -> redis.Redis:
+    """Client backed by one connection pool shared by the whole process."""
+    global _pool
+    if _pool is None:
+        _warn_localhost()
+        _pool = redis.ConnectionPool.from_url(REDIS_URL, socket_connect_timeout=2, health_check_interval=30)
+    return redis.Redis(connection_pool=_pool)
+
+
+def get_async_redis() -> redis.asyncio.Redis:
+    """
+    asyncio client for code running on the event loop. Its connections belong to the loop that
+    created them, so the pool is rebuilt if it is requested from a different loop.
+    """
+    global _async_pool, _async_pool_loop
+    loop = asyncio.get_running_loop()
+    if _async_pool is None or _async_pool_loop is not loop:
+        if _async_pool is None:
+            _warn_localhost()
+        _async_pool = redis.asyncio.ConnectionPool.from_url(
+            REDIS_URL, socket_connect_timeout=2, health_check_interval=30
+        )
+        _async_pool_loop = loop
+    return redis.asyncio.Redis(connection_pool=_async_pool)
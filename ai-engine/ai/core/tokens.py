@@ -0,0 +1,81 @@
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List
+
+import tiktoken
+
+DEFAULT_MODEL = "gpt-4o"
+TOKEN_COUNT_THREADS = int(os.getenv("TOKEN_COUNT_THREADS", "8"))
+TOKEN_COUNT_CACHE_SIZE = int(os.getenv("TOKEN_COUNT_CACHE_SIZE", "100000"))
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model_name: str = DEFAULT_MODEL) -> tiktoken.Encoding:
+    """Process-wide encoder per model; building one costs far more than encoding a chunk."""
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text: str, model_name: str = DEFAULT_MODEL) -> int:
+    return len(get_encoding(model_name).encode_ordinary(text))
+
+
+def count_tokens_batch(texts: List[str], model_name: str = DEFAULT_MODEL) -> List[int]:
+    """Token counts of many texts in one encode_batch pass spread over TOKEN_COUNT_THREADS threads."""
+    if not texts:
+        return []
+    encoded = get_encoding(model_name).encode_ordinary_batch(texts, num_threads=TOKEN_COUNT_THREADS)
+    return [len(tokens) for tokens in encoded]
+
+
+class _TokenCountCache:
+    """Bounded LRU of token counts keyed by (model, chunk ID)."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._counts: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            count = self._counts.get(key)
+            if count is not None:
+                self._counts.move_to_end(key)
+            return count
+
+    def put_many(self, items: Dict[Any, int]):
+        with self._lock:
+            self._counts.update(items)
+            for key in items:
+                self._counts.move_to_end(key)
+            while len(self._counts) > self.max_size:
+                self._counts.popitem(last=False)
+
+
+_chunk_token_counts = _TokenCountCache(TOKEN_COUNT_CACHE_SIZE)
+
+
+def count_chunk_tokens(chunks: List[Dict[str, Any]], model_name: str = DEFAULT_MODEL) -> List[int]:
+    """
+    Token counts of {'id', 'text', 'metadata'} chunks. Counts stored in the chunk metadata or
+    memoised for the chunk ID are reused; the rest are counted together in one batch.
+    """
+    counts = [None] * len(chunks)
+    missing = []
+    for i, chunk in enumerate(chunks):
+        stored = chunk.get("metadata", {}).get("token_count")
+        counts[i] = int(stored) if stored else _chunk_token_counts.get((model_name, chunk["id"]))
+        if counts[i] is None:
+            missing.append(i)
+
+    if missing:
+        fresh = count_tokens_batch([chunks[i]["text"] for i in missing], model_name)
+        for i, count in zip(missing, fresh):
+            counts[i] = count
+        _chunk_token_counts.put_many({(model_name, chunks[i]["id"]): counts[i] for i in missing})
+
+    return counts
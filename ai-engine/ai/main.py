@@ -1,7 +1,8 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from ai.api import chat, pinecone, notes, exam, quiz, flashcard, knowledge_tree, key_concepts, problem_practice, \
-    focus_study_chat_helper, quick_exam, focus_study_answer_checker
+    focus_study_chat_helper, quick_exam, focus_study_answer_checker, metrics
+from ai.services.ingestion_jobs import start_ingestion_worker
 
 app = FastAPI()
 
@@ -25,3 +26,9 @@ app.include_router(problem_practice.router, prefix="/problem_practice")
 app.include_router(focus_study_chat_helper.router, prefix="/focus_study_helper")
 app.include_router(quick_exam.router, prefix="/quick_exam")
 app.include_router(focus_study_answer_checker.router, prefix="/focus_study_answer")
+app.include_router(metrics.router, prefix="/metrics")
+
+
+@app.on_event("startup")
+def _startup():
+    start_ingestion_worker()
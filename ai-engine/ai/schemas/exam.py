@@ -55,3 +55,15 @@ class TextQuestion(BaseModel):
     user_answer: str
     correct_answer: str
     sources: List[str] = []
+
+
+class TextAnswer(BaseModel):
+    question: str
+    user_answer: str
+    correct_answer: str
+
+
+class TextAnswerBatch(BaseModel):
+    user_id: int
+    questions: List[TextAnswer]
+    sources: List[str] = []
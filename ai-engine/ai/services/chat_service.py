@@ -1,7 +1,15 @@
-from typing import List
+import json
+import time
+from typing import AsyncIterator, List
 
-from ai.agents.chat_agent import ask_chat
-from ai.agents.offline_agent import ask_chat_offline
+from ai.agents.chat_agent import ask_chat, chat_agents, co_client
+from ai.agents.offline_agent import ask_chat_offline, offline_chat_agents
+from ai.agents.query_router import AGENT, classify_query, answer_directly, record_route
+from ai.core.llm import get_chat_model
+
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
 
 
 class ChatService:
@@ -10,7 +18,7 @@ class ChatService:
         self.default_model = default_model
         self.default_temperature = default_temperature
 
-    def get_response(self, human_message: str, user_id: int, session_id: str, filenames:List, system_message=None, model=None, temperature=None,
+    async def get_response(self, human_message: str, user_id: int, session_id: str, filenames:List, system_message=None, model=None, temperature=None,
                      web_search:bool=True) -> str:
         """
         Gets a response from the chat agent for a given user.
@@ -29,10 +37,31 @@ class ChatService:
             The agent's final answer.
         """
         model = model or self.default_model
-        temperature = temperature or self.default_temperature
+        temperature = self.default_temperature if temperature is None else temperature
+
+        # Single-hop messages skip the agent loop; anything the fast path cannot answer goes to the agent.
+        started = time.perf_counter()
+        route = classify_query(human_message, web_search)
+        if route != AGENT:
+            try:
+                response = await answer_directly(
+                    route,
+                    human_message,
+                    user_id=user_id,
+                    session_id=session_id,
+                    filenames=filenames,
+                    llm=get_chat_model(model=model, temperature=temperature, api_key=self.api_key),
+                    cohere_client=co_client if web_search else None
+                )
+            except Exception as e:
+                print(f"[WARN] Fast path '{route}' failed, falling back to the agent: {e}")
+                response = None
+            if response is not None:
+                await record_route(route, time.perf_counter() - started)
+                return response
 
         if web_search:
-            response = ask_chat(
+            response = await ask_chat(
                 query=human_message,
                 user_id=user_id,
                 session_id=session_id,
@@ -42,7 +71,7 @@ class ChatService:
                 filenames=filenames,
             )
         else:
-            response = ask_chat_offline(
+            response = await ask_chat_offline(
                 query=human_message,
                 user_id=user_id,
                 session_id=session_id,
@@ -51,4 +80,51 @@ class ChatService:
                 temperature=temperature,
                 filenames=filenames,
             )
-        return response
\ No newline at end of file
+        await record_route(AGENT, time.perf_counter() - started, fallback_from=route if route != AGENT else None)
+        return response
+
+    async def stream_response(self, human_message: str, user_id: int, session_id: str, filenames: List, model=None,
+                              temperature=None, web_search: bool = True) -> AsyncIterator[str]:
+        """
+        Same agent as get_response, but yields server-sent events while it runs:
+        `token` for every piece of the final answer, `tool_start`/`tool_end` around tool calls,
+        then `done` with the complete answer (or `error`).
+        """
+        model = model or self.default_model
+        temperature = self.default_temperature if temperature is None else temperature
+        registry = chat_agents if web_search else offline_chat_agents
+
+        try:
+            events = registry.astream_events(
+                human_message,
+                session_id=session_id,
+                user_id=user_id,
+                filenames=filenames,
+                model=model,
+                temperature=temperature,
+                api_key=self.api_key
+            )
+
+            output = None
+            running_tools = set()
+            async for event in events:
+                kind = event["event"]
+                # Tools call the LLM themselves; tokens of runs nested in a tool are not part of the answer.
+                if kind == "on_chat_model_stream" and running_tools.isdisjoint(event["parent_ids"]):
+                    content = event["data"]["chunk"].content
+                    if content:
+                        yield sse_event("token", {"content": content})
+                elif kind == "on_tool_start":
+                    running_tools.add(event["run_id"])
+                    yield sse_event("tool_start", {"tool": event["name"], "input": event["data"].get("input")})
+                elif kind == "on_tool_end":
+                    running_tools.discard(event["run_id"])
+                    yield sse_event("tool_end", {"tool": event["name"]})
+                elif kind == "on_chain_end" and not event["parent_ids"]:
+                    output = event["data"].get("output", {}).get("output")
+
+            yield sse_event("done", {"response": output or ""})
+        except Exception as e:
+            print(f"An error occurred in the streaming agent: {e}")
+            yield sse_event("error", {"detail": "Sorry, I encountered an internal error and could not answer your question."})
+
@@ -0,0 +1,103 @@
+import os
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Iterable, Iterator, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from ai.services.embedding_store import EMBEDDING_BATCH_SIZE
+
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "100"))
+UPSERT_CONCURRENCY = int(os.getenv("UPSERT_CONCURRENCY", "4"))
+
+# Maps texts to their vectors, e.g. embedding_store.embed_documents bound to the shared rate-limited model.
+EmbedFunction = Callable[[List[str]], List[List[float]]]
+Progress = Callable[[str, int], None]
+
+
+def _batched(items: Iterable, size: int) -> Iterator[List]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class ChunkIndexer:
+    """
+    Embeds and upserts tagged chunks with bounded concurrency: up to `embed_concurrency` embedding
+    batches of `embed_batch_size` chunks and `upsert_concurrency` upsert requests of `upsert_batch_size`
+    vectors are in flight at once. Embedding calls go through `embed`, so they share its rate limiting.
+    `index` only needs Pinecone's upsert(vectors=[(id, values, metadata), ...], namespace=...).
+    """
+
+    def __init__(self, embed: EmbedFunction, index: Any, text_key: str = "text",
+                 embed_batch_size: int = EMBEDDING_BATCH_SIZE, embed_concurrency: int = EMBED_CONCURRENCY,
+                 upsert_batch_size: int = UPSERT_BATCH_SIZE, upsert_concurrency: int = UPSERT_CONCURRENCY):
+        self.embed = embed
+        self.index = index
+        self.text_key = text_key
+        self.embed_batch_size = max(1, embed_batch_size)
+        self.embed_concurrency = max(1, embed_concurrency)
+        self.upsert_batch_size = max(1, upsert_batch_size)
+        self.upsert_concurrency = max(1, upsert_concurrency)
+
+    def _embed_batch(self, batch: List[Tuple[str, Document]]) -> Tuple[List[Tuple[str, Document]], List[List[float]]]:
+        return batch, self.embed([chunk.page_content for _, chunk in batch])
+
+    def _upsert(self, records: List[Tuple[str, List[float], dict]], namespace: Optional[str]) -> int:
+        self.index.upsert(vectors=records, namespace=namespace)
+        return len(records)
+
+    def upsert_records(self, records: List[Tuple[str, List[float], dict]], namespace: Optional[str] = None) -> int:
+        """Upserts already embedded (id, values, metadata) records in batches, `upsert_concurrency` at a time."""
+        if not records:
+            return 0
+        with ThreadPoolExecutor(self.upsert_concurrency, thread_name_prefix="upsert") as upsert_pool:
+            return sum(upsert_pool.map(lambda batch: self._upsert(batch, namespace),
+                                       _batched(records, self.upsert_batch_size)))
+
+    def index_chunks(self, tagged: Iterable[Tuple[str, Document]], progress: Progress = None,
+                     namespace: Optional[str] = None) -> Tuple[List[str], List[Document]]:
+        """
+        Indexes (id, chunk) pairs into `namespace` as they arrive and returns all IDs and chunks in input order.
+        The first error of any batch is raised once the requests already in flight have finished.
+        """
+        progress = progress or (lambda counter, amount: None)
+        ids, chunks = [], []
+        embedding: Deque[Future] = deque()
+        upserting: Deque[Future] = deque()
+
+        def finish_upsert():
+            progress("chunks_upserted", upserting.popleft().result())
+
+        def finish_embedding():
+            batch, vectors = embedding.popleft().result()
+            progress("chunks_embedded", len(batch))
+            records = [
+                (chunk_id, vector, {**chunk.metadata, self.text_key: chunk.page_content})
+                for (chunk_id, chunk), vector in zip(batch, vectors)
+            ]
+            for upsert_batch in _batched(records, self.upsert_batch_size):
+                while upserting and (len(upserting) >= self.upsert_concurrency or upserting[0].done()):
+                    finish_upsert()
+                upserting.append(upsert_pool.submit(self._upsert, upsert_batch, namespace))
+
+        with ThreadPoolExecutor(self.embed_concurrency, thread_name_prefix="embed") as embed_pool, \
+                ThreadPoolExecutor(self.upsert_concurrency, thread_name_prefix="upsert") as upsert_pool:
+            for batch in _batched(tagged, self.embed_batch_size):
+                ids.extend(chunk_id for chunk_id, _ in batch)
+                chunks.extend(chunk for _, chunk in batch)
+                while embedding and (len(embedding) >= self.embed_concurrency or embedding[0].done()):
+                    finish_embedding()
+                embedding.append(embed_pool.submit(self._embed_batch, batch))
+            while embedding:
+                finish_embedding()
+            while upserting:
+                finish_upsert()
+
+        return ids, chunks
@@ -0,0 +1,156 @@
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from ai.services import chunk_store
+from ai.services.namespaces import LEGACY_NAMESPACE, LEGACY_NAMESPACE_FALLBACK, user_namespace
+from ai.services.pinecone_service import vectorstore, chunk_id_prefix, fetch_chunk_metadata, legacy_chunk_ids, \
+    list_index_ids
+
+# Pinecone caps both list() pages and fetch() requests at 100 IDs.
+MAX_PAGE_SIZE = 100
+
+
+def _positions_by_file(metadata: Dict[str, dict], filenames: Optional[List[str]],
+                       skip: Set[str]) -> Dict[str, Dict[str, int]]:
+    positions = {}
+    for chunk_id, chunk_metadata in metadata.items():
+        filename = chunk_metadata.get("filename")
+        if filename is None or filename in skip or (filenames is not None and filename not in filenames):
+            continue
+        positions.setdefault(filename, {})[chunk_id] = int(chunk_metadata.get("chunk_index", 0))
+    return positions
+
+
+def _user_positions_by_file(user_id: int, filenames: Optional[List[str]], skip: Set[str],
+                            fetched: Dict[str, dict]) -> Dict[str, Dict[str, int]]:
+    """
+    Chunk index of the user's chunks in their namespace, per filename, for `filenames` (all files if None)
+    except those in `skip`. Deterministic IDs carry their file key, so only chunks of wanted files are fetched.
+    The fetched metadata is added to `fetched`.
+    """
+    namespace = user_namespace(user_id)
+    user_prefix = chunk_id_prefix(user_id)
+    skipped = {chunk_id_prefix(user_id, filename) for filename in skip}
+    wanted = None if filenames is None else {chunk_id_prefix(user_id, filename) for filename in filenames}
+
+    def needed(chunk_id: str) -> bool:
+        if not chunk_id.startswith(user_prefix):
+            # Random ID moved here by the migration: its file is only known from the metadata.
+            return True
+        file_prefix = chunk_id.rsplit("#", 1)[0] + "#"
+        return file_prefix not in skipped and (wanted is None or file_prefix in wanted)
+
+    ids = [chunk_id for chunk_id in list_index_ids("", namespace) if needed(chunk_id)]
+    metadata = fetch_chunk_metadata(ids, namespace)
+    fetched.update(metadata)
+    return _positions_by_file(metadata, filenames, skip)
+
+
+def _legacy_positions_by_file(user_id: int, filenames: Optional[List[str]], skip: Set[str],
+                              fetched: Dict[str, dict]) -> Dict[str, Dict[str, int]]:
+    """The same for the shared legacy namespace, where chunks are found by metadata filter, random IDs included."""
+    metadata = fetch_chunk_metadata(legacy_chunk_ids(user_id, filenames, skip), LEGACY_NAMESPACE)
+    # A chunk in both namespaces (mid-migration) is read from the user's namespace.
+    fetched.update({chunk_id: meta for chunk_id, meta in metadata.items() if chunk_id not in fetched})
+    return _positions_by_file(metadata, filenames, skip)
+
+
+def _list_index_ids(user_id: int, filenames: Optional[List[str]], skip: Set[str],
+                    fetched: Dict[str, dict]) -> Dict[str, List[str]]:
+    """
+    IDs per filename in document order: the union of the user's namespace and, while it may still hold
+    their vectors, the shared legacy namespace. A file can be split across both mid-migration.
+    """
+    positions = _user_positions_by_file(user_id, filenames, skip, fetched)
+    if LEGACY_NAMESPACE_FALLBACK:
+        for filename, legacy in _legacy_positions_by_file(user_id, filenames, skip, fetched).items():
+            # A chunk already copied to the user's namespace keeps the position stored there.
+            positions[filename] = {**legacy, **positions.get(filename, {})}
+    # IDs are content hashes, so document order comes from the chunk_index metadata.
+    return {
+        filename: sorted(file_positions, key=file_positions.get)
+        for filename, file_positions in positions.items()
+    }
+
+
+def _list_chunk_ids(user_id: int, filenames: Optional[List[str]], fetched: Dict[str, dict]) -> List[str]:
+    requested = list(dict.fromkeys(filenames)) if filenames else None
+    local = chunk_store.chunk_ids_by_file(user_id, requested)
+    indexed = {}
+    if requested is None or any(filename not in local for filename in requested):
+        indexed = _list_index_ids(user_id, requested, set(local), fetched)
+
+    order = requested or sorted(set(local) | set(indexed))
+    return [chunk_id for filename in order for chunk_id in local.get(filename) or indexed.get(filename, [])]
+
+
+def list_chunk_ids(user_id: int, filenames: Optional[List[str]] = None) -> List[str]:
+    """
+    Returns the IDs of a user's chunks in stable document order: file by file
+    (in the order of `filenames`, otherwise by filename), chunk by chunk within a file.
+    Files held by the local chunk store are read from it; every other file is listed from the index.
+    """
+    return _list_chunk_ids(user_id, filenames, {})
+
+
+def _owned_chunk(user_id: int, chunk_id: str, metadata: Optional[dict]) -> Optional[Dict[str, Any]]:
+    if not metadata or metadata.get("user_id") != user_id:
+        print(
+            f"SECURITY WARNING/DATA MISMATCH: Attempt to fetch chunk {chunk_id} for user {user_id}, "
+            f"but it belongs to another user or metadata is missing."
+        )
+        return None
+    return {"id": chunk_id, "text": metadata.get("text", ""), "metadata": metadata}
+
+
+def _fetch_from_index(user_id: int, chunk_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    vectors = dict(vectorstore._index.fetch(ids=chunk_ids, namespace=user_namespace(user_id)).vectors)
+    missing = [chunk_id for chunk_id in chunk_ids if chunk_id not in vectors]
+    if missing and LEGACY_NAMESPACE_FALLBACK:
+        vectors.update(vectorstore._index.fetch(ids=missing, namespace=LEGACY_NAMESPACE).vectors)
+
+    chunks = {}
+    for chunk_id in chunk_ids:
+        vector_data = vectors.get(chunk_id)
+        if vector_data is None:
+            continue
+        chunk = _owned_chunk(user_id, chunk_id, vector_data.metadata)
+        if chunk is not None:
+            chunks[chunk_id] = chunk
+    return chunks
+
+
+def iter_chunks(
+        user_id: int,
+        filenames: Optional[List[str]] = None,
+        chunk_ids: Optional[List[str]] = None,
+        page_size: int = MAX_PAGE_SIZE
+) -> Iterator[Dict[str, Any]]:
+    """
+    Lazily yields a user's chunks as {'id', 'text', 'metadata'} dicts, one page at a time.
+    Pages are read from the local chunk store; only chunks missing there are fetched from the index.
+    Files listed from the index already had their metadata (text included) fetched to be ordered, so
+    their chunks are served from that listing instead of being fetched a second time.
+    Pass `chunk_ids` to enumerate an explicit list instead of whole files.
+    Chunks that belong to another user are skipped.
+    """
+    fetched: Dict[str, dict] = {}
+    if chunk_ids is None:
+        chunk_ids = _list_chunk_ids(user_id, filenames, fetched)
+
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    for start in range(0, len(chunk_ids), page_size):
+        page = chunk_ids[start:start + page_size]
+
+        chunks = chunk_store.get_chunks(user_id, page)
+        for chunk_id in page:
+            if chunk_id not in chunks and chunk_id in fetched:
+                chunk = _owned_chunk(user_id, chunk_id, fetched.pop(chunk_id))
+                if chunk is not None:
+                    chunks[chunk_id] = chunk
+        missing = [chunk_id for chunk_id in page if chunk_id not in chunks]
+        if missing:
+            chunks.update(_fetch_from_index(user_id, missing))
+
+        for chunk_id in page:
+            if chunk_id in chunks:
+                yield chunks[chunk_id]
@@ -0,0 +1,124 @@
+import os
+import sqlite3
+from contextlib import closing
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from langchain.schema import Document
+
+from ai.core.tokens import count_tokens_batch
+
+CHUNK_STORE_PATH = os.getenv("CHUNK_STORE_PATH", "data/chunks.sqlite3")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    id TEXT PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    filename TEXT NOT NULL,
+    chunk_index INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    token_count INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_chunks_user_file ON chunks (user_id, filename, chunk_index);
+"""
+
+
+@lru_cache(maxsize=1)
+def _init_db(path: str) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with closing(sqlite3.connect(path)) as conn:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        conn.commit()
+
+
+def _connect() -> sqlite3.Connection:
+    _init_db(CHUNK_STORE_PATH)
+    conn = sqlite3.connect(CHUNK_STORE_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _row_to_chunk(row: sqlite3.Row) -> Dict[str, Any]:
+    return {
+        "id": row["id"],
+        "text": row["text"],
+        "metadata": {
+            "user_id": row["user_id"],
+            "filename": row["filename"],
+            "chunk_index": row["chunk_index"],
+            "token_count": row["token_count"],
+            "text": row["text"],
+        },
+    }
+
+
+def save_chunks(user_id: int, filename: str, ids: List[str], chunks: List[Document]) -> None:
+    """Replaces the stored chunks of one file with the freshly ingested ones."""
+    # Chunks from the splitter carry their token count; only older callers' chunks are counted here.
+    missing = [chunk for chunk in chunks if chunk.metadata.get("token_count") is None]
+    for chunk, count in zip(missing, count_tokens_batch([chunk.page_content for chunk in missing])):
+        chunk.metadata["token_count"] = count
+    token_counts = [chunk.metadata["token_count"] for chunk in chunks]
+    rows = [
+        (chunk_id, user_id, filename, chunk.metadata["chunk_index"], chunk.page_content, token_count)
+        for chunk_id, chunk, token_count in zip(ids, chunks, token_counts)
+    ]
+    with closing(_connect()) as conn, conn:
+        conn.execute("DELETE FROM chunks WHERE user_id = ? AND filename = ?", (user_id, filename))
+        conn.executemany(
+            "INSERT OR REPLACE INTO chunks (id, user_id, filename, chunk_index, text, token_count) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            rows
+        )
+
+
+def delete_file_chunks(user_id: int, filename: str) -> None:
+    with closing(_connect()) as conn, conn:
+        conn.execute("DELETE FROM chunks WHERE user_id = ? AND filename = ?", (user_id, filename))
+
+
+def chunk_ids_by_file(user_id: int, filenames: Optional[List[str]] = None) -> Dict[str, List[str]]:
+    """IDs of the stored chunks per filename, in document order. Files that are not stored are omitted."""
+    with closing(_connect()) as conn:
+        if not filenames:
+            rows = conn.execute(
+                "SELECT id, filename FROM chunks WHERE user_id = ? ORDER BY filename, chunk_index",
+                (user_id,)
+            ).fetchall()
+        else:
+            placeholders = ",".join("?" * len(filenames))
+            rows = conn.execute(
+                f"SELECT id, filename FROM chunks WHERE user_id = ? AND filename IN ({placeholders}) "
+                "ORDER BY filename, chunk_index",
+                (user_id, *filenames)
+            ).fetchall()
+    ids = {}
+    for row in rows:
+        ids.setdefault(row["filename"], []).append(row["id"])
+    return ids
+
+
+def chunk_positions(user_id: int, filename: str) -> Dict[str, int]:
+    """Chunk index of every stored chunk of one file, keyed by ID."""
+    with closing(_connect()) as conn:
+        rows = conn.execute(
+            "SELECT id, chunk_index FROM chunks WHERE user_id = ? AND filename = ?",
+            (user_id, filename)
+        ).fetchall()
+    return {row["id"]: row["chunk_index"] for row in rows}
+
+
+def get_chunks(user_id: int, chunk_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Stored chunks of the given user keyed by ID. IDs that are not stored locally are omitted."""
+    if not chunk_ids:
+        return {}
+    placeholders = ",".join("?" * len(chunk_ids))
+    with closing(_connect()) as conn:
+        rows = conn.execute(
+            f"SELECT * FROM chunks WHERE user_id = ? AND id IN ({placeholders})",
+            (user_id, *chunk_ids)
+        ).fetchall()
+    return {row["id"]: _row_to_chunk(row) for row in rows}
@@ -0,0 +1,101 @@
+import hashlib
+import os
+import sqlite3
+from array import array
+from contextlib import closing
+from functools import lru_cache
+from typing import Dict, List
+
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_STORE_PATH = os.getenv("EMBEDDING_STORE_PATH", "data/embeddings.sqlite3")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))
+
+# SQLite limits the number of bound parameters per statement.
+_LOOKUP_BATCH = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    vector BLOB NOT NULL,
+    PRIMARY KEY (model, sha256)
+);
+"""
+
+
+@lru_cache(maxsize=1)
+def _init_db(path: str) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with closing(sqlite3.connect(path)) as conn:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        conn.commit()
+
+
+def _connect() -> sqlite3.Connection:
+    _init_db(EMBEDDING_STORE_PATH)
+    return sqlite3.connect(EMBEDDING_STORE_PATH, timeout=30)
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def load_vectors(model: str, hashes: List[str]) -> Dict[str, List[float]]:
+    """Stored vectors of `model` keyed by text hash. Hashes that were never embedded are omitted."""
+    found = {}
+    with closing(_connect()) as conn:
+        for start in range(0, len(hashes), _LOOKUP_BATCH):
+            batch = hashes[start:start + _LOOKUP_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(
+                f"SELECT sha256, vector FROM embeddings WHERE model = ? AND sha256 IN ({placeholders})",
+                (model, *batch)
+            ).fetchall()
+            for sha256, raw in rows:
+                vector = array("f")
+                vector.frombytes(raw)
+                found[sha256] = vector.tolist()
+    return found
+
+
+def save_vectors(model: str, vectors: Dict[str, List[float]]) -> None:
+    with closing(_connect()) as conn, conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (model, sha256, vector) VALUES (?, ?, ?)",
+            [(model, sha256, array("f", vector).tobytes()) for sha256, vector in vectors.items()]
+        )
+
+
+def embed_documents(embeddings: Embeddings, texts: List[str], batch_size: int = EMBEDDING_BATCH_SIZE) -> List[List[float]]:
+    """
+    Vectors for `texts` in order. Each distinct text is looked up by sha256 and model first; only
+    the misses go to the embeddings API, `batch_size` texts per call, and are stored right away.
+    """
+    model = getattr(embeddings, "model", type(embeddings).__name__)
+    hashes = [text_hash(text) for text in texts]
+    texts_by_hash = dict(zip(hashes, texts))
+
+    try:
+        vectors = load_vectors(model, list(texts_by_hash))
+    except sqlite3.Error as e:
+        print(f"[WARN] Embedding store lookup failed: {e}")
+        vectors = {}
+
+    missing = [sha256 for sha256 in texts_by_hash if sha256 not in vectors]
+    print(f"[INFO] Embedding {len(missing)} of {len(texts_by_hash)} distinct chunks ({len(vectors)} from the store)")
+
+    for start in range(0, len(missing), batch_size):
+        batch = missing[start:start + batch_size]
+        fresh = dict(zip(batch, embeddings.embed_documents([texts_by_hash[sha256] for sha256 in batch])))
+        vectors.update(fresh)
+        # Saved per batch, so a failed upload keeps what was already paid for.
+        try:
+            save_vectors(model, fresh)
+        except sqlite3.Error as e:
+            print(f"[WARN] Could not write embeddings to the store: {e}")
+
+    return [vectors[sha256] for sha256 in hashes]
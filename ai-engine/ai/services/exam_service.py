@@ -1,6 +1,8 @@
-from ai.agents.exam_agent import generate_questions_from_rag, check_text_answers
+from typing import List
+
+from ai.agents.exam_agent import generate_questions_from_rag, check_text_answers, check_text_answers_batch
 from ai.agents.question_clarifier_agent import clarify_question_agent
-from ai.schemas.exam import ExamGenerateParams, QuestionClarificationPayload, TextQuestion
+from ai.schemas.exam import ExamGenerateParams, QuestionClarificationPayload, TextAnswerBatch, TextQuestion
 
 
 class ExamService:
@@ -9,21 +11,21 @@ class ExamService:
         self.default_model = default_model
         self.default_temperature = default_temperature
 
-    def generate_questions(self, exam_params: ExamGenerateParams, model=None, temperature=None):
+    async def generate_questions(self, exam_params: ExamGenerateParams, model=None, temperature=None):
         model = model or self.default_model
         temperature = temperature or self.default_temperature
 
-        questions = generate_questions_from_rag(exam_params, model, temperature)
+        questions = await generate_questions_from_rag(exam_params, model, temperature)
 
         return questions
 
-    def clarify_question(self, payload: QuestionClarificationPayload, model=None, temperature=None) -> str:
+    async def clarify_question(self, payload: QuestionClarificationPayload, model=None, temperature=None) -> str:
         model = model or self.default_model
         temperature = temperature or self.default_temperature
 
         print(payload)
 
-        agent_response = clarify_question_agent(
+        agent_response = await clarify_question_agent(
             user_id=payload.user_id,
             original_question=payload.original_question,
             user_message=payload.user_message,
@@ -38,10 +40,16 @@ class ExamService:
         )
         return agent_response
 
-    def check_answer(self, question: TextQuestion, model=None, temperature=None):
+    async def check_answer(self, question: TextQuestion, model=None, temperature=None):
         model = model or self.default_model
         temperature = temperature or self.default_temperature
 
-        answer = check_text_answers(question, model, temperature)
+        answer = await check_text_answers(question, model, temperature)
 
         return answer
+
+    async def check_answers(self, batch: TextAnswerBatch, model=None, temperature=None) -> List[str]:
+        model = model or self.default_model
+        temperature = temperature or self.default_temperature
+
+        return await check_text_answers_batch(batch.user_id, batch.questions, batch.sources, model, temperature)
@@ -10,9 +10,9 @@ class FlashcardService:
         self.default_model = default_model
         self.default_temperature = float(default_temperature)
 
-    def generate_flashcard(self, flashcard_params: FlashcardGenerateParams, model=None, temperature=None):
+    async def generate_flashcard(self, flashcard_params: FlashcardGenerateParams, model=None, temperature=None):
         final_model = model or self.default_model
         final_temperature = temperature or self.default_temperature
 
-        flashcards = generate_flashcard(flashcard_params, final_model, final_temperature)
+        flashcards = await generate_flashcard(flashcard_params, final_model, final_temperature)
         return flashcards
@@ -7,7 +7,7 @@ class PracticeService:
         self.default_model = default_model
         self.default_temperature = float(default_temperature)
 
-    def grade_note(self, params: GradePracticeParams, model=None, temperature=None) -> str:
+    async def grade_note(self, params: GradePracticeParams, model=None, temperature=None) -> str:
         final_model = model or self.default_model
         final_temp = temperature or self.default_temperature
-        return grade_practice_note(params=params, model=final_model, temperature=final_temp)
+        return await grade_practice_note(params=params, model=final_model, temperature=final_temp)
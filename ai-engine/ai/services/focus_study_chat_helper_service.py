@@ -9,11 +9,11 @@ class FocusStudyChatHelperService:
         self.default_temperature = default_temperature
 
 
-    def clarify_question(self, payload: FocusStudyHelperParams, model=None, temperature=None) -> str:
+    async def clarify_question(self, payload: FocusStudyHelperParams, model=None, temperature=None) -> str:
         model = model or self.default_model
         temperature = temperature or self.default_temperature
 
-        agent_response = focus_study_assistant_agent(
+        agent_response = await focus_study_assistant_agent(
             params=payload,
             api_key=self.api_key,
             model=model,
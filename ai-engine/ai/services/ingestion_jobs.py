@@ -0,0 +1,212 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+import redis
+from fastapi import UploadFile
+
+from ai.core.redis_client import get_redis
+from ai.services.pinecone_service import ingest_file, check_file_type
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+INGEST_SPOOL_DIR = os.getenv("INGEST_SPOOL_DIR", "data/uploads")
+INGEST_JOB_TTL_SECONDS = int(os.getenv("INGEST_JOB_TTL_SECONDS", str(24 * 3600)))
+INGEST_WORKER_TTL_SECONDS = int(os.getenv("INGEST_WORKER_TTL_SECONDS", "30"))
+SPOOL_CHUNK_SIZE = 1024 * 1024
+
+# Job state lives in one Redis hash per job, so any uvicorn worker can answer the status endpoint.
+JOB_KEY_PREFIX = "ingest_job"
+# Queued and running jobs, so stale ones can be found without scanning every job hash.
+ACTIVE_JOBS_KEY = "ingest_jobs:active"
+# Every process keeps a key with a short TTL alive while it runs; jobs of a process whose key expired are orphaned.
+WORKER_KEY_PREFIX = "ingest_worker"
+WORKER_ID = uuid.uuid4().hex
+_COUNTERS = ("pages_parsed", "chunks_split", "chunks_embedded", "chunks_upserted")
+_INTERNAL_FIELDS = ("worker", "path")
+
+_executor = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="ingest")
+_heartbeat_started = threading.Event()
+
+
+class SpoolError(Exception):
+    pass
+
+
+class JobQueueError(Exception):
+    pass
+
+
+def spool_upload(file: UploadFile) -> str:
+    """Copies the upload to a file under INGEST_SPOOL_DIR in fixed-size chunks and returns its path."""
+    ext = check_file_type(file.filename)
+    try:
+        os.makedirs(INGEST_SPOOL_DIR, exist_ok=True)
+        fd, path = tempfile.mkstemp(suffix=ext, dir=INGEST_SPOOL_DIR)
+    except OSError as e:
+        raise SpoolError(f"Could not create spool file: {e}")
+    try:
+        with os.fdopen(fd, "wb") as spool:
+            shutil.copyfileobj(file.file, spool, SPOOL_CHUNK_SIZE)
+    except Exception as e:
+        os.remove(path)
+        raise SpoolError(f"Could not write uploaded file to spool file: {e}")
+    return path
+
+
+def _remove_spool_file(path: Optional[str]) -> None:
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+def _job_key(job_id: str) -> str:
+    return f"{JOB_KEY_PREFIX}:{job_id}"
+
+
+def _worker_key(worker_id: str) -> str:
+    return f"{WORKER_KEY_PREFIX}:{worker_id}"
+
+
+def _update_job(job_id: str, **fields: Any) -> None:
+    try:
+        pipe = get_redis().pipeline()
+        pipe.hset(_job_key(job_id), mapping={name: str(value) for name, value in fields.items()})
+        pipe.expire(_job_key(job_id), INGEST_JOB_TTL_SECONDS)
+        pipe.execute()
+    except redis.RedisError as e:
+        print(f"[WARN] Could not update ingestion job {job_id}: {e}")
+
+
+def _progress(job_id: str):
+    def report(counter: str, amount: int) -> None:
+        try:
+            get_redis().hincrby(_job_key(job_id), counter, amount)
+        except redis.RedisError as e:
+            print(f"[WARN] Could not update ingestion job {job_id}: {e}")
+    return report
+
+
+def _read_job(job_id: str) -> Dict[str, str]:
+    return {name.decode(): value.decode() for name, value in get_redis().hgetall(_job_key(job_id)).items()}
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    job = _read_job(job_id)
+    if not job:
+        return None
+    for field in _INTERNAL_FIELDS:
+        job.pop(field, None)
+    job["user_id"] = int(job["user_id"])
+    if "file_id" in job:
+        job["file_id"] = int(job["file_id"])
+    for counter in _COUNTERS:
+        job[counter] = int(job.get(counter, 0))
+    return job
+
+
+def _run_job(job_id: str, path: str, filename: str, user_id: int, reingest: bool) -> None:
+    _update_job(job_id, status="running", started_at=time.time())
+    try:
+        ingest_file(path, filename, user_id, reingest=reingest, progress=_progress(job_id))
+        _update_job(job_id, status="done", finished_at=time.time())
+    except Exception as e:
+        print(f"[WARN] Ingestion job {job_id} for '{filename}' failed: {e}")
+        _update_job(job_id, status="failed", error=str(e), finished_at=time.time())
+    finally:
+        _remove_spool_file(path)
+        try:
+            get_redis().srem(ACTIVE_JOBS_KEY, job_id)
+        except redis.RedisError as e:
+            print(f"[WARN] Could not update ingestion job {job_id}: {e}")
+
+
+def submit_ingestion(path: str, filename: str, user_id: int, reingest: bool = False,
+                     file_id: Optional[int] = None) -> str:
+    """
+    Queues parse -> split -> embed -> upsert of a spooled file and returns the job ID right away.
+    `file_id` is the caller's record of the file, echoed in the job status so a failed upload can be cleaned up.
+    """
+    job_id = uuid.uuid4().hex
+    fields = {
+        "status": "queued", "user_id": user_id, "filename": filename, "created_at": time.time(),
+        "worker": WORKER_ID, "path": path, **{counter: 0 for counter in _COUNTERS}
+    }
+    if file_id is not None:
+        fields["file_id"] = file_id
+    try:
+        # Unlike progress updates this must not fail silently: without the hash nobody could ever see the job.
+        pipe = get_redis().pipeline()
+        pipe.hset(_job_key(job_id), mapping={name: str(value) for name, value in fields.items()})
+        pipe.expire(_job_key(job_id), INGEST_JOB_TTL_SECONDS)
+        pipe.sadd(ACTIVE_JOBS_KEY, job_id)
+        pipe.execute()
+    except redis.RedisError as e:
+        _remove_spool_file(path)
+        raise JobQueueError(f"Could not record ingestion job: {e}")
+    _executor.submit(_run_job, job_id, path, filename, user_id, reingest)
+    return job_id
+
+
+def recover_stale_jobs() -> int:
+    """
+    Marks queued and running jobs whose process is gone (its worker key expired) as failed and removes
+    their spool files. Returns how many jobs were recovered.
+    """
+    r = get_redis()
+    recovered = 0
+    for raw_id in r.smembers(ACTIVE_JOBS_KEY):
+        job_id = raw_id.decode()
+        job = _read_job(job_id)
+        if job.get("status") in ("queued", "running"):
+            if r.exists(_worker_key(job.get("worker", ""))):
+                continue
+            _update_job(job_id, status="failed", error="Ingestion was interrupted by a restart",
+                        finished_at=time.time())
+            _remove_spool_file(job.get("path"))
+            recovered += 1
+        r.srem(ACTIVE_JOBS_KEY, job_id)
+    if recovered:
+        print(f"[INFO] Marked {recovered} orphaned ingestion jobs as failed")
+    return recovered
+
+
+def _remove_orphaned_spool_files() -> None:
+    """Removes spool files no active job refers to. Recent files may still be being written, so they stay."""
+    if not os.path.isdir(INGEST_SPOOL_DIR):
+        return
+    r = get_redis()
+    in_use = {_read_job(raw_id.decode()).get("path") for raw_id in r.smembers(ACTIVE_JOBS_KEY)}
+    cutoff = time.time() - INGEST_WORKER_TTL_SECONDS
+    for name in os.listdir(INGEST_SPOOL_DIR):
+        path = os.path.join(INGEST_SPOOL_DIR, name)
+        if path not in in_use and os.path.isfile(path) and os.path.getmtime(path) < cutoff:
+            os.remove(path)
+
+
+def _heartbeat() -> None:
+    while True:
+        try:
+            get_redis().set(_worker_key(WORKER_ID), 1, ex=INGEST_WORKER_TTL_SECONDS)
+            # A worker key outlives a crashed process by up to the TTL, so recovery keeps running after startup.
+            recover_stale_jobs()
+        except redis.RedisError as e:
+            print(f"[WARN] Ingestion worker heartbeat failed: {e}")
+        time.sleep(INGEST_WORKER_TTL_SECONDS / 3)
+
+
+def start_ingestion_worker() -> None:
+    """Called on startup: recovers jobs orphaned by a previous run and keeps this process's worker key alive."""
+    if _heartbeat_started.is_set():
+        return
+    _heartbeat_started.set()
+    try:
+        get_redis().set(_worker_key(WORKER_ID), 1, ex=INGEST_WORKER_TTL_SECONDS)
+        recover_stale_jobs()
+        _remove_orphaned_spool_files()
+    except (redis.RedisError, OSError) as e:
+        print(f"[WARN] Could not recover ingestion jobs on startup: {e}")
+    threading.Thread(target=_heartbeat, daemon=True, name="ingest-heartbeat").start()
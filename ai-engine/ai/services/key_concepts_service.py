@@ -7,11 +7,11 @@ class KeyConceptService:
         self.default_model = default_model
         self.default_temperature = float(default_temperature)
 
-    def create_single_concept(self, request: SingleConceptParams, model=None, temperature=None) -> KeyConceptOutput:
+    async def create_single_concept(self, request: SingleConceptParams, model=None, temperature=None) -> KeyConceptOutput:
         final_model = model or self.default_model
         final_temperature = temperature or self.default_temperature
 
-        concept = generate_single_key_concept(
+        concept = await generate_single_key_concept(
             params=request,
             model=final_model,
             temperature=final_temperature
@@ -11,7 +11,7 @@ class KnowledgeTreeService:
         self.default_model = default_model
         self.default_temperature = float(default_temperature)
 
-    def create_user_knowledge_tree(self, request: KnowledgeTreeCreateRequest, model=None, temperature=None) -> Dict[str, Any]:
+    async def create_user_knowledge_tree(self, request: KnowledgeTreeCreateRequest, model=None, temperature=None) -> Dict[str, Any]:
         """
         Orkiestruje proces generowania drzewa wiedzy dla użytkownika.
         """
@@ -25,7 +25,7 @@ class KnowledgeTreeService:
         )
 
         try:
-            knowledge_tree = generate_knowledge_tree(
+            knowledge_tree = await generate_knowledge_tree(
                 params=agent_params,
                 model=final_model,
                 temperature=final_temperature
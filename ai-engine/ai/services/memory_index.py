@@ -0,0 +1,174 @@
+import math
+import threading
+from collections import defaultdict
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional
+
+
+class _Vector(SimpleNamespace):
+    id: str
+    values: List[float]
+    metadata: Dict[str, Any]
+
+
+def _compare(value: Any, condition: Any) -> bool:
+    if not isinstance(condition, dict):
+        return value == condition
+    for operator, expected in condition.items():
+        if operator == "$eq" and not value == expected:
+            return False
+        if operator == "$ne" and not value != expected:
+            return False
+        if operator == "$in" and value not in expected:
+            return False
+        if operator == "$nin" and value in expected:
+            return False
+        if operator in ("$gt", "$gte", "$lt", "$lte"):
+            if value is None:
+                return False
+            if operator == "$gt" and not value > expected:
+                return False
+            if operator == "$gte" and not value >= expected:
+                return False
+            if operator == "$lt" and not value < expected:
+                return False
+            if operator == "$lte" and not value <= expected:
+                return False
+    return True
+
+
+def matches_filter(metadata: Dict[str, Any], search_filter: Optional[dict]) -> bool:
+    """Evaluates a Pinecone metadata filter ($and, $or, $eq, $ne, $in, $nin, $gt(e), $lt(e)) locally."""
+    if not search_filter:
+        return True
+    for key, condition in search_filter.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, part) for part in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, part) for part in condition):
+                return False
+        elif not _compare(metadata.get(key), condition):
+            return False
+    return True
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return sum(x * y for x, y in zip(a, b)) / norm if norm else 0.0
+
+
+class InMemoryIndex:
+    """
+    Process-local stand-in for the part of pinecone.Index the services use: upsert, fetch, list,
+    list_paginated, query, update, delete and describe_index_stats, with namespaces and metadata filters.
+    Meant for exercising migrations and ingestion locally, not for production.
+    """
+
+    def __init__(self):
+        self._namespaces: Dict[str, Dict[str, _Vector]] = defaultdict(dict)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _name(namespace: Optional[str]) -> str:
+        return namespace or ""
+
+    def upsert(self, vectors: List[Any], namespace: Optional[str] = None, **kwargs: Any) -> Dict[str, int]:
+        with self._lock:
+            store = self._namespaces[self._name(namespace)]
+            for vector in vectors:
+                if isinstance(vector, dict):
+                    vector_id, values, metadata = vector["id"], vector["values"], vector.get("metadata")
+                else:
+                    vector_id, values, metadata = (tuple(vector) + (None,))[:3]
+                store[vector_id] = _Vector(id=vector_id, values=list(values), metadata=dict(metadata or {}))
+        return {"upserted_count": len(vectors)}
+
+    def fetch(self, ids: List[str], namespace: Optional[str] = None, **kwargs: Any) -> SimpleNamespace:
+        with self._lock:
+            store = self._namespaces.get(self._name(namespace), {})
+            found = {
+                vector_id: _Vector(id=vector_id, values=list(store[vector_id].values),
+                                   metadata=dict(store[vector_id].metadata))
+                for vector_id in ids if vector_id in store
+            }
+        return SimpleNamespace(vectors=found, namespace=self._name(namespace))
+
+    def list_paginated(self, prefix: Optional[str] = None, limit: int = 100, pagination_token: Optional[str] = None,
+                       namespace: Optional[str] = None, **kwargs: Any) -> SimpleNamespace:
+        """IDs in lexical order; the pagination token is the last ID of the previous page."""
+        with self._lock:
+            ids = sorted(
+                vector_id for vector_id in self._namespaces.get(self._name(namespace), {})
+                if vector_id.startswith(prefix or "") and (pagination_token is None or vector_id > pagination_token)
+            )
+        page = ids[:limit]
+        next_token = page[-1] if len(ids) > limit else None
+        return SimpleNamespace(
+            vectors=[SimpleNamespace(id=vector_id) for vector_id in page],
+            pagination=SimpleNamespace(next=next_token) if next_token else None,
+            namespace=self._name(namespace)
+        )
+
+    def list(self, prefix: Optional[str] = None, limit: int = 100, namespace: Optional[str] = None,
+             **kwargs: Any) -> Iterator[List[str]]:
+        token = None
+        while True:
+            page = self.list_paginated(prefix=prefix, limit=limit, pagination_token=token, namespace=namespace)
+            if page.vectors:
+                yield [vector.id for vector in page.vectors]
+            if page.pagination is None:
+                return
+            token = page.pagination.next
+
+    def query(self, vector: List[float], top_k: int = 10, filter: Optional[dict] = None,
+              namespace: Optional[str] = None, include_metadata: bool = False, include_values: bool = False,
+              **kwargs: Any) -> Dict[str, Any]:
+        with self._lock:
+            candidates = [
+                stored for stored in self._namespaces.get(self._name(namespace), {}).values()
+                if matches_filter(stored.metadata, filter)
+            ]
+        scored = sorted(((_cosine(vector, stored.values), stored) for stored in candidates),
+                        key=lambda item: item[0], reverse=True)[:top_k]
+        matches = []
+        for score, stored in scored:
+            match = {"id": stored.id, "score": score}
+            if include_metadata:
+                match["metadata"] = dict(stored.metadata)
+            if include_values:
+                match["values"] = list(stored.values)
+            matches.append(match)
+        return {"matches": matches, "namespace": self._name(namespace)}
+
+    def update(self, id: str, values: Optional[List[float]] = None, set_metadata: Optional[dict] = None,
+               namespace: Optional[str] = None, **kwargs: Any) -> Dict[str, Any]:
+        with self._lock:
+            stored = self._namespaces.get(self._name(namespace), {}).get(id)
+            if stored is not None:
+                if values is not None:
+                    stored.values = list(values)
+                stored.metadata.update(set_metadata or {})
+        return {}
+
+    def delete(self, ids: Optional[List[str]] = None, delete_all: bool = False, filter: Optional[dict] = None,
+               namespace: Optional[str] = None, **kwargs: Any) -> Dict[str, Any]:
+        with self._lock:
+            store = self._namespaces.get(self._name(namespace), {})
+            if delete_all:
+                doomed = list(store)
+            elif ids is not None:
+                doomed = [vector_id for vector_id in ids if vector_id in store]
+            else:
+                doomed = [vector_id for vector_id, stored in store.items() if matches_filter(stored.metadata, filter)]
+            for vector_id in doomed:
+                del store[vector_id]
+        return {}
+
+    def describe_index_stats(self, **kwargs: Any) -> Dict[str, Any]:
+        with self._lock:
+            namespaces = {name: {"vector_count": len(store)} for name, store in self._namespaces.items() if store}
+            dimension = next((len(stored.values) for store in self._namespaces.values()
+                              for stored in store.values()), 0)
+        return {"namespaces": namespaces, "dimension": dimension,
+                "total_vector_count": sum(ns["vector_count"] for ns in namespaces.values())}
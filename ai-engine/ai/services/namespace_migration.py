@@ -0,0 +1,156 @@
+"""
+Moves vectors from the shared legacy namespace into per-user namespaces.
+
+Each batch is listed, fetched, upserted into the namespace of its user_id (vectors without one go to
+UNASSIGNED_NAMESPACE) and only then deleted from the source. An interrupted run can simply be started
+again: whatever is left in the source is still unmigrated, and a batch that was copied but not yet
+deleted is copied again under the same IDs. With --keep-source nothing is deleted and the run resumes
+from the pagination token saved in the checkpoint file instead.
+
+Once the source namespace is empty, set LEGACY_NAMESPACE_FALLBACK=false.
+
+Usage (from ai-engine/):
+    python -m ai.services.namespace_migration [--batch-size 100] [--max-batches N] [--keep-source]
+"""
+import argparse
+import json
+import os
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from ai.services.namespaces import LEGACY_NAMESPACE, UNASSIGNED_NAMESPACE, user_namespace
+
+MIGRATION_CHECKPOINT_PATH = os.getenv("NAMESPACE_MIGRATION_CHECKPOINT", "data/namespace_migration.json")
+# Pinecone caps list() pages and fetch() requests at 100 IDs.
+MIGRATION_BATCH_SIZE = 100
+
+
+def _target_namespace(metadata: Dict[str, Any]) -> str:
+    user_id = metadata.get("user_id")
+    if user_id is None:
+        return UNASSIGNED_NAMESPACE
+    try:
+        return user_namespace(int(user_id))
+    except (TypeError, ValueError):
+        return UNASSIGNED_NAMESPACE
+
+
+class NamespaceMigration:
+    """
+    `index` needs Pinecone's list_paginated, fetch, upsert and delete; ai.services.memory_index.InMemoryIndex
+    works as a local stand-in. Progress is written to `checkpoint_path` after every batch (None disables it).
+    """
+
+    def __init__(self, index: Any, source_namespace: str = LEGACY_NAMESPACE,
+                 batch_size: int = MIGRATION_BATCH_SIZE, checkpoint_path: Optional[str] = MIGRATION_CHECKPOINT_PATH,
+                 keep_source: bool = False):
+        self.index = index
+        self.source_namespace = source_namespace
+        self.batch_size = max(1, min(batch_size, MIGRATION_BATCH_SIZE))
+        self.checkpoint_path = checkpoint_path
+        self.keep_source = keep_source
+
+    def _load_state(self) -> Dict[str, Any]:
+        state = {"source_namespace": self.source_namespace, "batches": 0, "migrated": 0, "unassigned": 0,
+                 "pagination_token": None, "done": False}
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, encoding="utf-8") as f:
+                saved = json.load(f)
+            if saved.get("source_namespace") == self.source_namespace:
+                state.update(saved)
+        return state
+
+    def _save_state(self, state: Dict[str, Any]) -> None:
+        if not self.checkpoint_path:
+            return
+        directory = os.path.dirname(self.checkpoint_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _next_page(self, token: Optional[str]) -> Tuple[List[str], Optional[str]]:
+        page = self.index.list_paginated(limit=self.batch_size, pagination_token=token,
+                                         namespace=self.source_namespace)
+        ids = [vector.id for vector in page.vectors or []]
+        next_token = page.pagination.next if page.pagination else None
+        return ids, next_token
+
+    def migrate_batch(self, ids: List[str]) -> Dict[str, int]:
+        """Copies one batch into the owners' namespaces, then removes it from the source unless keep_source."""
+        vectors = self.index.fetch(ids=ids, namespace=self.source_namespace).vectors
+        by_namespace = defaultdict(list)
+        for vector_id in ids:
+            vector_data = vectors.get(vector_id)
+            if vector_data is None:
+                continue
+            metadata = dict(vector_data.metadata or {})
+            by_namespace[_target_namespace(metadata)].append((vector_id, list(vector_data.values), metadata))
+
+        for namespace, records in by_namespace.items():
+            self.index.upsert(vectors=records, namespace=namespace)
+        if not self.keep_source:
+            self.index.delete(ids=ids, namespace=self.source_namespace)
+
+        return {namespace: len(records) for namespace, records in by_namespace.items()}
+
+    def run(self, max_batches: Optional[int] = None) -> Dict[str, Any]:
+        state = self._load_state()
+        if state["done"] and self.keep_source:
+            return state
+        state["done"] = False
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            # Without keep_source every migrated batch leaves the source, so the first page is always the next one.
+            token = state["pagination_token"] if self.keep_source else None
+            ids, next_token = self._next_page(token)
+            if not ids:
+                state["done"] = True
+                break
+
+            moved = self.migrate_batch(ids)
+            batches += 1
+            state["batches"] += 1
+            state["migrated"] += sum(moved.values())
+            state["unassigned"] += moved.get(UNASSIGNED_NAMESPACE, 0)
+            state["pagination_token"] = next_token if self.keep_source else None
+            if self.keep_source and next_token is None:
+                state["done"] = True
+            self._save_state(state)
+            print(f"[INFO] Batch {state['batches']}: {sum(moved.values())} vectors into {len(moved)} namespaces "
+                  f"({state['migrated']} so far)")
+            if state["done"]:
+                break
+
+        self._save_state(state)
+        if state["unassigned"]:
+            print(f"[WARN] {state['unassigned']} vectors had no user_id and were moved to '{UNASSIGNED_NAMESPACE}'")
+        return state
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Move vectors from the shared namespace into per-user namespaces.")
+    parser.add_argument("--source-namespace", default=LEGACY_NAMESPACE)
+    parser.add_argument("--batch-size", type=int, default=MIGRATION_BATCH_SIZE)
+    parser.add_argument("--max-batches", type=int, default=None, help="stop after this many batches (resume later)")
+    parser.add_argument("--checkpoint", default=MIGRATION_CHECKPOINT_PATH)
+    parser.add_argument("--keep-source", action="store_true", help="copy instead of move")
+    args = parser.parse_args(argv)
+
+    from ai.services.pinecone_service import vectorstore
+
+    state = NamespaceMigration(
+        vectorstore._index,
+        source_namespace=args.source_namespace,
+        batch_size=args.batch_size,
+        checkpoint_path=args.checkpoint,
+        keep_source=args.keep_source
+    ).run(max_batches=args.max_batches)
+    status = "finished" if state["done"] else "paused"
+    print(f"[INFO] Migration {status}: {state['migrated']} vectors in {state['batches']} batches")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+import os
+from typing import List, Optional
+
+# Each user's vectors live in a namespace of their own, so queries, listings and deletes never have to
+# filter one user's chunks out of everybody else's. Vectors written before that sit in LEGACY_NAMESPACE
+# until ai.services.namespace_migration has moved them; while LEGACY_NAMESPACE_FALLBACK is on, searches,
+# listings and deletes cover both namespaces (the legacy one by user_id filter, as before).
+USER_NAMESPACE_PREFIX = os.getenv("USER_NAMESPACE_PREFIX", "user-")
+LEGACY_NAMESPACE = os.getenv("LEGACY_NAMESPACE", "")
+LEGACY_NAMESPACE_FALLBACK = os.getenv("LEGACY_NAMESPACE_FALLBACK", "true").lower() == "true"
+# Legacy vectors without a user_id are moved here by the migration instead of being dropped.
+UNASSIGNED_NAMESPACE = os.getenv("UNASSIGNED_NAMESPACE", "unassigned")
+
+
+def user_namespace(user_id: int) -> str:
+    return f"{USER_NAMESPACE_PREFIX}{int(user_id)}"
+
+
+def filename_filter(filenames: Optional[List[str]] = None) -> Optional[dict]:
+    """Metadata filter inside a user's namespace: only the file restriction is left."""
+    return {"filename": {"$in": list(filenames)}} if filenames else None
+
+
+def legacy_filter(user_id: int, filenames: Optional[List[str]] = None) -> dict:
+    """Metadata filter selecting one user's vectors in the shared legacy namespace."""
+    search_filter = {"user_id": {"$eq": user_id}}
+    if filenames:
+        search_filter["filename"] = {"$in": list(filenames)}
+    return search_filter
@@ -8,13 +8,13 @@ class NotesService:
         self.default_model = default_model
         self.default_temperature = default_temperature
 
-    def generate_notes(self, notes_data: NotesGenerate, model=None, temperature=None):
+    async def generate_notes(self, notes_data: NotesGenerate, model=None, temperature=None):
         model = model or self.default_model
         temperature = temperature or self.default_temperature
 
         graph = build_notes_generation_graph()
 
-        output = graph.invoke({
+        output = await graph.ainvoke({
             "topic": notes_data.topic,
             "focus": notes_data.focus,
             "user_id": notes_data.user_id,
@@ -26,11 +26,11 @@ class NotesService:
         })
         return output["notes"]
 
-    def enhance_notes(self, notes_data: NoteEnhance, model=None, temperature=None):
+    async def enhance_notes(self, notes_data: NoteEnhance, model=None, temperature=None):
         model = model or self.default_model
         temperature = temperature or self.default_temperature
 
-        output = enhance_notes_with_agent(notes_data.content, notes_data.improvement, notes_data.user_id,
+        output = await enhance_notes_with_agent(notes_data.content, notes_data.improvement, notes_data.user_id,
                                           notes_data.filenames)
 
         return output
@@ -0,0 +1,94 @@
+# ai/services/pdf_parser.py
+#
+# PDF text extraction is pure-Python and CPU bound, so large PDFs are split into page ranges that are
+# parsed in a process pool. Kept free of heavy imports: every pool worker imports this module.
+
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Tuple
+
+from langchain_core.documents import Document
+
+PDF_PARSE_WORKERS = int(os.getenv("PDF_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_PAGES_PER_SHARD = int(os.getenv("PDF_PAGES_PER_SHARD", "16"))
+# Shards submitted but not yet consumed; bounds both the pool's backlog and the parsed pages held in memory.
+PDF_MAX_PENDING_SHARDS = int(os.getenv("PDF_MAX_PENDING_SHARDS", str(2 * PDF_PARSE_WORKERS)))
+
+_pools: Dict[int, ProcessPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    with _pools_lock:
+        if workers not in _pools:
+            # spawn, not fork: the parent runs ingestion and request threads that must not be copied mid-flight.
+            _pools[workers] = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _pools[workers]
+
+
+def _page_label(reader, page_number: int) -> str:
+    try:
+        return reader.page_labels[page_number]
+    except Exception:
+        return str(page_number + 1)
+
+
+def _parse_page_range(path: str, start: int, stop: int) -> List[Tuple[str, Dict[str, Any]]]:
+    """Text and metadata of pages [start, stop), extracted like PyPDFLoader does it. Runs in a pool worker."""
+    import pypdf
+
+    reader = pypdf.PdfReader(path)
+    total_pages = len(reader.pages)
+    pages = []
+    for page_number in range(start, min(stop, total_pages)):
+        text = reader.pages[page_number].extract_text(extraction_mode="plain").strip()
+        pages.append((text, {
+            "source": path,
+            "total_pages": total_pages,
+            "page": page_number,
+            "page_label": _page_label(reader, page_number),
+        }))
+    return pages
+
+
+def count_pages(path: str) -> int:
+    import pypdf
+
+    return len(pypdf.PdfReader(path).pages)
+
+
+def iter_pdf_pages(path: str, workers: int = PDF_PARSE_WORKERS, pages_per_shard: int = PDF_PAGES_PER_SHARD,
+                   max_pending: int = PDF_MAX_PENDING_SHARDS) -> Iterator[Document]:
+    """
+    Yields the pages of a PDF in order as soon as their shard is parsed. Shards of `pages_per_shard`
+    pages are parsed in the process pool with at most `max_pending` shards in flight; small PDFs and
+    `workers <= 1` are parsed in the calling thread.
+    """
+    total_pages = count_pages(path)
+    if workers <= 1 or total_pages <= pages_per_shard:
+        for text, metadata in _parse_page_range(path, 0, total_pages):
+            yield Document(page_content=text, metadata=metadata)
+        return
+
+    pool = _get_pool(workers)
+    shards = iter(range(0, total_pages, pages_per_shard))
+    pending = deque()
+    try:
+        for start in shards:
+            pending.append(pool.submit(_parse_page_range, path, start, start + pages_per_shard))
+            if len(pending) >= max(1, max_pending):
+                break
+
+        while pending:
+            pages = pending.popleft().result()
+            next_start = next(shards, None)
+            if next_start is not None:
+                pending.append(pool.submit(_parse_page_range, path, next_start, next_start + pages_per_shard))
+            for text, metadata in pages:
+                yield Document(page_content=text, metadata=metadata)
+    finally:
+        for future in pending:
+            future.cancel()
@@ -1,23 +1,36 @@
+import asyncio
+import hashlib
 import logging
 import os
-import tempfile
+import queue
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 import requests
 from bs4 import BeautifulSoup
 from dotenv import load_dotenv
-from fastapi import UploadFile
 from google.cloud import vision
 from langchain_community.document_loaders import UnstructuredURLLoader
 from langchain.schema import Document
-from langchain_community.document_loaders import PyPDFLoader, TextLoader, UnstructuredWordDocumentLoader
-from langchain_openai import OpenAIEmbeddings
+from langchain_community.document_loaders import TextLoader, UnstructuredWordDocumentLoader
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.retrievers import BaseRetriever
 from langchain_pinecone import PineconeVectorStore
-from langchain_text_splitters import CharacterTextSplitter
+
+from ai.core.embedding_cache import CachedQueryEmbeddings
+from ai.core.llm import get_embeddings
+from ai.services import chunk_store, embedding_store, pdf_parser
+from ai.services.chunk_indexer import ChunkIndexer
+from ai.services.namespaces import (
+    LEGACY_NAMESPACE, LEGACY_NAMESPACE_FALLBACK, filename_filter, legacy_filter, user_namespace
+)
+from ai.services.text_splitter import TokenAwareSplitter
 
 load_dotenv()
 logging.basicConfig(level=logging.INFO)
 
-embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
+embeddings = CachedQueryEmbeddings(get_embeddings("text-embedding-3-small"))
 INDEX_NAME = os.environ.get("INDEX_NAME")
 
 vectorstore = PineconeVectorStore(
@@ -25,54 +38,314 @@ vectorstore = PineconeVectorStore(
     embedding=embeddings
 )
 
+# Pinecone caps list() pages and fetch() requests at 100 IDs and delete() requests at 1000.
+INDEX_PAGE_SIZE = 100
+DELETE_BATCH_SIZE = 1000
+# ...and queries that return no metadata at 10000 matches.
+LEGACY_QUERY_TOP_K = 10_000
+
+SUPPORTED_EXTENSIONS = [".pdf", ".txt", ".docx", ".jpg", ".jpeg", ".png"]
+IMAGE_EXTENSIONS = [".jpg", ".jpeg", ".png"]
+
+# Called with a counter name and an amount as ingestion advances (e.g. "chunks_embedded", 256).
+Progress = Callable[[str, int], None]
+
+
+def file_key(filename: str) -> str:
+    """Short, ASCII-safe key of a filename, used inside vector IDs."""
+    return hashlib.sha1(filename.encode("utf-8")).hexdigest()[:16]
+
+
+def chunk_id_prefix(user_id: int, filename: Optional[str] = None) -> str:
+    if filename is None:
+        return f"{user_id}#"
+    return f"{user_id}#{file_key(filename)}#"
+
+
+def make_chunk_id(user_id: int, filename: str, text: str, occurrence: int = 0) -> str:
+    """
+    Deterministic vector ID: '<user_id>#<file_key>#<content hash>'. A chunk keeps its ID as long as its
+    text is unchanged, so an edited file can be diffed against the stored one. The n-th repeat of the
+    same text within a file gets a '-n' suffix.
+    """
+    content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+    suffix = f"-{occurrence}" if occurrence else ""
+    return f"{chunk_id_prefix(user_id, filename)}{content_hash}{suffix}"
+
+
+def _iter_tagged(chunks: Iterable[Document], user_id: int, filename: str) -> Iterator[Tuple[str, Document]]:
+    occurrences = Counter()
+    for index, chunk in enumerate(chunks):
+        chunk.metadata["user_id"] = user_id
+        chunk.metadata["filename"] = filename
+        chunk.metadata["chunk_index"] = index
+        yield make_chunk_id(user_id, filename, chunk.page_content, occurrences[chunk.page_content]), chunk
+        occurrences[chunk.page_content] += 1
+
+
+def _tag_chunks(chunks: List[Document], user_id: int, filename: str) -> List[str]:
+    return [chunk_id for chunk_id, _ in _iter_tagged(chunks, user_id, filename)]
+
+
+def list_index_ids(prefix: str, namespace: str) -> List[str]:
+    return [
+        chunk_id
+        for page in vectorstore._index.list(prefix=prefix, limit=INDEX_PAGE_SIZE, namespace=namespace)
+        for chunk_id in page
+    ]
+
+
+def _fetch_vectors(ids: List[str], namespace: str) -> Dict[str, Any]:
+    """Stored vectors (values and metadata) of the given IDs in `namespace`, fetched page by page."""
+    vectors = {}
+    for start in range(0, len(ids), INDEX_PAGE_SIZE):
+        vectors.update(vectorstore._index.fetch(ids=ids[start:start + INDEX_PAGE_SIZE], namespace=namespace).vectors)
+    return vectors
+
+
+def legacy_chunk_ids(user_id: int, filenames: Optional[List[str]] = None, skip: Iterable[str] = ()) -> List[str]:
+    """
+    IDs of the user's chunks in the legacy namespace, found with an IDs-only query filtered by user_id (and
+    filename). Vectors written there before deterministic IDs have random IDs that list() cannot find by prefix.
+    """
+    search_filter = legacy_filter(user_id, filenames)
+    skip = set(skip)
+    if filenames and skip:
+        search_filter["filename"] = {"$in": [filename for filename in filenames if filename not in skip]}
+    elif skip:
+        search_filter["filename"] = {"$nin": sorted(skip)}
+
+    # Only the filter matters, but the query still needs a (non-zero) vector of the index's dimension.
+    dimension = int(vectorstore._index.describe_index_stats()["dimension"])
+    response = vectorstore._index.query(vector=[1.0] + [0.0] * (dimension - 1), top_k=LEGACY_QUERY_TOP_K,
+                                        filter=search_filter, namespace=LEGACY_NAMESPACE)
+    ids = [match["id"] for match in response["matches"]]
+    if len(ids) >= LEGACY_QUERY_TOP_K:
+        print(f"[WARN] User {user_id} has more than {LEGACY_QUERY_TOP_K} legacy chunks; run "
+              f"ai.services.namespace_migration to make the rest visible")
+    return ids
 
-def ingest_uploaded_file_to_knowledge_base(file: UploadFile, user_id: int):
-    ext = os.path.splitext(file.filename)[-1].lower()
 
-    if ext not in [".pdf", ".txt", ".docx", ".jpg", ".jpeg", ".png"]:
-        raise Exception(f"Unsupported file type: {ext}")
+def fetch_chunk_metadata(ids: List[str], namespace: str) -> Dict[str, dict]:
+    """Metadata of the given vectors in `namespace`. Missing IDs are omitted."""
+    return {chunk_id: vector_data.metadata or {} for chunk_id, vector_data in _fetch_vectors(ids, namespace).items()}
 
+
+def indexed_chunk_positions(prefix: str, namespace: str) -> Dict[str, int]:
+    """Chunk index of every vector in `namespace` whose ID starts with `prefix`, read from the index metadata."""
+    metadata = fetch_chunk_metadata(list_index_ids(prefix, namespace), namespace)
+    return {chunk_id: int(meta.get("chunk_index", 0)) for chunk_id, meta in metadata.items()}
+
+
+def _embed_texts(texts: List[str]) -> List[List[float]]:
+    # Through the embedding store to the shared rate-limited model, so concurrent batches respect the TPM limit.
+    return embedding_store.embed_documents(embeddings.embeddings, texts)
+
+
+chunk_indexer = ChunkIndexer(_embed_texts, vectorstore._index, text_key=vectorstore._text_key)
+
+
+def _index_chunks(chunks: List[Document], ids: List[str], user_id: int):
+    """Upserts chunks with vectors from the embedding store, so already seen text is never embedded again."""
+    chunk_indexer.index_chunks(zip(ids, chunks), namespace=user_namespace(user_id))
+
+
+def _delete_ids(ids: List[str], namespace: str):
+    for start in range(0, len(ids), DELETE_BATCH_SIZE):
+        vectorstore._index.delete(ids=ids[start:start + DELETE_BATCH_SIZE], namespace=namespace)
+
+
+def _discard_partial_upsert(user_id: int, filename: str, ids: Optional[List[str]] = None):
+    """
+    Removes what a failed ingestion already upserted: the given IDs, or every vector of the file in the
+    user's namespace for a first ingestion. Otherwise the file would be searchable though its upload failed.
+    """
+    namespace = user_namespace(user_id)
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=ext) as tmp_file:
-            file_bytes = file.file.read()
-            tmp_file.write(file_bytes)
-            tmp_path = tmp_file.name
+        if ids is None:
+            ids = list_index_ids(chunk_id_prefix(user_id, filename), namespace)
+        _delete_ids(ids, namespace)
+    except Exception as e:
+        logging.warning(f"Could not remove partially ingested vectors of '{filename}': {e}")
+
+
+def _index_new_file(tagged: Iterable[Tuple[str, Document]], user_id: int, filename: str,
+                    progress: Optional[Progress] = None) -> Tuple[List[str], List[Document]]:
+    try:
+        return chunk_indexer.index_chunks(tagged, progress, namespace=user_namespace(user_id))
     except Exception:
-        raise Exception("Could not write uploaded file to temp file")
+        _discard_partial_upsert(user_id, filename)
+        raise
+
+
+def _delete_legacy_file_vectors(user_id: int, filename: str):
+    if LEGACY_NAMESPACE_FALLBACK:
+        vectorstore._index.delete(filter=legacy_filter(user_id, [filename]), namespace=LEGACY_NAMESPACE)
+
+
+def _reindex_chunks(chunks: List[Document], ids: List[str], user_id: int, filename: str):
+    """
+    Diffs a re-ingested file against its chunks in the user's namespace: only new chunks are embedded and
+    upserted, chunks that disappeared are deleted and unchanged chunks that moved are re-upserted with their
+    stored vectors and the new chunk_index.
+    """
+    # Read from the index rather than the chunk store: a file ingested before namespaces has chunk store
+    # rows but its vectors are still in the legacy namespace, so there is nothing to diff against yet.
+    namespace = user_namespace(user_id)
+    stored = indexed_chunk_positions(chunk_id_prefix(user_id, filename), namespace)
+    if not stored:
+        _index_new_file(zip(ids, chunks), user_id, filename)
+        # Only now that the new vectors are in place: if indexing fails the legacy copy is still there.
+        _delete_legacy_file_vectors(user_id, filename)
+        return
+
+    new_ids = set(ids)
+    added = [(chunk_id, chunk) for chunk_id, chunk in zip(ids, chunks) if chunk_id not in stored]
+    removed = [chunk_id for chunk_id in stored if chunk_id not in new_ids]
+    moved = {
+        chunk_id: chunk for chunk_id, chunk in zip(ids, chunks)
+        if chunk_id in stored and stored[chunk_id] != chunk.metadata["chunk_index"]
+    }
+
+    if added:
+        added_ids = [chunk_id for chunk_id, _ in added]
+        try:
+            _index_chunks([chunk for _, chunk in added], added_ids, user_id)
+        except Exception:
+            # Only the new chunks are dropped: the previous version of the file stays indexed as it was.
+            _discard_partial_upsert(user_id, filename, added_ids)
+            raise
+    if moved:
+        # One update() per moved chunk would be a request each; an edit near the top of a file moves almost
+        # all of them, so they are re-upserted in batches instead.
+        vectors = _fetch_vectors(list(moved), namespace)
+        chunk_indexer.upsert_records([
+            (chunk_id, list(vectors[chunk_id].values), {**chunk.metadata, chunk_indexer.text_key: chunk.page_content})
+            for chunk_id, chunk in moved.items() if chunk_id in vectors
+        ], namespace)
+    _delete_ids(removed, namespace)
+    # Chunks the file still had in the legacy namespace (mid-migration) are all in the user's namespace now.
+    _delete_legacy_file_vectors(user_id, filename)
 
-    loader = None
-    documents = None
+    print(f"[INFO] Re-ingested '{filename}': {len(added)} new, {len(removed)} removed, {len(moved)} moved, "
+          f"{len(ids) - len(added)} unchanged")
 
+
+def _store_chunks_locally(user_id: int, filename: str, ids: List[str], chunks: List[Document]):
+    # The local copy only speeds up full-corpus reads; readers fall back to the index without it.
     try:
-        if ext == ".pdf":
-            loader = PyPDFLoader(tmp_path)
-        elif ext == ".txt":
-            loader = TextLoader(tmp_path)
-        elif ext == ".docx":
-            loader = UnstructuredWordDocumentLoader(tmp_path)
-        elif ext in [".jpg", ".jpeg", ".png"]:
-            ocr_text = extract_text_from_image(tmp_path)
-            documents = [Document(page_content=ocr_text, metadata={})]
-
-        if ext not in [".jpg", ".jpeg", ".png"]:
-            documents = loader.load()
+        chunk_store.save_chunks(user_id, filename, ids, chunks)
     except Exception as e:
-        os.remove(tmp_path)
-        raise Exception(f"Error loading file: {str(e)}")
+        logging.warning(f"Could not write chunks of '{filename}' to the local chunk store: {e}")
 
-    splitter = CharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-    chunks = splitter.split_documents(documents)
 
-    for chunk in chunks:
-        chunk.metadata["user_id"] = user_id
-        chunk.metadata["filename"] = file.filename
+class UnsupportedFileTypeError(Exception):
+    pass
+
+
+def check_file_type(filename: str) -> str:
+    ext = os.path.splitext(filename)[-1].lower()
+    if ext not in SUPPORTED_EXTENSIONS:
+        raise UnsupportedFileTypeError(f"Unsupported file type: {ext}")
+    return ext
+
+
+class _StageError:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+_STAGE_DONE = object()
+
 
+def _in_thread(items: Iterator, maxsize: int = 2) -> Iterator:
+    """
+    Runs a pipeline stage in its own thread. The bounded queue lets the stage work at most `maxsize`
+    items ahead of its consumer; errors are re-raised in the consumer, which stops the stage if it quits.
+    """
+    buffer = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put(item):
+                    return
+        except BaseException as e:
+            put(_StageError(e))
+            return
+        put(_STAGE_DONE)
+
+    threading.Thread(target=produce, daemon=True).start()
     try:
-        vectorstore.add_documents(chunks)
+        while True:
+            item = buffer.get()
+            if item is _STAGE_DONE:
+                return
+            if isinstance(item, _StageError):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+
+
+def _load_pages(path: str, ext: str, progress: Progress) -> Iterator[Document]:
+    try:
+        if ext in IMAGE_EXTENSIONS:
+            pages = iter([Document(page_content=extract_text_from_image(path), metadata={})])
+        elif ext == ".pdf":
+            pages = pdf_parser.iter_pdf_pages(path)
+        elif ext == ".txt":
+            pages = TextLoader(path).lazy_load()
+        else:
+            pages = UnstructuredWordDocumentLoader(path).lazy_load()
+
+        for page in pages:
+            progress("pages_parsed", 1)
+            yield page
     except Exception as e:
-        raise Exception("Vectorstore error")
+        raise Exception(f"Error loading file: {str(e)}")
+
 
-    os.remove(tmp_path)
+def _split_pages(pages: Iterable[Document], progress: Progress) -> Iterator[Document]:
+    splitter = TokenAwareSplitter()
+    for page in pages:
+        chunks = splitter.split_documents([page])
+        progress("chunks_split", len(chunks))
+        yield from chunks
+
+
+def ingest_file(path: str, filename: str, user_id: int, reingest: bool = False, progress: Optional[Progress] = None):
+    """
+    Ingests a file from disk as a pipeline: parsing and splitting run in their own thread while chunk_indexer
+    embeds and upserts earlier batches concurrently. Pages are read lazily and every stage has a bounded
+    number of items in flight.
+    """
+    progress = progress or (lambda counter, amount: None)
+    ext = check_file_type(filename)
+    tagged = _in_thread(_iter_tagged(_split_pages(_load_pages(path, ext, progress), progress), user_id, filename))
+
+    if reingest:
+        # Diffing needs the whole new chunk set before anything is written.
+        ids, chunks = [], []
+        for chunk_id, chunk in tagged:
+            ids.append(chunk_id)
+            chunks.append(chunk)
+        _reindex_chunks(chunks, ids, user_id, filename)
+        progress("chunks_upserted", len(ids))
+    else:
+        ids, chunks = _index_new_file(tagged, user_id, filename, progress)
+
+    _store_chunks_locally(user_id, filename, ids, chunks)
 
 
 def extract_text_from_image(image_path: str) -> str:
@@ -96,7 +369,7 @@ def extract_text_from_image(image_path: str) -> str:
         raise Exception("OCR unknown error")
 
 
-def ingest_url_to_knowledge_base(url: str, user_id: int):
+def ingest_url_to_knowledge_base(url: str, user_id: int, reingest: bool = False):
     try:
         loader = UnstructuredURLLoader(urls=[url])
         documents = loader.load()
@@ -116,26 +389,91 @@ def ingest_url_to_knowledge_base(url: str, user_id: int):
         except Exception as fallback_error:
             raise Exception(f"Failed to extract content from URL: {str(fallback_error)}")
 
-    splitter = CharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-    chunks = splitter.split_documents(documents)
+    chunks = TokenAwareSplitter().split_documents(documents)
 
-    for chunk in chunks:
-        chunk.metadata["user_id"] = user_id
-        chunk.metadata["filename"] = url
+    ids = _tag_chunks(chunks, user_id, url)
 
     try:
-        vectorstore.add_documents(chunks)
+        if reingest:
+            _reindex_chunks(chunks, ids, user_id, url)
+        else:
+            _index_new_file(zip(ids, chunks), user_id, url)
     except Exception:
         raise Exception("Vectorstore error during URL ingestion")
 
+    _store_chunks_locally(user_id, url, ids, chunks)
+
 
 def delete_file_embeddings(user_id: int, filename: str):
     try:
-        vectorstore._index.delete(
-            filter={
-                "user_id": {"$eq": user_id},
-                "filename": {"$eq": filename}
-            }
-        )
+        chunk_store.delete_file_chunks(user_id, filename)
+        # Deleting listed IDs inside the user's namespace avoids a filtered delete over the shared index.
+        namespace = user_namespace(user_id)
+        _delete_ids(list_index_ids(chunk_id_prefix(user_id, filename), namespace), namespace)
+        _delete_legacy_file_vectors(user_id, filename)
     except Exception as e:
         return f"Error: {str(e)}"
+
+
+def _merge_matches(matches: List[Tuple[Document, float]], k: int) -> List[Tuple[Document, float]]:
+    """Best k matches by score; a chunk found in both namespaces (mid-migration) is kept once."""
+    merged, seen = [], set()
+    for doc, score in sorted(matches, key=lambda match: match[1], reverse=True):
+        key = getattr(doc, "id", None) or (doc.metadata.get("filename"), doc.page_content)
+        if key in seen:
+            continue
+        seen.add(key)
+        merged.append((doc, score))
+    return merged[:k]
+
+
+def search_user_chunks(vector: List[float], user_id: int, filenames: Optional[List[str]] = None,
+                       k: int = 4) -> List[Tuple[Document, float]]:
+    """Nearest chunks of one user from their namespace and, while the fallback is on, the legacy namespace."""
+    matches = vectorstore.similarity_search_by_vector_with_score(
+        vector, k=k, filter=filename_filter(filenames), namespace=user_namespace(user_id)
+    )
+    if not LEGACY_NAMESPACE_FALLBACK:
+        return matches
+    # A partly migrated user has chunks in both namespaces, so both are searched and merged by score.
+    legacy_matches = vectorstore.similarity_search_by_vector_with_score(
+        vector, k=k, filter=legacy_filter(user_id, filenames), namespace=LEGACY_NAMESPACE
+    )
+    return _merge_matches(matches + legacy_matches, k)
+
+
+async def asearch_user_chunks(vector: List[float], user_id: int, filenames: Optional[List[str]] = None,
+                              k: int = 4) -> List[Tuple[Document, float]]:
+    if not LEGACY_NAMESPACE_FALLBACK:
+        return await vectorstore.asimilarity_search_by_vector_with_score(
+            vector, k=k, filter=filename_filter(filenames), namespace=user_namespace(user_id)
+        )
+    matches, legacy_matches = await asyncio.gather(
+        vectorstore.asimilarity_search_by_vector_with_score(
+            vector, k=k, filter=filename_filter(filenames), namespace=user_namespace(user_id)
+        ),
+        vectorstore.asimilarity_search_by_vector_with_score(
+            vector, k=k, filter=legacy_filter(user_id, filenames), namespace=LEGACY_NAMESPACE
+        )
+    )
+    return _merge_matches(matches + legacy_matches, k)
+
+
+class UserChunkRetriever(BaseRetriever):
+    """Retriever over one user's chunks (optionally only some files); queries go through the embedding cache."""
+    user_id: int
+    filenames: Optional[List[str]] = None
+    k: int = 4
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        matches = search_user_chunks(embeddings.embed_query(query), self.user_id, self.filenames, self.k)
+        return [doc for doc, _ in matches]
+
+    async def _aget_relevant_documents(self, query: str, *,
+                                       run_manager: AsyncCallbackManagerForRetrieverRun) -> List[Document]:
+        vector = await embeddings.aembed_query(query)
+        return [doc for doc, _ in await asearch_user_chunks(vector, self.user_id, self.filenames, self.k)]
+
+
+def user_retriever(user_id: int, filenames: Optional[List[str]] = None, k: int = 4) -> UserChunkRetriever:
+    return UserChunkRetriever(user_id=user_id, filenames=filenames or None, k=k)
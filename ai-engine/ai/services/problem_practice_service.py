@@ -8,12 +8,12 @@ class PracticeProblemService:
         self.default_model = default_model
         self.default_temperature = float(default_temperature)
 
-    def create_single_problem(self, request: ProblemGenerationParams, model: str = None,
+    async def create_single_problem(self, request: ProblemGenerationParams, model: str = None,
                               temperature: float = None) -> PracticeProblemOutput:
         final_model = model or self.default_model
         final_temperature = temperature or self.default_temperature
 
-        problem = generate_practice_problem(
+        problem = await generate_practice_problem(
             params=request,
             model=final_model,
             temperature=final_temperature
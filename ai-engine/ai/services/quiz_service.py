@@ -8,11 +8,11 @@ class QuizService:
         self.default_model = default_model
         self.default_temperature = float(default_temperature)
 
-    def generate_quiz(self, quiz_params: QuizFromTreeParams, model=None, temperature=None):
+    async def generate_quiz(self, quiz_params: QuizFromTreeParams, model=None, temperature=None):
         final_model = model or self.default_model
         final_temperature = temperature or self.default_temperature
 
-        quiz = generate_quiz(
+        quiz = await generate_quiz(
             params=quiz_params,
             model=final_model,
             temperature=final_temperature
@@ -0,0 +1,145 @@
+import os
+import re
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+from langchain_core.documents import Document
+
+from ai.core.tokens import DEFAULT_MODEL, count_tokens_batch, get_encoding
+
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "300"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "40"))
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_MARKDOWN_HEADING = re.compile(r"^#{1,6}\s")
+_SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+
+
+class _Piece(NamedTuple):
+    text: str
+    tokens: int
+    separator: str  # joins the piece to the one before it within a chunk
+    heading: bool = False
+
+
+def _is_heading(block: str) -> bool:
+    """Markdown headings, and short one-line paragraphs without closing punctuation ("Fotosynteza")."""
+    if _MARKDOWN_HEADING.match(block):
+        return True
+    return "\n" not in block and len(block) <= 80 and not block.rstrip().endswith((".", ",", ";", ":", "!", "?"))
+
+
+def _blocks(text: str) -> List[str]:
+    """Paragraphs, with markdown heading lines inside a paragraph split off as blocks of their own."""
+    blocks = []
+    for paragraph in _PARAGRAPH_BREAK.split(text):
+        current = []
+        for line in paragraph.strip().splitlines():
+            if _MARKDOWN_HEADING.match(line) and current:
+                blocks.append("\n".join(current))
+                current = []
+            current.append(line)
+        if current:
+            blocks.append("\n".join(current))
+    return [block for block in blocks if block.strip()]
+
+
+class TokenAwareSplitter:
+    """
+    Splits documents into chunks of at most `max_tokens` tokens (tiktoken, as counted downstream),
+    packing whole paragraphs and starting a new chunk at headings. Paragraphs over the budget are cut at
+    lines, then sentences, then token windows. Consecutive chunks share up to `overlap_tokens` tokens of
+    trailing paragraphs. Text is tokenised once, as pieces: a chunk's metadata["token_count"] is the sum of
+    its pieces plus the tokens of the separators joining them, so batching downstream never tokenises chunks
+    again. Where BPE merges across a join (" word") this can differ from encoding the joined text by about a
+    token per join.
+    """
+
+    def __init__(self, max_tokens: int = CHUNK_MAX_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+                 model_name: str = DEFAULT_MODEL):
+        self.max_tokens = max(1, max_tokens)
+        self.overlap_tokens = max(0, min(overlap_tokens, self.max_tokens // 2))
+        self.model_name = model_name
+        self._separator_tokens: Dict[str, int] = {}
+
+    def _pieces(self, text: str) -> List[_Piece]:
+        blocks = _blocks(text)
+        pieces = []
+        for block, tokens in zip(blocks, count_tokens_batch(blocks, self.model_name)):
+            if tokens <= self.max_tokens:
+                pieces.append(_Piece(block, tokens, "\n\n", _is_heading(block)))
+            else:
+                pieces.extend(self._cut(block, "\n\n"))
+        return pieces
+
+    def _cut(self, text: str, separator: str) -> List[_Piece]:
+        """Cuts an over-budget block at lines, then sentences; a single over-budget sentence by token windows."""
+        for split, inner in ((str.splitlines, "\n"), (_SENTENCE_END.split, " ")):
+            parts = [part for part in split(text) if part.strip()]
+            if len(parts) > 1:
+                pieces = []
+                for i, (part, tokens) in enumerate(zip(parts, count_tokens_batch(parts, self.model_name))):
+                    part_separator = separator if i == 0 else inner
+                    if tokens <= self.max_tokens:
+                        pieces.append(_Piece(part, tokens, part_separator))
+                    else:
+                        pieces.extend(self._cut(part, part_separator))
+                return pieces
+
+        encoding = get_encoding(self.model_name)
+        token_ids = encoding.encode_ordinary(text)
+        step = self.max_tokens - self.overlap_tokens
+        return [
+            _Piece(encoding.decode(token_ids[start:start + self.max_tokens]),
+                   len(token_ids[start:start + self.max_tokens]), separator if start == 0 else " ")
+            for start in range(0, max(1, len(token_ids) - self.overlap_tokens), step)
+        ]
+
+    def _carry_over(self, chunk: List[_Piece]) -> List[_Piece]:
+        carried, tokens = [], 0
+        for piece in reversed(chunk):
+            if tokens + piece.tokens > self.overlap_tokens:
+                break
+            carried.insert(0, piece)
+            tokens += piece.tokens
+        return carried
+
+    def _join_tokens(self, separator: str) -> int:
+        tokens = self._separator_tokens.get(separator)
+        if tokens is None:
+            tokens = self._separator_tokens[separator] = count_tokens_batch([separator], self.model_name)[0]
+        return tokens
+
+    def _split(self, text: str) -> List[Tuple[str, int]]:
+        """Chunks of `text` with their token counts, summed from the pieces."""
+        chunks, current, current_tokens = [], [], 0
+        for piece in self._pieces(text):
+            full = current and current_tokens + piece.tokens + 1 > self.max_tokens
+            # A heading closes the running chunk unless that chunk is itself only headings.
+            at_heading = piece.heading and any(not part.heading for part in current)
+            if full or at_heading:
+                chunks.append(current)
+                current = [] if at_heading else self._carry_over(current)
+                current_tokens = sum(part.tokens + 1 for part in current)
+                if current and current_tokens + piece.tokens + 1 > self.max_tokens:
+                    current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece.tokens + 1
+        if current:
+            chunks.append(current)
+
+        return [
+            ("".join(part.text if i == 0 else part.separator + part.text for i, part in enumerate(chunk)),
+             sum(part.tokens if i == 0 else part.tokens + self._join_tokens(part.separator)
+                 for i, part in enumerate(chunk)))
+            for chunk in chunks
+        ]
+
+    def split_text(self, text: str) -> List[str]:
+        return [chunk for chunk, _ in self._split(text)]
+
+    def split_documents(self, documents: Iterable[Document]) -> List[Document]:
+        chunks = []
+        for document in documents:
+            for text, tokens in self._split(document.page_content):
+                chunks.append(Document(page_content=text, metadata={**document.metadata, "token_count": tokens}))
+        return chunks
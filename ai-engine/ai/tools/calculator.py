@@ -0,0 +1,117 @@
+# ai/tools/calculator.py
+#
+# Local evaluator for inputs that already are math expressions. The expression is parsed with `ast`,
+# checked against a whitelist of nodes, names and functions, and only then handed to numexpr,
+# so arbitrary Python never runs and no LLM is needed.
+
+import ast
+import math
+import re
+
+import numexpr
+
+FUNCTIONS = {
+    "sqrt": "sqrt", "abs": "abs", "exp": "exp",
+    "log": "log", "ln": "log", "log10": "log10",
+    "sin": "sin", "cos": "cos", "tan": "tan",
+    "arcsin": "arcsin", "asin": "arcsin", "arccos": "arccos", "acos": "arccos",
+    "arctan": "arctan", "atan": "arctan", "sinh": "sinh", "cosh": "cosh", "tanh": "tanh",
+}
+CONSTANTS = {"pi": math.pi, "e": math.e}
+
+_BINARY_OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.Mod)
+_UNARY_OPERATORS = (ast.UAdd, ast.USub)
+MAX_EXPRESSION_LENGTH = 500
+
+
+class CalculatorError(ValueError):
+    """The input is not an expression the local evaluator accepts."""
+
+
+def _prepare(text: str) -> str:
+    expression = text.strip().rstrip("=? ").strip()
+    if "!" in expression:
+        raise CalculatorError("Factorials are not supported")
+    # "1,000" may be a thousands separator or the Polish decimal 1.0; guessing would give a wrong answer.
+    if re.search(r"\d,\d{3}(?!\d)", expression):
+        raise CalculatorError("Ambiguous comma: thousands separator or decimal point")
+    expression = expression.replace("^", "**").replace("×", "*").replace("·", "*").replace("÷", "/").replace(":", "/")
+    # Polish decimal commas: "2,5" -> "2.5" (function arguments are never separated by a comma here).
+    return re.sub(r"(\d),(\d)", r"\1.\2", expression)
+
+
+class _Validator(ast.NodeTransformer):
+    """Rejects anything outside the whitelist and rewrites the tree into numexpr's dialect."""
+
+    def visit_Expression(self, node):
+        node.body = self.visit(node.body)
+        return node
+
+    def visit_BinOp(self, node):
+        if not isinstance(node.op, _BINARY_OPERATORS):
+            raise CalculatorError(f"Operator {type(node.op).__name__} is not supported")
+        node.left, node.right = self.visit(node.left), self.visit(node.right)
+        return node
+
+    def visit_UnaryOp(self, node):
+        if not isinstance(node.op, _UNARY_OPERATORS):
+            raise CalculatorError(f"Operator {type(node.op).__name__} is not supported")
+        node.operand = self.visit(node.operand)
+        return node
+
+    def visit_Constant(self, node):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+            raise CalculatorError(f"Constant {node.value!r} is not a number")
+        # numexpr works on 64-bit values; floats avoid silent integer overflow (e.g. 2**100).
+        try:
+            value = float(node.value)
+        except OverflowError as e:
+            raise CalculatorError("Number is too large") from e
+        return ast.copy_location(ast.Constant(value), node)
+
+    def visit_Name(self, node):
+        if node.id not in CONSTANTS:
+            raise CalculatorError(f"Unknown name {node.id!r}")
+        return node
+
+    def visit_Call(self, node):
+        if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS or node.keywords or len(node.args) != 1:
+            raise CalculatorError("Unsupported function call")
+        node.func = ast.copy_location(ast.Name(id=FUNCTIONS[node.func.id], ctx=ast.Load()), node.func)
+        node.args = [self.visit(node.args[0])]
+        return node
+
+    def generic_visit(self, node):
+        raise CalculatorError(f"{type(node).__name__} is not allowed in an expression")
+
+
+def _format(value: float) -> str:
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+def evaluate_expression(text: str) -> str:
+    """
+    Evaluates an arithmetic expression such as "2^10 / (3,5 + sqrt(16))" and returns the result as text.
+    Raises CalculatorError if the input does not parse as a supported expression.
+    """
+    expression = _prepare(text)
+    if not expression or len(expression) > MAX_EXPRESSION_LENGTH:
+        raise CalculatorError("Empty or too long expression")
+
+    try:
+        tree = ast.parse(expression, mode="eval")
+    except SyntaxError as e:
+        raise CalculatorError(f"Not an expression: {e.msg}") from e
+
+    tree = ast.fix_missing_locations(_Validator().visit(tree))
+    try:
+        result = numexpr.evaluate(ast.unparse(tree), local_dict=dict(CONSTANTS), global_dict={})
+    except (KeyError, ValueError, TypeError, ArithmeticError) as e:
+        raise CalculatorError(str(e)) from e
+
+    value = result.item()
+    if isinstance(value, complex) or not math.isfinite(value):
+        raise CalculatorError(f"Result {value} is not a finite real number")
+    return _format(value)
@@ -0,0 +1,68 @@
+# ai/tools/chat_tools.py
+#
+# The chat agents are built once per process, so their tools cannot close over request values.
+# These wrappers read user_id, filenames, the LLM and the Cohere client of the current request
+# from `chat_request_context` and delegate to the plain tools in ai.tools.tools.
+# AgentExecutor does not pass the run config on to tools, hence a ContextVar rather than `configurable`.
+
+from contextvars import ContextVar
+from typing import Any, Dict
+
+from langchain_core.tools import StructuredTool
+
+from ai.tools.tools import answer_from_documents, aanswer_from_documents, search_web, asearch_web, use_calculator, \
+    ause_calculator
+
+chat_request_context: ContextVar[Dict[str, Any]] = ContextVar("chat_request_context")
+
+
+def _rag(query: str) -> str:
+    context = chat_request_context.get()
+    return answer_from_documents.func(
+        query,
+        user_id=context["user_id"],
+        llm=context["llm"],
+        filenames=context.get("filenames") or [],
+        cohere_client=context.get("cohere_client")
+    )
+
+
+async def _arag(query: str) -> str:
+    context = chat_request_context.get()
+    return await aanswer_from_documents(
+        query,
+        user_id=context["user_id"],
+        llm=context["llm"],
+        filenames=context.get("filenames") or [],
+        cohere_client=context.get("cohere_client")
+    )
+
+
+def _search_web(query: str) -> str:
+    context = chat_request_context.get()
+    return search_web.func(query, user_id=context["user_id"], llm=context["llm"])
+
+
+async def _asearch_web(query: str) -> str:
+    context = chat_request_context.get()
+    return await asearch_web(query, user_id=context["user_id"], llm=context["llm"])
+
+
+def _calculator(query: str) -> str:
+    return use_calculator.func(query, llm=chat_request_context.get()["llm"])
+
+
+async def _acalculator(query: str) -> str:
+    return await ause_calculator(query, llm=chat_request_context.get()["llm"])
+
+
+# Each tool has a sync and an async implementation; AgentExecutor.ainvoke/astream_events use the latter.
+rag_tool = StructuredTool.from_function(
+    func=_rag, coroutine=_arag, name="answer_from_documents", description=answer_from_documents.description
+)
+search_web_tool = StructuredTool.from_function(
+    func=_search_web, coroutine=_asearch_web, name="search_web", description=search_web.description
+)
+calculator_tool = StructuredTool.from_function(
+    func=_calculator, coroutine=_acalculator, name="Calculator", description=use_calculator.description
+)
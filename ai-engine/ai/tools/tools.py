@@ -1,7 +1,9 @@
 # ai/tools/tools.py
 
+import asyncio
 import os
-from typing import List
+import re
+from typing import Dict, List, Optional
 import cohere
 
 from langchain_core.tools import tool
@@ -9,23 +11,160 @@ from langchain_core.prompts import PromptTemplate
 from langchain_core.runnables import RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.language_models import BaseChatModel
-from ai.services.pinecone_service import vectorstore
-from langchain_community.tools.tavily_search import TavilySearchResults
+from langchain_core.documents import Document
+from ai.services.pinecone_service import vectorstore, embeddings, asearch_user_chunks, user_retriever
 from langchain.chains import LLMMathChain
 
+from ai.tools.calculator import evaluate_expression, CalculatorError
+from ai.tools.web_search import web_search_cache
+
+# "context": answer_from_documents returns cited passages and lets the calling agent write the answer.
+# "answer": the tool runs its own synthesis chain and returns a finished answer (previous behaviour).
+RAG_TOOL_MODE = os.getenv("RAG_TOOL_MODE", "context")
+
 
 def format_docs(docs):
     """Converts a list of Document objects into a single string context."""
     return "\n\n---\n\n".join(doc.page_content for doc in docs)
 
 
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def format_cited_context(docs) -> str:
+    """
+    Numbered, de-duplicated passages with their source, e.g. "[1] (notes.pdf, fragment 12) ...".
+    Passages repeated verbatim or contained in an earlier one (chunk overlap) are dropped.
+    """
+    kept = []
+    for doc in docs:
+        text = _normalize(doc.page_content)
+        if not text or any(text.lower() in other.lower() for other, _ in kept):
+            continue
+        kept.append((text, doc.metadata or {}))
+
+    passages = []
+    for number, (text, metadata) in enumerate(kept, start=1):
+        source = metadata.get("filename", "unknown")
+        if metadata.get("chunk_index") is not None:
+            source += f", fragment {int(metadata['chunk_index']) + 1}"
+        passages.append(f"[{number}] ({source}) {text}")
+    return "\n\n".join(passages)
+
+
+_RAG_TEMPLATE = """
+        Use ONLY the following pieces of context to answer the question at the end.
+        If the context does not contain the answer, just say that you don't know the answer based on the provided documents. Don't make anything up.
+        Keep the answer concise.
+
+        Context:
+        {context}
+
+        Question:
+        {question}
+
+        Helpful Answer:"""
+
+_FAILURE_PHRASES = [
+    "don't know",
+    "do not know",
+    "couldn't find",
+    "not find",
+    "no relevant information",
+    "based on the provided documents",
+    "could not find an answer"
+]
+
+
+RAG_RETRIEVE_K = 20
+RAG_RERANK_TOP_N = 5
+
+
+def _log_scope(user_id: int, filenames: List):
+    if filenames:
+        print(f"Searching namespace of user {user_id}, filtering by filenames: {filenames}")
+    else:
+        print(f"Searching namespace of user {user_id}, no filename filter.")
+
+
+def _document_retriever(user_id: int, filenames: List):
+    _log_scope(user_id, filenames)
+    return user_retriever(user_id, filenames, k=RAG_RETRIEVE_K)
+
+
+async def _aretrieve(vector: List[float], user_id: int, filenames: List) -> List[Document]:
+    """Native async Pinecone query for an already embedded query, in the user's namespace."""
+    matches = await asearch_user_chunks(vector, user_id, filenames, k=RAG_RETRIEVE_K)
+    return [doc for doc, _ in matches]
+
+
+def _rerank_request(query: str, initial_docs) -> dict:
+    return dict(
+        model='rerank-english-v3.0',
+        query=query,
+        documents=[doc.page_content for doc in initial_docs],
+        top_n=RAG_RERANK_TOP_N
+    )
+
+
+def _reranked_docs(initial_docs, reranked_results):
+    final_docs = [initial_docs[result.index] for result in reranked_results.results if
+                  result.relevance_score > 0.1]
+    print(f"Kept {len(final_docs)} documents after reranking.")
+    return final_docs
+
+
+_async_cohere_client = None
+
+
+def _async_rerank_client(cohere_client):
+    """
+    The agents hand in a sync cohere.Client (or None to disable reranking). The async path uses one
+    AsyncClient per process with the same environment credentials instead of a worker thread.
+    """
+    global _async_cohere_client
+    if isinstance(cohere_client, cohere.AsyncClient):
+        return cohere_client
+    if _async_cohere_client is None:
+        _async_cohere_client = cohere.AsyncClient()
+    return _async_cohere_client
+
+
+async def _arerank(query: str, initial_docs: List[Document], cohere_client) -> List[Document]:
+    if not initial_docs:
+        return []
+    if not cohere_client:
+        print("Warning: Cohere client not available. Skipping reranking.")
+        return initial_docs[:RAG_RERANK_TOP_N]
+    try:
+        reranked = await _async_rerank_client(cohere_client).rerank(**_rerank_request(query, initial_docs))
+        return _reranked_docs(initial_docs, reranked)
+    except cohere.errors.CohereError as e:
+        print(f"Cohere API error: {e}. Falling back to standard retrieval.")
+        return initial_docs[:RAG_RERANK_TOP_N]
+
+
+def _synthesis_chain(llm: BaseChatModel):
+    return PromptTemplate.from_template(_RAG_TEMPLATE) | llm | StrOutputParser()
+
+
+def _checked_answer(answer: str) -> str:
+    answer_lower = answer.lower()
+    if any(phrase in answer_lower for phrase in _FAILURE_PHRASES):
+        print("RAG chain could not find an answer. Instructing agent to use other tools.")
+        return "No relevant information was found in the user's documents for this query."
+    return answer
+
+
 @tool
-def answer_from_documents(query: str, user_id: int, llm: BaseChatModel, filenames: List, cohere_client) -> str:
+def answer_from_documents(query: str, user_id: int, llm: BaseChatModel, filenames: List, cohere_client,
+                          mode: Optional[str] = None) -> str:
     """
     Use this tool FIRST to search for an answer in the user's private documents.
     This is the best way to answer questions about user-specific or uploaded information.
-    If the answer is found, this tool will return it.
-    If not, it will indicate that the information was not found in the documents
+    It returns numbered passages from the documents with their sources; base your answer on them and cite them.
+    If nothing relevant is found, it will indicate that the information was not found in the documents.
     """
     if not vectorstore:
         return "Error: The knowledge base is not available."
@@ -33,25 +172,10 @@ def answer_from_documents(query: str, user_id: int, llm: BaseChatModel, filename
     print(f"Executing RAG chain for user_id: {user_id} with query: '{query}'")
 
     try:
-        if filenames:
-            print(f"Filtering by filenames: {filenames}")
-            search_filter = {
-                '$and': [
-                    {'user_id': {'$eq': user_id}},
-                    {'filename': {'$in': filenames}}
-                ]
-            }
-        else:
-            print("No filenames provided, filtering by user_id only.")
-            search_filter = {'user_id': {'$eq': user_id}}
-
-        retriever = vectorstore.as_retriever(
-            search_type="similarity",
-            search_kwargs={'filter': search_filter, 'k': 20}
-        )
+        retriever = _document_retriever(user_id, filenames)
 
         print("Step 1: Retrieving initial documents from vector store...")
-        initial_docs = retriever.get_relevant_documents(query)
+        initial_docs = retriever.invoke(query)
 
         if not initial_docs:
             return "No relevant information was found in the user's documents."
@@ -61,20 +185,8 @@ def answer_from_documents(query: str, user_id: int, llm: BaseChatModel, filename
         final_docs = []
         if cohere_client:
             print("Step 2: Reranking documents with Cohere...")
-            doc_texts = [doc.page_content for doc in initial_docs]
-
             try:
-                # Call the Cohere Rerank API
-                reranked_results = cohere_client.rerank(
-                    model='rerank-english-v3.0',
-                    query=query,
-                    documents=doc_texts,
-                    top_n=5
-                )
-
-                final_docs = [initial_docs[result.index] for result in reranked_results.results if
-                              result.relevance_score > 0.1]
-                print(f"Kept {len(final_docs)} documents after reranking.")
+                final_docs = _reranked_docs(initial_docs, cohere_client.rerank(**_rerank_request(query, initial_docs)))
             except cohere.errors.CohereError as e:
                 print(f"Cohere API error: {e}. Falling back to standard retrieval.")
                 final_docs = initial_docs[:5]
@@ -86,47 +198,45 @@ def answer_from_documents(query: str, user_id: int, llm: BaseChatModel, filename
         if not final_docs:
             return "No relevant information was found in the user's documents after reranking."
 
+        if (mode or RAG_TOOL_MODE) == "context":
+            return format_cited_context(final_docs)
+
         print("Step 3: Generating final answer with LLM...")
+        answer = _synthesis_chain(llm).invoke({"context": format_docs(final_docs), "question": query})
+        return _checked_answer(answer)
 
-        template = """
-        Use ONLY the following pieces of context to answer the question at the end.
-        If the context does not contain the answer, just say that you don't know the answer based on the provided documents. Don't make anything up.
-        Keep the answer concise.
+    except Exception as e:
+        import traceback
+        print(traceback.format_exc())
+        return f"An error occurred while answering from your documents: {str(e)}"
 
-        Context:
-        {context}
 
-        Question:
-        {question}
+async def aanswer_from_documents(query: str, user_id: int, llm: BaseChatModel, filenames: List, cohere_client,
+                                 mode: Optional[str] = None) -> str:
+    """Async variant of answer_from_documents; retrieval, rerank and synthesis do not hold a thread."""
+    if not vectorstore:
+        return "Error: The knowledge base is not available."
 
-        Helpful Answer:"""
-        custom_rag_prompt = PromptTemplate.from_template(template)
-
-        synthesis_chain = (
-                custom_rag_prompt
-                | llm
-                | StrOutputParser()
-        )
-
-        context_str = format_docs(final_docs)
-        answer = synthesis_chain.invoke({"context": context_str, "question": query})
-
-        failure_phrases = [
-            "don't know",
-            "do not know",
-            "couldn't find",
-            "not find",
-            "no relevant information",
-            "based on the provided documents",
-            "could not find an answer"
-        ]
-
-        answer_lower = answer.lower()
-        if any(phrase in answer_lower for phrase in failure_phrases):
-            print("RAG chain could not find an answer. Instructing agent to use other tools.")
-            return "No relevant information was found in the user's documents for this query."
-        else:
-            return answer
+    print(f"Executing async RAG chain for user_id: {user_id} with query: '{query}'")
+
+    try:
+        vector = await embeddings.aembed_query(query)
+        _log_scope(user_id, filenames)
+        initial_docs = await _aretrieve(vector, user_id, filenames)
+
+        if not initial_docs:
+            return "No relevant information was found in the user's documents."
+
+        final_docs = await _arerank(query, initial_docs, cohere_client)
+
+        if not final_docs:
+            return "No relevant information was found in the user's documents after reranking."
+
+        if (mode or RAG_TOOL_MODE) == "context":
+            return format_cited_context(final_docs)
+
+        answer = await _synthesis_chain(llm).ainvoke({"context": format_docs(final_docs), "question": query})
+        return _checked_answer(answer)
 
     except Exception as e:
         import traceback
@@ -134,6 +244,48 @@ def answer_from_documents(query: str, user_id: int, llm: BaseChatModel, filename
         return f"An error occurred while answering from your documents: {str(e)}"
 
 
+async def aretrieve_documents_batch(queries: List[str], user_id: int, filenames: List,
+                                   cohere_client) -> Dict[str, List[Document]]:
+    """
+    Reranked documents for several queries at once. Queries are deduplicated (case- and whitespace-insensitive),
+    embedded in a single call (cached query vectors are reused), then queried and reranked concurrently.
+    Returns the documents per original query.
+    """
+    # Case and whitespace variants of one question are searched once, with the first spelling seen.
+    unique_by_key = {}
+    for query in queries:
+        if query.strip():
+            unique_by_key.setdefault(_normalize(query).casefold(), _normalize(query))
+    if not unique_by_key:
+        return {}
+    unique = list(unique_by_key.values())
+
+    print(f"Executing batched retrieval for user_id: {user_id}: {len(queries)} queries, {len(unique)} unique")
+    _log_scope(user_id, filenames)
+    vectors = await embeddings.aembed_queries(unique)
+    found = await asyncio.gather(*(_aretrieve(vector, user_id, filenames) for vector in vectors))
+    ranked = await asyncio.gather(*(_arerank(query, docs, cohere_client) for query, docs in zip(unique, found)))
+
+    by_key = dict(zip(unique_by_key, ranked))
+    return {query: by_key[_normalize(query).casefold()] for query in queries if query.strip()}
+
+
+async def aanswer_from_documents_batch(queries: List[str], user_id: int, filenames: List,
+                                       cohere_client) -> Dict[str, str]:
+    """Cited context (as answer_from_documents returns in "context" mode) for each of several queries."""
+    try:
+        results = await aretrieve_documents_batch(queries, user_id, filenames, cohere_client)
+    except Exception as e:
+        import traceback
+        print(traceback.format_exc())
+        return {query: f"An error occurred while answering from your documents: {str(e)}" for query in queries}
+
+    return {
+        query: format_cited_context(docs) if docs else "No relevant information was found in the user's documents."
+        for query, docs in results.items()
+    }
+
+
 @tool
 def search_web(query: str, user_id: int, llm: BaseChatModel, is_web_search_enable: bool = True) -> str:
     """
@@ -141,8 +293,11 @@ def search_web(query: str, user_id: int, llm: BaseChatModel, is_web_search_enabl
             or any information that you likely wouldn't find in a user's private documents.
             This tool performs a web search.
     """
-    search = TavilySearchResults(max_results=3)
-    return search.invoke(query)
+    return web_search_cache.search(query)
+
+
+async def asearch_web(query: str, user_id: int, llm: BaseChatModel, is_web_search_enable: bool = True) -> str:
+    return await web_search_cache.asearch(query)
 
 
 @tool
@@ -154,10 +309,34 @@ def use_calculator(query: str, llm: BaseChatModel) -> str:
         mathematical expression.
     """
     print(f"--- Executing Calculator for query: '{query}' ---")
+    try:
+        return f"Answer: {evaluate_expression(query)}"
+    except CalculatorError as e:
+        print(f"Local calculator could not evaluate the query ({e}). Translating it with the LLM.")
+
     math_chain = LLMMathChain.from_llm(llm=llm, verbose=True)
 
     try:
         result = math_chain.invoke(query)
         return result.get("answer", "Calculation failed.")
     except Exception as e:
-        return f"Error during calculation: {e}"
\ No newline at end of file
+        return f"Error during calculation: {e}"
+
+
+async def ause_calculator(query: str, llm: BaseChatModel) -> str:
+    try:
+        return f"Answer: {evaluate_expression(query)}"
+    except CalculatorError as e:
+        print(f"Local calculator could not evaluate the query ({e}). Translating it with the LLM.")
+
+    try:
+        result = await LLMMathChain.from_llm(llm=llm, verbose=True).ainvoke(query)
+        return result.get("answer", "Calculation failed.")
+    except Exception as e:
+        return f"Error during calculation: {e}"
+
+
+# Tool.ainvoke (used by agents running on the event loop) goes through the async implementations.
+answer_from_documents.coroutine = aanswer_from_documents
+search_web.coroutine = asearch_web
+use_calculator.coroutine = ause_calculator
\ No newline at end of file
@@ -0,0 +1,154 @@
+# ai/tools/web_search.py
+#
+# Web search behind a small TTL + LRU cache. Chat, exam checking, clarification and practice grading
+# ask about the same study material again and again, so results are reused per normalised query.
+
+import asyncio
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+WEB_SEARCH_MAX_RESULTS = int(os.getenv("WEB_SEARCH_MAX_RESULTS", "3"))
+WEB_SEARCH_CACHE_ENABLED = os.getenv("WEB_SEARCH_CACHE_ENABLED", "true").lower() == "true"
+WEB_SEARCH_CACHE_TTL_SECONDS = int(os.getenv("WEB_SEARCH_CACHE_TTL_SECONDS", str(6 * 3600)))
+WEB_SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("WEB_SEARCH_CACHE_MAX_ENTRIES", "1000"))
+
+SearchResults = Union[List[Dict[str, Any]], str]
+# A backend takes a query and the number of results and returns Tavily-shaped results
+# ([{"url": ..., "content": ...}, ...]) or an error string. Backends may also define an async `asearch`
+# with the same signature; otherwise async callers run the backend in a worker thread.
+SearchBackend = Callable[[str, int], SearchResults]
+
+
+def normalize_query(query: str) -> str:
+    """"Co to jest  Fotosynteza?" and "co to jest fotosynteza" share one cache entry."""
+    return re.sub(r"\s+", " ", query).strip().rstrip("?!.").strip().lower()
+
+
+class TavilyBackend:
+    """Tavily search with one client per result count, created on first use and then reused."""
+
+    def __init__(self):
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def _client(self, max_results: int):
+        client = self._clients.get(max_results)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(max_results)
+                if client is None:
+                    from langchain_community.tools.tavily_search import TavilySearchResults
+                    client = TavilySearchResults(max_results=max_results)
+                    self._clients[max_results] = client
+        return client
+
+    def __call__(self, query: str, max_results: int) -> SearchResults:
+        return self._client(max_results).invoke(query)
+
+    async def asearch(self, query: str, max_results: int) -> SearchResults:
+        return await self._client(max_results).ainvoke(query)
+
+
+class WebSearchCache:
+    """
+    Caches search results per (normalised query, max_results) in process memory. Entries expire after
+    `ttl` seconds and the least recently used ones are dropped beyond `max_entries`. Error strings
+    returned by the backend are passed through but never cached.
+    """
+
+    def __init__(self, backend: SearchBackend, ttl: int = WEB_SEARCH_CACHE_TTL_SECONDS,
+                 max_entries: int = WEB_SEARCH_CACHE_MAX_ENTRIES, enabled: bool = WEB_SEARCH_CACHE_ENABLED):
+        self.backend = backend
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = self._misses = self._evictions = 0
+
+    def set_backend(self, backend: SearchBackend) -> None:
+        """Swaps the search provider (e.g. a local fake) and drops results cached from the old one."""
+        with self._lock:
+            self.backend = backend
+            self._entries.clear()
+
+    def _get(self, key: Tuple[str, int]) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self._misses += 1
+            return None
+
+    def _put(self, key: Tuple[str, int], results: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, results)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def search(self, query: str, max_results: int = WEB_SEARCH_MAX_RESULTS) -> SearchResults:
+        if not self.enabled:
+            return self.backend(query, max_results)
+
+        key = (normalize_query(query), max_results)
+        cached = self._get(key)
+        if cached is not None:
+            print(f"[INFO] Web search cache hit for '{key[0]}'")
+            return list(cached)
+
+        results = self.backend(query, max_results)
+        if isinstance(results, list):
+            self._put(key, list(results))
+        return results
+
+    async def _acall_backend(self, query: str, max_results: int) -> SearchResults:
+        asearch = getattr(self.backend, "asearch", None)
+        if asearch is not None:
+            return await asearch(query, max_results)
+        return await asyncio.to_thread(self.backend, query, max_results)
+
+    async def asearch(self, query: str, max_results: int = WEB_SEARCH_MAX_RESULTS) -> SearchResults:
+        if not self.enabled:
+            return await self._acall_backend(query, max_results)
+
+        key = (normalize_query(query), max_results)
+        cached = self._get(key)
+        if cached is not None:
+            print(f"[INFO] Web search cache hit for '{key[0]}'")
+            return list(cached)
+
+        results = await self._acall_backend(query, max_results)
+        if isinstance(results, list):
+            self._put(key, list(results))
+        return results
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits, misses = self._hits, self._misses
+            return {
+                "enabled": self.enabled,
+                "hits": hits,
+                "misses": misses,
+                "evictions": self._evictions,
+                "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+            }
+
+
+web_search_cache = WebSearchCache(TavilyBackend())
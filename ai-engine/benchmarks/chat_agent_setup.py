@@ -0,0 +1,86 @@
+"""
+Micro-benchmark of the per-message setup cost of the chat agent.
+
+"rebuild" repeats what ask_chat did before the agent registry: a new prompt, three Tool wrappers
+around functools.partial closures, create_openai_tools_agent and an AgentExecutor for every message.
+"registry" is the current path: look up the shared agent and set the request context.
+No model is called, only the setup is measured.
+
+Usage (from ai-engine/, with the usual .env):
+    python -m benchmarks.chat_agent_setup [iterations]
+"""
+import functools
+import sys
+import time
+import tracemalloc
+
+from langchain.agents import AgentExecutor, create_openai_tools_agent
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.tools import Tool
+
+from ai.agents.chat_agent import PROMPT, chat_agents, co_client
+from ai.core.llm import get_chat_model
+from ai.tools.chat_tools import chat_request_context
+from ai.tools.tools import answer_from_documents, search_web, use_calculator
+
+MODEL = "gpt-4o-mini"
+TEMPERATURE = 0.7
+
+
+def rebuild(user_id, filenames):
+    llm = get_chat_model(model=MODEL, temperature=TEMPERATURE)
+    tools = [
+        Tool(
+            name="answer_from_documents",
+            func=functools.partial(answer_from_documents.func, user_id=user_id, llm=llm, filenames=filenames,
+                                   cohere_client=co_client),
+            description=answer_from_documents.description
+        ),
+        Tool(
+            name="search_web",
+            func=functools.partial(search_web.func, user_id=user_id, llm=llm),
+            description=search_web.description
+        ),
+        Tool(
+            name="Calculator",
+            func=functools.partial(use_calculator.func, llm=llm),
+            description=use_calculator.description
+        ),
+    ]
+    prompt = ChatPromptTemplate.from_messages(PROMPT.messages)
+    agent = create_openai_tools_agent(llm=llm, tools=tools, prompt=prompt)
+    return AgentExecutor(agent=agent, tools=tools, verbose=True, handle_parsing_errors=True)
+
+
+def registry(user_id, filenames):
+    agent, llm = chat_agents.get(MODEL, TEMPERATURE)
+    token = chat_request_context.set({"user_id": user_id, "filenames": filenames, "llm": llm})
+    chat_request_context.reset(token)
+    return agent
+
+
+def measure(name, setup, iterations):
+    setup(1, ["warmup.pdf"])
+
+    start = time.perf_counter()
+    for i in range(iterations):
+        setup(i, ["notes.pdf"])
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    for i in range(min(iterations, 100)):
+        setup(i, ["notes.pdf"])
+    _, peak = tracemalloc.get_traced_memory()
+    allocated = sum(stat.size for stat in tracemalloc.take_snapshot().statistics("filename"))
+    tracemalloc.stop()
+
+    print(f"{name:>8}: {elapsed / iterations * 1e6:10.1f} us/message, "
+          f"peak {peak / 1024:8.1f} KiB, retained {allocated / 1024:8.1f} KiB over {min(iterations, 100)} messages")
+    return elapsed / iterations
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    before = measure("rebuild", rebuild, n)
+    after = measure("registry", registry, n)
+    print(f"speedup: {before / after:.0f}x")
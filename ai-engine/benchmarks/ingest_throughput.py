@@ -0,0 +1,93 @@
+"""
+Ingestion throughput (chunks/s) of ChunkIndexer against a fake embedder and a fake vector index.
+
+Nothing leaves the process: the fake embedder and index sleep for a fixed round trip plus a cost
+per item, which is roughly how the embeddings API and Pinecone upserts behave. "serial" mimics the
+previous vectorstore.add_documents path (one embedding call per 1000 chunks, then sequential upserts
+of 32). Tune batch sizes and concurrency here, then set them through EMBEDDING_BATCH_SIZE,
+EMBED_CONCURRENCY, UPSERT_BATCH_SIZE and UPSERT_CONCURRENCY.
+
+Usage (from ai-engine/):
+    python -m benchmarks.ingest_throughput [chunks] [embed_latency_ms] [upsert_latency_ms]
+"""
+import sys
+import threading
+import time
+
+from langchain_core.documents import Document
+
+from ai.services.chunk_indexer import ChunkIndexer
+
+DIMENSIONS = 1536
+
+
+class FakeEmbedder:
+    def __init__(self, latency: float, per_text: float = 0.0002):
+        self.latency = latency
+        self.per_text = per_text
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, texts):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency + self.per_text * len(texts))
+        return [[0.0] * DIMENSIONS for _ in texts]
+
+
+class FakeIndex:
+    def __init__(self, latency: float, per_vector: float = 0.0001):
+        self.latency = latency
+        self.per_vector = per_vector
+        self.vectors = {}
+        self._lock = threading.Lock()
+
+    def upsert(self, vectors, namespace=None):
+        time.sleep(self.latency + self.per_vector * len(vectors))
+        with self._lock:
+            self.vectors.update((chunk_id, values) for chunk_id, values, _ in vectors)
+
+
+def make_chunks(n):
+    return [
+        (f"1#bench#{i:06d}", Document(page_content=f"chunk {i} " + "lorem ipsum " * 40,
+                                      metadata={"user_id": 1, "filename": "bench.pdf", "chunk_index": i}))
+        for i in range(n)
+    ]
+
+
+def measure(name, n, embed_latency, upsert_latency, **settings):
+    embedder, index = FakeEmbedder(embed_latency), FakeIndex(upsert_latency)
+    indexer = ChunkIndexer(embedder, index, **settings)
+    chunks = make_chunks(n)
+
+    start = time.perf_counter()
+    ids, _ = indexer.index_chunks(iter(chunks))
+    elapsed = time.perf_counter() - start
+
+    assert len(ids) == n and len(index.vectors) == n
+    print(f"{name:>34}: {n / elapsed:8.0f} chunks/s ({elapsed:5.2f} s, {embedder.calls} embedding calls)")
+    return n / elapsed
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    embed_latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 300) / 1000
+    upsert_latency = (float(sys.argv[3]) if len(sys.argv) > 3 else 80) / 1000
+    print(f"{n} chunks, embed round trip {embed_latency * 1000:.0f} ms, upsert round trip {upsert_latency * 1000:.0f} ms")
+
+    baseline = measure("serial (1000 / 32, no concurrency)", n, embed_latency, upsert_latency,
+                       embed_batch_size=1000, embed_concurrency=1, upsert_batch_size=32, upsert_concurrency=1)
+    for embed_batch_size, embed_concurrency, upsert_batch_size, upsert_concurrency in [
+        (256, 1, 100, 1),
+        (256, 4, 100, 4),
+        (128, 8, 100, 8),
+        (512, 4, 200, 4),
+    ]:
+        rate = measure(
+            f"embed {embed_batch_size}x{embed_concurrency}, upsert {upsert_batch_size}x{upsert_concurrency}",
+            n, embed_latency, upsert_latency,
+            embed_batch_size=embed_batch_size, embed_concurrency=embed_concurrency,
+            upsert_batch_size=upsert_batch_size, upsert_concurrency=upsert_concurrency
+        )
+        print(f"{'':>34}  {rate / baseline:.1f}x serial")
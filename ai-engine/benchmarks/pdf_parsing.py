@@ -0,0 +1,75 @@
+"""
+Benchmark of PDF page parsing throughput.
+
+"loader" is what ingestion did before: PyPDFLoader reading every page in the calling thread.
+"pool/N" is pdf_parser.iter_pdf_pages with N process-pool workers, which shards the page range.
+A synthetic PDF with text-only pages is generated first; the extracted texts are checked to match.
+
+Usage (from ai-engine/):
+    python -m benchmarks.pdf_parsing [pages] [workers ...]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+from langchain_community.document_loaders import PyPDFLoader
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from ai.services import pdf_parser
+
+WORDS = ("cell membrane protein enzyme energy photosynthesis chlorophyll glucose oxygen carbon "
+         "mitochondria nucleus ribosome transport diffusion osmosis gradient molecule reaction").split()
+
+
+def make_pdf(path: str, pages: int, lines_per_page: int = 45) -> None:
+    rng = random.Random(0)
+    writer = PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    }))
+    for page_number in range(pages):
+        page = writer.add_blank_page(width=612, height=792)
+        lines = [f"Page {page_number + 1}"] + [" ".join(rng.choices(WORDS, k=12)) for _ in range(lines_per_page)]
+        content = "BT /F1 10 Tf 40 760 Td 14 TL " + " ".join(f"({line}) '" for line in lines) + " ET"
+        stream = DecodedStreamObject()
+        stream.set_data(content.encode("latin-1"))
+        page[NameObject("/Contents")] = writer._add_object(stream)
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})
+        })
+    with open(path, "wb") as f:
+        writer.write(f)
+
+
+def measure(name, pages_iter, pages):
+    start = time.perf_counter()
+    texts = [page.page_content for page in pages_iter()]
+    elapsed = time.perf_counter() - start
+    print(f"{name:>8}: {len(texts) / elapsed:8.1f} pages/s ({elapsed:6.2f} s for {len(texts)} pages)")
+    assert len(texts) == pages, f"{name} returned {len(texts)} pages"
+    return texts, elapsed
+
+
+if __name__ == "__main__":
+    n_pages = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    worker_counts = [int(arg) for arg in sys.argv[2:]] or [2, 4]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "synthetic.pdf")
+        make_pdf(path, n_pages)
+        print(f"synthetic PDF: {n_pages} pages, {os.path.getsize(path) / 1024:.0f} KiB, {os.cpu_count()} CPUs")
+
+        expected, baseline = measure("loader", lambda: PyPDFLoader(path).lazy_load(), n_pages)
+        for workers in worker_counts:
+            # The first run pays for spawning the pool; it is a one-off per process, so it is reported apart.
+            start = time.perf_counter()
+            list(pdf_parser.iter_pdf_pages(path, workers=workers))
+            print(f"  pool/{workers} cold start: {time.perf_counter() - start:6.2f} s")
+            texts, elapsed = measure(f"pool/{workers}", lambda: pdf_parser.iter_pdf_pages(path, workers=workers), n_pages)
+            assert texts == expected, f"pool/{workers} extracted different text"
+            print(f"  speedup: {baseline / elapsed:.1f}x")
@@ -0,0 +1,39 @@
+import os
+import tempfile
+from unittest import mock
+
+import pytest
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("COHERE_API_KEY", "test")
+os.environ.setdefault("TAVILY_API_KEY", "test")
+os.environ.setdefault("DEFAULT_MODEL", "gpt-4o")
+os.environ.setdefault("DEFAULT_TEMPERATURE", "0")
+_data_dir = tempfile.mkdtemp(prefix="ai-engine-tests-")
+os.environ.setdefault("CHUNK_STORE_PATH", os.path.join(_data_dir, "chunks.sqlite3"))
+os.environ.setdefault("EMBEDDING_STORE_PATH", os.path.join(_data_dir, "embeddings.sqlite3"))
+
+# pinecone_service builds its vector store at import time, which connects to Pinecone. Tests never talk to
+# the real index: the store is built without a client and the `index` fixture plugs an InMemoryIndex in.
+import langchain_pinecone  # noqa: E402
+
+langchain_pinecone.PineconeVectorStore = mock.MagicMock(name="PineconeVectorStore")
+
+from ai.services import chunk_store, pinecone_service  # noqa: E402
+from ai.services.memory_index import InMemoryIndex  # noqa: E402
+
+
+def fake_embed(texts):
+    return [[float(len(text)), 1.0] for text in texts]
+
+
+@pytest.fixture
+def index(monkeypatch, tmp_path):
+    memory_index = InMemoryIndex()
+    monkeypatch.setattr(pinecone_service.vectorstore, "_index", memory_index)
+    monkeypatch.setattr(pinecone_service.vectorstore, "_text_key", "text")
+    monkeypatch.setattr(pinecone_service.chunk_indexer, "index", memory_index)
+    monkeypatch.setattr(pinecone_service.chunk_indexer, "text_key", "text")
+    monkeypatch.setattr(pinecone_service.chunk_indexer, "embed", fake_embed)
+    monkeypatch.setattr(chunk_store, "CHUNK_STORE_PATH", str(tmp_path / "chunks.sqlite3"))
+    return memory_index
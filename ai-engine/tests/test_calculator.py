@@ -0,0 +1,37 @@
+import asyncio
+
+import pytest
+
+from ai.tools import tools
+from ai.tools.calculator import CalculatorError, evaluate_expression
+
+
+@pytest.mark.parametrize("expression, expected", [
+    ("2 + 2 * 2", "6"),
+    ("2^10", "1024"),
+    ("3,5 * 2", "7"),
+    ("sqrt(16) + 1 =", "5"),
+])
+def test_evaluates_supported_expressions(expression, expected):
+    assert evaluate_expression(expression) == expected
+
+
+@pytest.mark.parametrize("expression", [
+    "5!",
+    "1,000 + 1",
+    "__import__('os')",
+    "1" * 400 + " + 1",
+])
+def test_rejects_unsupported_input_with_calculator_error(expression):
+    with pytest.raises(CalculatorError):
+        evaluate_expression(expression)
+
+
+def test_too_large_literal_falls_back_to_llm(monkeypatch):
+    class FakeMathChain:
+        async def ainvoke(self, query):
+            return {"answer": "Answer: handled by the LLM"}
+
+    monkeypatch.setattr(tools.LLMMathChain, "from_llm", classmethod(lambda cls, llm, verbose: FakeMathChain()))
+
+    assert asyncio.run(tools.ause_calculator("9" * 400 + " * 2", llm=None)) == "Answer: handled by the LLM"
@@ -0,0 +1,72 @@
+from langchain.schema import Document
+
+from ai.services import chunk_service, pinecone_service
+from ai.services.namespaces import LEGACY_NAMESPACE, user_namespace
+
+
+def _index_file(user_id, filename, texts):
+    chunks = [Document(page_content=text, metadata={}) for text in texts]
+    ids = pinecone_service._tag_chunks(chunks, user_id, filename)
+    pinecone_service._index_chunks(chunks, ids, user_id)
+    return ids
+
+
+def _legacy_chunk(index, chunk_id, user_id, filename, text):
+    # Written before deterministic IDs and chunk_index: a random ID and only user_id/filename metadata.
+    index.upsert([(chunk_id, [1.0, 1.0], {"user_id": user_id, "filename": filename, "text": text})],
+                 namespace=LEGACY_NAMESPACE)
+
+
+def test_full_scan_includes_random_id_legacy_chunks(index):
+    _index_file(7, "new.md", ["first", "second"])
+    _legacy_chunk(index, "3f2a9c1e-legacy", 7, "old.md", "legacy text")
+    _legacy_chunk(index, "9b7d4e20-other", 8, "old.md", "someone else's text")
+
+    texts = [chunk["text"] for chunk in chunk_service.iter_chunks(7)]
+
+    assert texts == ["first", "second", "legacy text"]
+
+
+def test_file_restricted_scan_finds_random_id_legacy_chunks(index):
+    _index_file(7, "new.md", ["first"])
+    _legacy_chunk(index, "3f2a9c1e-legacy", 7, "old.md", "legacy text")
+
+    assert chunk_service.list_chunk_ids(7, ["old.md"]) == ["3f2a9c1e-legacy"]
+    assert chunk_service.list_chunk_ids(7, ["new.md"]) == pinecone_service._tag_chunks(
+        [Document(page_content="first", metadata={})], 7, "new.md")
+
+
+def test_legacy_chunks_are_ignored_without_fallback(index, monkeypatch):
+    monkeypatch.setattr(chunk_service, "LEGACY_NAMESPACE_FALLBACK", False)
+    _legacy_chunk(index, "3f2a9c1e-legacy", 7, "old.md", "legacy text")
+
+    assert chunk_service.list_chunk_ids(7) == []
+
+
+def test_file_split_across_namespaces_is_listed_once_in_order(index):
+    ids = _index_file(7, "split.md", ["s0", "s1", "s2"])
+    # The migration has copied s1 and s2 but not yet removed them, nor moved s0.
+    for chunk_id in ids[:2]:
+        stored = index.fetch(ids=[chunk_id], namespace=user_namespace(7)).vectors[chunk_id]
+        index.upsert([(chunk_id, stored.values, stored.metadata)], namespace=LEGACY_NAMESPACE)
+    index.delete(ids=ids[:1], namespace=user_namespace(7))
+
+    assert chunk_service.list_chunk_ids(7, ["split.md"]) == ids
+
+
+def test_full_scan_fetches_each_index_chunk_once(index, monkeypatch):
+    ids = _index_file(7, "new.md", ["first", "second", "third"])
+    _legacy_chunk(index, "3f2a9c1e-legacy", 7, "old.md", "legacy text")
+    fetched = []
+    fetch = index.fetch
+
+    def counting_fetch(ids, namespace=""):
+        fetched.extend(ids)
+        return fetch(ids=ids, namespace=namespace)
+
+    monkeypatch.setattr(index, "fetch", counting_fetch)
+
+    texts = [chunk["text"] for chunk in chunk_service.iter_chunks(7)]
+
+    assert texts == ["first", "second", "third", "legacy text"]
+    assert sorted(fetched) == sorted(ids + ["3f2a9c1e-legacy"])
@@ -0,0 +1,17 @@
+from ai.core import llm
+from ai.core.llm_cache import llm_cache
+
+
+def test_response_cache_only_for_deterministic_calls(monkeypatch):
+    monkeypatch.setattr(llm, "LLM_CACHE_ENABLED", True)
+
+    assert llm.get_chat_model("gpt-4o", temperature=0, cache=True).cache is llm_cache
+    assert llm.get_chat_model("gpt-4o", temperature=0.3, cache=True).cache is None
+    assert llm.get_chat_model("gpt-4o", temperature=None, cache=True).cache is None
+    assert llm.get_chat_model("gpt-4o", temperature=0, cache=False).cache is None
+
+
+def test_response_cache_can_be_switched_off(monkeypatch):
+    monkeypatch.setattr(llm, "LLM_CACHE_ENABLED", False)
+
+    assert llm.get_chat_model("gpt-4o-mini", temperature=0, cache=True).cache is None
@@ -0,0 +1,78 @@
+import asyncio
+from types import SimpleNamespace
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from ai.agents import query_router
+
+
+class FakeHistory:
+    def __init__(self, session_id=None, messages=()):
+        self.messages = list(messages)
+
+    async def aget_messages(self):
+        return list(self.messages)
+
+    async def aadd_messages(self, messages):
+        self.messages.extend(messages)
+
+
+class RecordingLLM:
+    def __init__(self, answer):
+        self.answer = answer
+        self.calls = []
+
+    async def ainvoke(self, messages):
+        self.calls.append(messages)
+        return SimpleNamespace(content=self.answer)
+
+
+def _earlier_turns(count):
+    return [
+        HumanMessage(content=f"pytanie {n}") if n % 2 == 0 else AIMessage(content=f"odpowiedź {n}")
+        for n in range(count)
+    ]
+
+
+def test_document_fast_path_prompt_has_language_rule_and_recent_history(monkeypatch):
+    history = FakeHistory(messages=_earlier_turns(10))
+    monkeypatch.setattr(query_router, "BoundedChatMessageHistory", lambda session_id: history)
+    requested_modes = []
+
+    async def fake_documents(query, user_id, llm, filenames, cohere_client, mode=None):
+        requested_modes.append(mode)
+        return "[1] (biologia.pdf, fragment 3) Mitochondria wytwarzają ATP."
+
+    monkeypatch.setattr(query_router, "aanswer_from_documents", fake_documents)
+    llm = RecordingLLM("Bo wytwarzają ATP [1].")
+
+    answer = asyncio.run(query_router.answer_directly(
+        query_router.DOCUMENT, "a dlaczego są ważne?", user_id=7, session_id="s", filenames=[], llm=llm
+    ))
+
+    assert answer == "Bo wytwarzają ATP [1]."
+    assert requested_modes == ["context"]
+    messages = llm.calls[0]
+    assert isinstance(messages[0], SystemMessage)
+    assert "wyłącznie w języku polskim" in messages[0].content
+    assert "Mitochondria wytwarzają ATP." in messages[0].content
+    # Only the latest turns are passed, in order, followed by the new question.
+    assert messages[1:-1] == history.messages[10 - query_router.FAST_PATH_HISTORY_MESSAGES:10]
+    assert messages[-1] == HumanMessage(content="a dlaczego są ważne?")
+
+
+def test_document_fast_path_hands_over_when_documents_have_no_answer(monkeypatch):
+    history = FakeHistory()
+    monkeypatch.setattr(query_router, "BoundedChatMessageHistory", lambda session_id: history)
+
+    async def fake_documents(*args, **kwargs):
+        return "[1] (notatki.pdf) Coś zupełnie innego."
+
+    monkeypatch.setattr(query_router, "aanswer_from_documents", fake_documents)
+
+    answer = asyncio.run(query_router.answer_directly(
+        query_router.DOCUMENT, "Kim był Kopernik?", user_id=7, session_id="s", filenames=[], llm=RecordingLLM("BRAK")
+    ))
+
+    assert answer is None
+    assert history.messages == []
@@ -0,0 +1,89 @@
+import pytest
+from langchain.schema import Document
+
+from ai.services import pinecone_service
+from ai.services.namespaces import LEGACY_NAMESPACE, user_namespace
+
+
+def _chunks(texts):
+    return [Document(page_content=text, metadata={}) for text in texts]
+
+
+def _legacy_file(index, user_id, filename, texts):
+    index.upsert([
+        (f"legacy-{user_id}-{number}", [1.0, 1.0], {"user_id": user_id, "filename": filename, "text": text})
+        for number, text in enumerate(texts)
+    ], namespace=LEGACY_NAMESPACE)
+
+
+def _vector_count(index, namespace):
+    return index.describe_index_stats()["namespaces"].get(namespace, {}).get("vector_count", 0)
+
+
+def test_reingest_of_legacy_file_moves_it_to_user_namespace(index):
+    _legacy_file(index, 7, "old.md", ["a", "b"])
+    chunks = _chunks(["a", "b", "c"])
+    ids = pinecone_service._tag_chunks(chunks, 7, "old.md")
+
+    pinecone_service._reindex_chunks(chunks, ids, 7, "old.md")
+
+    assert _vector_count(index, user_namespace(7)) == 3
+    assert _vector_count(index, LEGACY_NAMESPACE) == 0
+
+
+def test_failed_reingest_keeps_legacy_copy(index, monkeypatch):
+    _legacy_file(index, 7, "old.md", ["a", "b"])
+    _legacy_file(index, 8, "old.md", ["someone else"])
+
+    def failing_embed(texts):
+        raise RuntimeError("embedding service down")
+
+    monkeypatch.setattr(pinecone_service.chunk_indexer, "embed", failing_embed)
+    chunks = _chunks(["a", "b", "c"])
+    ids = pinecone_service._tag_chunks(chunks, 7, "old.md")
+
+    with pytest.raises(RuntimeError):
+        pinecone_service._reindex_chunks(chunks, ids, 7, "old.md")
+
+    assert _vector_count(index, LEGACY_NAMESPACE) == 3
+    assert _vector_count(index, user_namespace(7)) == 0
+
+
+def test_failed_reingest_keeps_previous_version(index, monkeypatch):
+    chunks = _chunks(["a", "b"])
+    pinecone_service._index_chunks(chunks, pinecone_service._tag_chunks(chunks, 7, "f.md"), 7)
+    calls = []
+
+    def upsert_once_then_fail(records, namespace):
+        calls.append(records)
+        if len(calls) > 1:
+            raise RuntimeError("upsert failed")
+        return index.upsert(vectors=records, namespace=namespace)["upserted_count"]
+
+    monkeypatch.setattr(pinecone_service.chunk_indexer, "upsert_batch_size", 1)
+    monkeypatch.setattr(pinecone_service.chunk_indexer, "_upsert", upsert_once_then_fail)
+    edited = _chunks(["new 1", "new 2", "a", "b"])
+
+    with pytest.raises(RuntimeError):
+        pinecone_service._reindex_chunks(edited, pinecone_service._tag_chunks(edited, 7, "f.md"), 7, "f.md")
+
+    texts = {vector.metadata["text"] for vector in index.fetch(
+        ids=pinecone_service.list_index_ids("", user_namespace(7)), namespace=user_namespace(7)).vectors.values()}
+    assert texts == {"a", "b"}
+
+
+def test_moved_chunks_are_reupserted_in_batches(index, monkeypatch):
+    chunks = _chunks([f"chunk {number}" for number in range(250)])
+    pinecone_service._index_chunks(chunks, pinecone_service._tag_chunks(chunks, 7, "f.md"), 7)
+    monkeypatch.setattr(pinecone_service.chunk_indexer, "upsert_batch_size", 100)
+    updates = []
+    monkeypatch.setattr(index, "update", lambda **kwargs: updates.append(kwargs))
+
+    edited = _chunks(["inserted"] + [f"chunk {number}" for number in range(250)])
+    ids = pinecone_service._tag_chunks(edited, 7, "f.md")
+    pinecone_service._reindex_chunks(edited, ids, 7, "f.md")
+
+    assert updates == []
+    stored = index.fetch(ids=[ids[-1]], namespace=user_namespace(7)).vectors[ids[-1]]
+    assert stored.metadata["chunk_index"] == 250
+    assert stored.values == [float(len("chunk 249")), 1.0]
@@ -0,0 +1,53 @@
+from ai.core import tokens
+from ai.services import text_splitter
+from ai.services.text_splitter import TokenAwareSplitter
+
+
+class WordEncoding:
+    """One token per whitespace-separated word; separators alone count as no tokens."""
+
+    def encode_ordinary(self, text):
+        return text.split()
+
+    def encode_ordinary_batch(self, texts, num_threads=1):
+        return [text.split() for text in texts]
+
+    def decode(self, token_ids):
+        return " ".join(token_ids)
+
+
+def _use_word_encoding(monkeypatch):
+    monkeypatch.setattr(tokens, "get_encoding", lambda model_name=None: WordEncoding())
+    monkeypatch.setattr(text_splitter, "get_encoding", lambda model_name=None: WordEncoding())
+
+
+def test_split_documents_counts_tokens_from_pieces(monkeypatch):
+    _use_word_encoding(monkeypatch)
+    counted = []
+
+    def counting(texts, model_name=None):
+        counted.extend(texts)
+        return [len(text.split()) for text in texts]
+
+    monkeypatch.setattr(text_splitter, "count_tokens_batch", counting)
+    paragraphs = [" ".join(f"w{p}_{n}" for n in range(30)) + "." for p in range(10)]
+    document = text_splitter.Document(page_content="\n\n".join(paragraphs), metadata={"filename": "f.md"})
+
+    chunks = TokenAwareSplitter(max_tokens=100, overlap_tokens=0).split_documents([document])
+
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert chunk.metadata["token_count"] == len(chunk.page_content.split())
+        assert chunk.metadata["filename"] == "f.md"
+    # Each paragraph is tokenised once, plus the separator once; chunks are never re-encoded.
+    assert sorted(counted) == sorted(paragraphs + ["\n\n"])
+
+
+def test_split_text_keeps_chunks_within_budget(monkeypatch):
+    _use_word_encoding(monkeypatch)
+    text = "\n\n".join(" ".join(["słowo"] * 40) + "." for _ in range(12))
+
+    chunks = TokenAwareSplitter(max_tokens=100, overlap_tokens=20).split_text(text)
+
+    assert chunks
+    assert all(len(chunk.split()) <= 100 for chunk in chunks)
@@ -1,10 +1,12 @@
 from typing import List
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
 from app.core.database import get_db
 from app.decorators.check_usage_limit import check_usage_limit
+from app.exceptions.chat_exception import ChatNotFoundException, GroupNotFoundException
 from app.decorators.token import get_current_user_from_cookie
 from app.models.user import User
 from app.schemas.chat import ChatGroupOut, ChatGroupCreate, ChatSessionOut, MessageOut, MessageIn
@@ -106,3 +108,22 @@ async def send_message(
     response = await chat_service.send_message(db, message_in, current_user.id)
 
     return response
+
+
+@router.post("/message/send/stream")
+@check_usage_limit("chat_messages", "max_chat_messages")
+async def send_message_stream(
+        message_in: MessageIn,
+        db: Session = Depends(get_db),
+        current_user: User = Depends(get_current_user_from_cookie)
+):
+    try:
+        events = chat_service.send_message_stream(db, message_in, current_user.id)
+    except (ChatNotFoundException, GroupNotFoundException):
+        raise HTTPException(status_code=404, detail="Chat not found")
+
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
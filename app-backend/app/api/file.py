@@ -7,12 +7,13 @@ from app.core.database import get_db
 from app.decorators.check_storage_limit import check_storage_limit, check_storage_limit_for_url
 from app.decorators.check_usage_limit import check_usage_limit
 from app.decorators.token import get_current_user_from_cookie
+from app.exceptions.file_exception import IngestionRejectedException
 from app.models.user import User
 from app.schemas.file import FileCreate
 from app.schemas.file import FileOut
 from app.services import file_service
 from app.services.file_service import get_user_files, delete_user_file, create_embeddings, upload_url, \
-    create_url_embeddings, is_file_used
+    create_url_embeddings, is_file_used, get_ingestion_status, remove_failed_upload, track_ingestion
 
 router = APIRouter()
 
@@ -39,12 +40,16 @@ def insert(
         raise HTTPException(status_code=401, detail="Failed to insert to SQL")
 
     try:
-        create_embeddings(current_user.id, upload_file)
+        job_id = create_embeddings(current_user.id, upload_file, file_id=file_id)
+    except IngestionRejectedException as e:
+        remove_failed_upload(db, current_user.id, file_id)
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
     except Exception:
-        db.rollback()
-        raise Exception("Failed to insert to Pinecone")
+        remove_failed_upload(db, current_user.id, file_id)
+        raise HTTPException(status_code=502, detail="Failed to insert to Pinecone")
 
-    return {"id": file_id}
+    track_ingestion(db, current_user.id, file_id, job_id)
+    return {"id": file_id, "ingestion_job_id": job_id}
 
 
 @router.post("/upload/note")
@@ -69,12 +74,16 @@ def insert(
         raise HTTPException(status_code=401, detail="Failed to insert to SQL")
 
     try:
-        create_embeddings(current_user.id, upload_file)
+        job_id = create_embeddings(current_user.id, upload_file, file_id=file_id)
+    except IngestionRejectedException as e:
+        remove_failed_upload(db, current_user.id, file_id)
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
     except Exception:
-        db.rollback()
-        raise Exception("Failed to insert to Pinecone")
+        remove_failed_upload(db, current_user.id, file_id)
+        raise HTTPException(status_code=502, detail="Failed to insert to Pinecone")
 
-    return {"id": file_id}
+    track_ingestion(db, current_user.id, file_id, job_id)
+    return {"id": file_id, "ingestion_job_id": job_id}
 
 
 @router.post("/upload/url")
@@ -93,9 +102,12 @@ def insert_url(
 
     try:
         create_url_embeddings(current_user.id, url)
+    except IngestionRejectedException as e:
+        remove_failed_upload(db, current_user.id, file_id)
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
     except Exception:
-        db.rollback()
-        raise Exception("Failed to insert to Pinecone")
+        remove_failed_upload(db, current_user.id, file_id)
+        raise HTTPException(status_code=502, detail="Failed to insert to Pinecone")
 
     return {"id": file_id}
 
@@ -123,6 +135,17 @@ def delete_file(
     return {"message": "File deleted"}
 
 
+@router.get("/ingestion/{job_id}")
+def ingestion_status(
+        job_id: str,
+        current_user: User = Depends(get_current_user_from_cookie)
+):
+    try:
+        return get_ingestion_status(current_user.id, job_id)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Missing ingestion job")
+
+
 @router.get("/used/{file_id}")
 def is_used(
         file_id: int,
@@ -0,0 +1,5 @@
+class IngestionRejectedException(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
@@ -0,0 +1,15 @@
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+
+from app.core.database import Base
+
+
+class PendingIngestion(Base):
+    """An uploaded file whose background ingestion in the ai-engine has not finished yet."""
+    __tablename__ = "pending_ingestions"
+    id = Column(Integer, primary_key=True)
+    job_id = Column(String(64), unique=True, nullable=False)
+    file_id = Column(Integer, ForeignKey("files.id", ondelete="CASCADE"), index=True, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), index=True, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
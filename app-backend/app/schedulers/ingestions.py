@@ -0,0 +1,28 @@
+import os
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.interval import IntervalTrigger
+
+from app.core.database import SessionLocal
+from app.services.file_service import reconcile_ingestions
+
+INGESTION_SWEEP_SECONDS = int(os.getenv("INGESTION_SWEEP_SECONDS", "30"))
+
+
+# sprzatamy pliki, ktorych ingestia w ai-engine sie nie udala (wiersz File i limit wracaja do uzytkownika)
+def run_job():
+    db = SessionLocal()
+    try:
+        reconcile_ingestions(db)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def add_ingestion_sweep_job(scheduler: AsyncIOScheduler):
+    trigger = IntervalTrigger(seconds=INGESTION_SWEEP_SECONDS)
+    # max_instances=1: a slow sweep is skipped rather than run twice over the same jobs.
+    scheduler.add_job(run_job, trigger, id="ingestion_sweep", replace_existing=True, max_instances=1,
+                      coalesce=True)
@@ -8,6 +8,7 @@ from app.models.subscription import Subscription
 from app.models.usage_stat import UsageStats
 from app.models.user import User
 from dateutil.relativedelta import relativedelta
+from app.schedulers.ingestions import add_ingestion_sweep_job
 
 tz = timezone("Europe/Warsaw")
 
@@ -61,5 +62,6 @@ def add_daily_rollover_job(scheduler: AsyncIOScheduler):
 def start_scheduler() -> AsyncIOScheduler:
     scheduler = AsyncIOScheduler(timezone=tz)
     add_daily_rollover_job(scheduler)
+    add_ingestion_sweep_job(scheduler)
     scheduler.start()
     return scheduler
@@ -1,10 +1,12 @@
-from typing import List
+import json
+from typing import AsyncIterator, List
 
 import httpx
 from fastapi import HTTPException
 from sqlalchemy import not_, and_
 from sqlalchemy.orm import Session, joinedload
 
+from app.core.database import SessionLocal
 from app.exceptions.chat_exception import GroupNotFoundException, ChatNotFoundException
 from app.exceptions.token_exception import UnauthorizedException
 from app.models.chat import Chat
@@ -15,7 +17,7 @@ from app.models.usage_stat import UsageStats
 from app.schemas.chat import ChatGroupCreate, ChatGroupOut, MessageIn, MessageOut, ChatSessionOut
 
 
-async def send_message(db: Session, message_in: MessageIn, user_id: int):
+def _get_or_create_chat(db: Session, message_in: MessageIn, user_id: int):
     group = None
     if message_in.chat_id:
         chat = db.query(Chat).filter_by(id=message_in.chat_id).first()
@@ -37,12 +39,20 @@ async def send_message(db: Session, message_in: MessageIn, user_id: int):
         db.commit()
         db.refresh(chat)
 
+    if not group:
+        group = chat.group
+    if not group:
+        raise GroupNotFoundException()
+    return chat, group
+
+
+async def send_message(db: Session, message_in: MessageIn, user_id: int):
+    chat, group = _get_or_create_chat(db, message_in, user_id)
+
     user_msg = Message(content=message_in.content, role=RoleEnum.user, chat=chat)
     db.add(user_msg)
 
     try:
-        if not group:
-            group = db.query(ChatGroup).filter_by(id=message_in.group_id, user_id=user_id).first()
         filenames = [g.filename for g in group.files]
         response_ai_msg = await get_chat_response(message_in.content, user_id, filenames, chat.id,
                                                   group.internetConnection)
@@ -115,6 +125,100 @@ async def get_chat_response(message: str, user_id: int, filenames: List[str], ch
                                 detail="An unexpected error occurred while communicating with the AI service.")
 
 
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _save_streamed_reply(chat_id: int, content: str) -> MessageOut:
+    # The request-scoped session may already be closed once the response is streaming.
+    db = SessionLocal()
+    try:
+        ai_msg = Message(content=content, role=RoleEnum.assistant, chat_id=chat_id)
+        db.add(ai_msg)
+        db.commit()
+        db.refresh(ai_msg)
+
+        return MessageOut(
+            id=ai_msg.id,
+            content=ai_msg.content,
+            role=ai_msg.role,
+            date=ai_msg.date.isoformat(),
+            chat_id=chat_id
+        )
+    finally:
+        db.close()
+
+
+def send_message_stream(db: Session, message_in: MessageIn, user_id: int) -> AsyncIterator[str]:
+    """
+    Streaming variant of send_message. The user message is saved before streaming starts; the
+    server-sent events of ai-engine (token, tool_start, tool_end, done, error) are relayed to the client.
+    Once the answer is complete it is saved and a final `message` event carries the stored assistant
+    MessageOut. If the stream ends early (client disconnect, ai-engine error), the partial answer is saved.
+    """
+    chat, group = _get_or_create_chat(db, message_in, user_id)
+    chat_id = chat.id
+    payload = {
+        "human_message": message_in.content,
+        "user_id": user_id,
+        "filenames": [g.filename for g in group.files],
+        "session_id": str(chat_id),
+        "internet_connection": group.internetConnection
+    }
+
+    db.add(Message(content=message_in.content, role=RoleEnum.user, chat=chat))
+    usage_stats = db.query(UsageStats) \
+        .filter_by(user_id=user_id) \
+        .first()
+    usage_stats.chat_messages += 1
+    db.commit()
+
+    async def relay():
+        streamed, saved = [], False
+        try:
+            yield _sse_event("chat", {"chat_id": chat_id})
+
+            timeout = httpx.Timeout(180.0, connect=5.0)
+            async with httpx.AsyncClient(timeout=timeout) as client:
+                async with client.stream("POST", "http://ai-engine:8000/chat/send/message/stream",
+                                         json=payload) as response:
+                    response.raise_for_status()
+
+                    event, data = None, ""
+                    async for line in response.aiter_lines():
+                        yield line + "\n"
+                        if line.startswith("event:"):
+                            event = line[len("event:"):].strip()
+                        elif line.startswith("data:"):
+                            data += line[len("data:"):].strip()
+                        elif not line:
+                            if event == "token":
+                                streamed.append(json.loads(data)["content"])
+                            elif event == "done":
+                                reply = _save_streamed_reply(chat_id, json.loads(data)["response"])
+                                saved = True
+                                yield _sse_event("message", reply.model_dump(mode="json"))
+                            event, data = None, ""
+
+        except httpx.ReadTimeout:
+            print("ERROR: Timeout occurred while streaming from ai-engine.")
+            yield _sse_event("error", {"detail": "The AI service took too long to respond."})
+
+        except httpx.HTTPStatusError as exc:
+            print(f"ERROR: HTTP error from ai-engine: {exc.response.status_code}")
+            yield _sse_event("error", {"detail": "The AI service returned an error."})
+
+        except httpx.RequestError as exc:
+            print(f"ERROR: Could not connect to ai-engine. Details: {exc}")
+            yield _sse_event("error", {"detail": "The AI service is currently unavailable."})
+
+        finally:
+            if not saved and streamed:
+                _save_streamed_reply(chat_id, "".join(streamed))
+
+    return relay()
+
+
 def get_user_groups(db: Session, user_id: int):
     groups = db.query(ChatGroup).filter(
         ChatGroup.user_id == user_id,
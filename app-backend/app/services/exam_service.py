@@ -1,4 +1,3 @@
-import asyncio
 import httpx
 import logging
 from fastapi import HTTPException
@@ -360,49 +359,45 @@ async def check_user_text_answer(db: Session, user_id: int, attempt: ExamTextAns
         .first()
     sources = sources_row[0] if sources_row else None
 
+    if not attempt.questions:
+        return []
+
+    # One request for the whole attempt: ai-engine retrieves context for all questions in one batch.
     timeout = httpx.Timeout(6000.0, connect=100.0)
     async with httpx.AsyncClient(timeout=timeout) as client:
-        async def send_question(question):
-            try:
-                response = await client.post(
-                    "http://ai-engine:8000/exam/check",
-                    json={
-                        "user_id": user_id,
-                        "question": question.question,
-                        "user_answer": question.user_answer,
-                        "correct_answer": question.correct_answer,
-                        "sources": sources
-                    }
-                )
-                response.raise_for_status()
-                ai_response = response.json()["answer"]
-
-                return AiResponse(
-                    question_id=question.question_id,
-                    response=ai_response
-                )
-
-            except httpx.ReadTimeout:
-                raise HTTPException(status_code=504, detail="AI service timed out.")
-
-            except httpx.HTTPStatusError as exc:
-                print(f"AI error {exc.response.status_code}: {exc.response.text}")
-                raise HTTPException(status_code=503, detail="AI service returned an error.")
-
-            except httpx.RequestError as exc:
-                raise HTTPException(status_code=503, detail=f"AI service unavailable: {exc}")
-
-            except Exception as e:
-                raise HTTPException(status_code=500, detail="Unexpected error with AI service.")
-
-        tasks = [send_question(q) for q in attempt.questions]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-
-    final_results = []
-    for result in results:
-        if isinstance(result, AiResponse):
-            final_results.append(result)
-        else:
-            raise Exception(result)
+        try:
+            response = await client.post(
+                "http://ai-engine:8000/exam/check/batch",
+                json={
+                    "user_id": user_id,
+                    "questions": [
+                        {
+                            "question": question.question,
+                            "user_answer": question.user_answer,
+                            "correct_answer": question.correct_answer
+                        }
+                        for question in attempt.questions
+                    ],
+                    "sources": sources or []
+                }
+            )
+            response.raise_for_status()
+            ai_responses = response.json()["answers"]
+
+        except httpx.ReadTimeout:
+            raise HTTPException(status_code=504, detail="AI service timed out.")
+
+        except httpx.HTTPStatusError as exc:
+            print(f"AI error {exc.response.status_code}: {exc.response.text}")
+            raise HTTPException(status_code=503, detail="AI service returned an error.")
+
+        except httpx.RequestError as exc:
+            raise HTTPException(status_code=503, detail=f"AI service unavailable: {exc}")
+
+        except Exception as e:
+            raise HTTPException(status_code=500, detail="Unexpected error with AI service.")
 
-    return final_results
+    return [
+        AiResponse(question_id=question.question_id, response=ai_response)
+        for question, ai_response in zip(attempt.questions, ai_responses)
+    ]
@@ -5,9 +5,11 @@ from fastapi import UploadFile
 from sqlalchemy import select, exists
 from sqlalchemy.orm import Session
 
+from app.exceptions.file_exception import IngestionRejectedException
 from app.models.chat_group import ChatGroup
 from app.models.chatgroup_file_association import chatgroup_file_table
 from app.models.file import File
+from app.models.pending_ingestion import PendingIngestion
 from app.models.usage_stat import UsageStats
 
 
@@ -70,6 +72,7 @@ def delete_user_file(db: Session, user_id: int, file_id: int):
     if not file:
         raise FileNotFoundError()
 
+    db.query(PendingIngestion).filter(PendingIngestion.file_id == file.id).delete()
     db.delete(file)
 
     try:
@@ -91,21 +94,98 @@ def delete_user_file(db: Session, user_id: int, file_id: int):
     db.commit()
 
 
-def create_embeddings(user_id: int, upload_file: UploadFile):
+def remove_failed_upload(db: Session, user_id: int, file_id: int):
+    """Drops the row of a file whose ingestion failed and gives its quota back."""
+    file = db.query(File).filter(File.id == file_id, File.user_id == user_id).first()
+    if not file:
+        return
+
+    usage_stats = db.query(UsageStats) \
+        .filter_by(user_id=user_id) \
+        .first()
+    usage_stats.number_of_files -= 1
+    usage_stats.total_file_mb = max((usage_stats.total_file_mb or 0) - (file.size or 0), 0)
+
+    db.query(PendingIngestion).filter(PendingIngestion.file_id == file.id).delete()
+    db.delete(file)
+    db.commit()
+
+
+def track_ingestion(db: Session, user_id: int, file_id: int, job_id: str):
+    """Remembers the ingestion job of an upload until reconcile_ingestions has seen it finish."""
+    db.add(PendingIngestion(job_id=job_id, file_id=file_id, user_id=user_id))
+    db.commit()
+
+
+def _rejection(response: httpx.Response) -> IngestionRejectedException:
+    try:
+        detail = response.json().get("detail", response.text)
+    except ValueError:
+        detail = response.text
+    return IngestionRejectedException(response.status_code, detail)
+
+
+def create_embeddings(user_id: int, upload_file: UploadFile, file_id: int | None = None) -> str:
+    """Hands the file to the ai-engine, which ingests it in the background. Returns the ingestion job ID."""
     try:
         with httpx.Client(timeout=30.0) as client:
             files = {
                 "upload_file": (upload_file.filename, upload_file.file, upload_file.content_type)
             }
+            params = {"user_id": user_id}
+            if file_id is not None:
+                params["file_id"] = file_id
             response = client.post(
                 "http://ai-engine:8000/knowledge/upload",
-                params={"user_id": user_id},
+                params=params,
                 files=files
             )
-            response.raise_for_status()
     except Exception as e:
         raise Exception(f"Failed to create embeddings: {str(e)}")
 
+    if response.is_error:
+        raise _rejection(response)
+    return response.json()["job_id"]
+
+
+def get_ingestion_status(user_id: int, job_id: str):
+    try:
+        response = httpx.get(
+            f"http://ai-engine:8000/knowledge/jobs/{job_id}",
+            params={"user_id": user_id},
+            timeout=10.0
+        )
+    except Exception as e:
+        raise Exception(f"Failed to get ingestion status: {str(e)}")
+
+    if response.status_code == 404:
+        raise FileNotFoundError()
+    response.raise_for_status()
+    return response.json()
+
+
+def reconcile_ingestions(db: Session):
+    """
+    Checks every pending ingestion job: a finished one is forgotten, a failed one takes its File row and
+    quota with it. The upload request returns before ingestion runs, so this is where a failure is noticed.
+    """
+    for pending in db.query(PendingIngestion).all():
+        try:
+            status = get_ingestion_status(pending.user_id, pending.job_id)["status"]
+        except FileNotFoundError:
+            # The job record expired or was lost; whether the file got indexed can't be told any more.
+            print(f"[WARN] Ingestion job {pending.job_id} of file {pending.file_id} is gone, keeping the file")
+            status = "done"
+        except Exception as e:
+            print(f"[WARN] Could not check ingestion job {pending.job_id}: {e}")
+            continue
+
+        if status == "failed":
+            remove_failed_upload(db, pending.user_id, pending.file_id)
+        elif status == "done":
+            db.delete(pending)
+            db.commit()
+
 
 def create_url_embeddings(user_id: int, url: str):
     try:
@@ -116,10 +196,12 @@ def create_url_embeddings(user_id: int, url: str):
                 content=json.dumps(url),
                 headers={"Content-Type": "application/json"}
             )
-            response.raise_for_status()
     except Exception as e:
         raise Exception(f"Failed to create URL embeddings: {str(e)}")
 
+    if response.is_error:
+        raise _rejection(response)
+
 
 def is_file_used(db: Session, user_id: int, file_id: int):
     stmt = (